@@ -0,0 +1,170 @@
+"""
+Offline benchmark of the error resolution of the BiteFix decorators.
+
+Every LLM call goes to a seeded BiteFixAIFakeLLM with a fixed latency and jitter, so the numbers only depend on
+the machine and on BiteFix itself and are reproducible without network access. It reports:
+    - the end-to-end latency percentiles of a failing decorated call, for each process and the tiered mode,
+    - the throughput of concurrent failures, with threads, the worker pool and coroutines,
+    - the memory held by each in-flight resolution.
+
+Usage:
+    python benchmarks/bench_resolution.py [--latency 0.05] [--jitter 0.01] [--runs 20] [--concurrency 16] [--seed 0]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor, wait
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bitefix import resolve, BiteFixAIWorkerPool
+from bitefix.BiteFixAIFakeLLM import BiteFixAIFakeLLM
+
+
+def field_name(index: int) -> str:
+    """
+    Returns a distinct name without digits, so that each failure gets its own error fingerprint.
+    """
+    name = ""
+    while True:
+        index, remainder = divmod(index, 26)
+        name += chr(ord("a") + remainder)
+        if index == 0:
+            return name
+
+
+def read_field(record, field):
+    return record[field]
+
+
+async def async_read_field(record, field):
+    return record[field]
+
+
+def quiet() -> contextlib.AbstractContextManager:
+    """
+    Silences the progress messages printed by the decorators while a benchmark runs.
+    """
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def percentiles(timings: list) -> str:
+    timings = sorted(timings)
+    quantiles = statistics.quantiles(timings, n=100, method="inclusive")
+    return (
+        f"p50 {quantiles[49] * 1000:8.1f} ms   p90 {quantiles[89] * 1000:8.1f} ms   "
+        f"p99 {quantiles[98] * 1000:8.1f} ms   max {timings[-1] * 1000:8.1f} ms"
+    )
+
+
+def bench_latency(llm: BiteFixAIFakeLLM, runs: int) -> None:
+    print("End-to-end latency of a failing call")
+    modes = {
+        "sequential": dict(process="sequential"),
+        "parallel": dict(process="parallel"),
+        "parallel x3": dict(process="parallel", idea_generators=3),
+        "tiered": dict(tiered=True),
+    }
+    for mode, options in modes.items():
+        decorated = resolve(llm=llm, verbose=False, **options)(read_field)
+        timings = []
+        with quiet():
+            for index in range(runs):
+                start = time.perf_counter()
+                decorated({}, field_name(index))
+                timings.append(time.perf_counter() - start)
+        print(f"  {mode:<12} {percentiles(timings)}")
+
+
+def bench_throughput(llm: BiteFixAIFakeLLM, failures: int, concurrency: int) -> None:
+    print(f"Throughput of {failures} concurrent failures")
+
+    decorated = resolve(llm=llm, verbose=False)(read_field)
+    start = time.perf_counter()
+    with quiet(), ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for index in range(failures):
+            executor.submit(decorated, {}, field_name(index))
+    elapsed = time.perf_counter() - start
+    print(f"  threads      {failures / elapsed:8.2f} resolutions/s")
+
+    worker_pool = BiteFixAIWorkerPool(max_workers=concurrency, max_queue_size=failures)
+    futures = []
+    decorated = resolve(llm=llm, verbose=False, worker_pool=worker_pool, reraise=True)(
+        read_field
+    )
+    start = time.perf_counter()
+    with quiet():
+        for index in range(failures):
+            try:
+                decorated({}, field_name(index))
+            except KeyError as error:
+                futures.append(error.bitefix_future)
+        wait([future for future in futures if future is not None])
+    elapsed = time.perf_counter() - start
+    worker_pool.shutdown(wait=True)
+    print(f"  worker pool  {failures / elapsed:8.2f} resolutions/s")
+
+    decorated = resolve(llm=llm, verbose=False)(async_read_field)
+
+    async def fail_concurrently() -> None:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fail(index: int) -> None:
+            async with semaphore:
+                await decorated({}, field_name(index))
+
+        await asyncio.gather(*(fail(index) for index in range(failures)))
+
+    start = time.perf_counter()
+    with quiet():
+        asyncio.run(fail_concurrently())
+    elapsed = time.perf_counter() - start
+    print(f"  coroutines   {failures / elapsed:8.2f} resolutions/s")
+
+
+def bench_memory(llm: BiteFixAIFakeLLM, in_flight: int) -> None:
+    print(f"Memory of {in_flight} in-flight resolutions")
+    decorated = resolve(llm=llm, verbose=False)(async_read_field)
+
+    async def fail_together() -> None:
+        await asyncio.gather(
+            *(decorated({}, field_name(index)) for index in range(in_flight))
+        )
+
+    with quiet():
+        asyncio.run(fail_together())
+        tracemalloc.start()
+        baseline, _ = tracemalloc.get_traced_memory()
+        asyncio.run(fail_together())
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    print(f"  per resolution {(peak - baseline) / in_flight / 1024:8.1f} KiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    options = parser.parse_args()
+
+    llm = BiteFixAIFakeLLM(
+        latency=options.latency, jitter=options.jitter, seed=options.seed
+    )
+    bench_latency(llm, options.runs)
+    bench_throughput(llm, options.runs * 4, options.concurrency)
+    bench_memory(llm, options.concurrency)
+    print(f"LLM calls: {llm.stats()['calls']}")
+
+
+if __name__ == "__main__":
+    main()
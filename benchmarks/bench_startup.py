@@ -0,0 +1,114 @@
+"""
+Startup benchmark of the BiteFix package.
+
+Measures, in fresh interpreters, the time and the peak memory of importing bitefix and decorating functions
+with @resolve and @resolve_with_openai, and of the warm-up that loads the agent stack on the first error resolution.
+The heavy LLM and crew dependencies must not be loaded before the first error resolution: the benchmark exits
+with status 1 if one of them is imported at startup or if startup exceeds the time or memory budget, so it can run as a CI check.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--max-seconds 1.0] [--max-rss-mb 100]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ("crewai", "langchain_core", "langchain_openai", "openai", "httpx")
+
+STARTUP = """
+import resource, sys, time
+start = time.perf_counter()
+from bitefix import resolve, resolve_with_openai
+
+@resolve(llm=object(), verbose=False)
+def add(a, b):
+    return a + b
+
+@resolve_with_openai(openai_api_key="sk-benchmark", verbose=False)
+def subtract(a, b):
+    return a - b
+
+seconds = time.perf_counter() - start
+"""
+
+WARMUP = """
+start = time.perf_counter()
+from bitefix import warmup
+warmup(subtract, background=False)
+seconds = time.perf_counter() - start
+"""
+
+REPORT = """
+import json
+print(json.dumps({
+    "seconds": seconds,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "heavy_modules": [module for module in %r if module in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def measure(code: str, runs: int) -> dict:
+    samples = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            text=True,
+            check=True,
+            env={
+                **os.environ,
+                "PYTHONWARNINGS": "ignore",
+                "PYTHONPATH": os.pathsep.join(
+                    path for path in (REPO_ROOT, os.environ.get("PYTHONPATH")) if path
+                ),
+            },
+        )
+        samples.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    return {
+        "seconds": statistics.median(sample["seconds"] for sample in samples),
+        "rss_mb": statistics.median(sample["rss_mb"] for sample in samples),
+        "heavy_modules": samples[-1]["heavy_modules"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=1.0)
+    parser.add_argument("--max-rss-mb", type=float, default=100)
+    options = parser.parse_args()
+
+    startup = measure(STARTUP + REPORT, options.runs)
+    print(
+        f"import and decorate   {startup['seconds'] * 1000:8.1f} ms   {startup['rss_mb']:8.1f} MiB"
+    )
+    warmed = measure(STARTUP + WARMUP + REPORT, 1)
+    print(
+        f"warm-up of the stack  {warmed['seconds'] * 1000:8.1f} ms   {warmed['rss_mb']:8.1f} MiB"
+    )
+
+    failures = []
+    if startup["heavy_modules"]:
+        failures.append(f"imported at startup: {', '.join(startup['heavy_modules'])}")
+    if startup["seconds"] > options.max_seconds:
+        failures.append(
+            f"startup took {startup['seconds']:.2f} s, over {options.max_seconds} s"
+        )
+    if startup["rss_mb"] > options.max_rss_mb:
+        failures.append(
+            f"startup used {startup['rss_mb']:.1f} MiB, over {options.max_rss_mb} MiB"
+        )
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Micro-benchmark of the success path of the BiteFix decorators.
+
+Compares the cost of calling an undecorated function with the cost of calling the same function
+decorated with @resolve, for a sync function and for a coroutine function, and reports the overhead in ns/call.
+No LLM is called: the decorated functions never raise.
+
+Usage:
+    python benchmarks/bench_success_path.py [--number 1000000] [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bitefix import resolve
+
+
+def add(a, b):
+    return a + b
+
+
+async def async_add(a, b):
+    return a + b
+
+
+def best_ns_per_call(statement, number: int, repeat: int) -> float:
+    timings = timeit.repeat(statement, number=number, repeat=repeat)
+    return min(timings) / number * 1e9
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    options = parser.parse_args()
+
+    decorated_add = resolve(llm=object(), verbose=False)(add)
+    decorated_async_add = resolve(llm=object(), verbose=False)(async_add)
+
+    bare = best_ns_per_call(lambda: add(1, 2), options.number, options.repeat)
+    wrapped = best_ns_per_call(
+        lambda: decorated_add(1, 2), options.number, options.repeat
+    )
+    print(f"sync  undecorated : {bare:8.1f} ns/call")
+    print(f"sync  @resolve    : {wrapped:8.1f} ns/call")
+    print(f"sync  overhead    : {wrapped - bare:8.1f} ns/call")
+
+    def drive(function) -> None:
+        coroutine = function(1, 2)
+        try:
+            coroutine.send(None)
+        except StopIteration:
+            pass
+
+    number = max(options.number // 10, 1)
+    bare = best_ns_per_call(lambda: drive(async_add), number, options.repeat)
+    wrapped = best_ns_per_call(
+        lambda: drive(decorated_async_add), number, options.repeat
+    )
+    print(f"async undecorated : {bare:8.1f} ns/call")
+    print(f"async @resolve    : {wrapped:8.1f} ns/call")
+    print(f"async overhead    : {wrapped - bare:8.1f} ns/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,11 @@
-from crewai import Agent
-from typing import Any, Tuple
+import threading
+from collections import OrderedDict
+from bitefix.BiteFixAIInstrumentation import BiteFixAIInstrumentation
+from typing import TYPE_CHECKING, Any, List, Tuple
+
+if TYPE_CHECKING:
+    from crewai import Agent, Crew
+    from bitefix.BiteFixAIResponseMemo import BiteFixAIResponseMemo
 
 
 class BiteFixAIAgents:
@@ -10,22 +16,120 @@ class BiteFixAIAgents:
 
     Attributes:
         llm (object): The LLM object.
+        stage_llms (dict): LLM objects overriding llm for some stages, keyed by the stage name
+            ("triage", "diagnosis", "idea_generation", "ideas_evaluation" or "code_development").
+        instrumentation (BiteFixAIInstrumentation): Records the LLM calls and the task of each agent. None disables it.
+        reuse (bool): Whether to reuse the agents and the crewai crews across runs. The agents are then built once per role and per concurrent run:
+            an agent is checked out by the run that gets it and must be given back with release once the run is complete.
+            One instance should be kept per LLM configuration, such as by BiteFixAIResolver.
+        prompt_layout (str): "default" starts each prompt with the role, backstory and goal of the agent. "prefix" moves them after the task,
+            so that the prompts of all the agents start the same way, see BiteFixAITasks.
+        response_memo (BiteFixAIResponseMemo): Reuses the LLM responses to prompts already sent with the same model parameters. None disables it.
 
     Methods:
+        stage_llm: Returns the LLM object of a stage, built once per stage with reuse.
+        TriageAgent: Returns a Python code triage agent responsible for a quick diagnosis of the error with a confidence and a severity score.
         DiagnosisAgent: Returns a Python code Diagnosis agent responsible for explaining why the error occurred.
         IdeaGeneratorAgent: Returns a senior Python code expert agent responsible for generating ideas to fix the error.
         IdeasEvaluatorAgent: Returns a lead Python code expert agent responsible for evaluating and choosing the best idea to fix the error.
         CodeDeveloperAgent: Returns a Python code Developer agent responsible for writing the final fixed code based on the chosen idea.
+        release: Gives agents back for reuse once their run is complete.
+        crew: Returns a crewai crew of agents, reused with them.
     """
 
+    STAGES = (
+        "triage",
+        "diagnosis",
+        "idea_generation",
+        "ideas_evaluation",
+        "code_development",
+    )
+
+    PROMPT_LAYOUTS = ("default", "prefix")
+
+    # Number of crewai crews kept for reuse.
+    MAX_CREWS = 32
+
     def __init__(
         self,
         llm: object,
+        stage_llms: dict = None,
+        instrumentation: BiteFixAIInstrumentation = None,
+        reuse: bool = False,
+        prompt_layout: str = "default",
+        response_memo: "BiteFixAIResponseMemo" = None,
     ):
+        unknown_stages = set(stage_llms or {}) - set(self.STAGES)
+        if unknown_stages:
+            raise ValueError(
+                f"Unknown stages {', '.join(sorted(unknown_stages))}. The stages are {', '.join(self.STAGES)}."
+            )
+        if prompt_layout not in self.PROMPT_LAYOUTS:
+            raise ValueError(
+                f"The prompt layout should be one of {', '.join(self.PROMPT_LAYOUTS)}."
+            )
         self.llm = llm
+        self.stage_llms = stage_llms or {}
+        self.instrumentation = instrumentation
+        self.reuse = reuse
+        self.prompt_layout = prompt_layout
+        self.response_memo = response_memo
+        self._idle = {}
+        self._staged = {}
+        self._crews = OrderedDict()
+        self._lock = threading.Lock()
+
+    def stage_llm(self, stage: str) -> object:
+        """
+        Returns the LLM object of a stage, using the response memo and the instrumentation callback if they are set.
+        With reuse, it is built once per stage and shared by the agents of that stage.
+        """
+        if self.reuse:
+            with self._lock:
+                staged = self._staged.get(stage)
+            if staged is not None:
+                return staged
+        llm = self.stage_llms.get(stage, self.llm)
+        if self.response_memo is not None:
+            llm = self.response_memo.attach(llm)
+        if self.instrumentation is not None:
+            llm = llm.with_config(callbacks=[self.instrumentation.llm_callback(stage)])
+        if self.reuse:
+            with self._lock:
+                llm = self._staged.setdefault(stage, llm)
+        return llm
+
+    def TriageAgent(self) -> "Agent":
+        return self._agent(
+            role="Python code Triage Expert",
+            goal="Quickly explain why the error occurred and rate how confident you are and how severe the error is",
+            backstory=f"""
+            Context: You are an AI expert in triaging Python code errors. 
+            You are the first responder to the error. Most errors only need your quick diagnosis, 
+            and the error is only handed over to a team of Python code experts if you are not confident in your diagnosis or the error is severe.
+
+            Objective: You will provide a short, clear explanation of why a Python error occurred, 
+            and rate your confidence in the diagnosis and the severity of the error.
+
+            Given Information: You will be provided with a Python function code, arguments passed to the function, and an error message generated by the code. 
+            You might be provided with a function description as well. 
+            If yes, use it to understand the function better.
+
+            Rules:
+            1. Your explanation should be concise, clear, and in simple language. 
+            2. The confidence is a number between 0 and 1. Use a low confidence when the cause of the error cannot be told from the given information.
+            3. The severity is a number between 0 and 1. Use a high severity when the fix is not obvious or the error can corrupt data or affect other parts of the system.
+            4. Remember, your role is to diagnose the error, not to write or fix the code.
 
-    def DiagnosisAgent(self) -> Agent:
-        return Agent(
+            Output Format: Your explanation should be in markdown format, followed by a line "Confidence: <number>" and a line "Severity: <number>".
+            """,
+            allow_delegation=False,
+            stage="triage",
+            verbose=False,
+        )
+
+    def DiagnosisAgent(self) -> "Agent":
+        return self._agent(
             role="Python code Diagnosis Expert",
             goal="Go through the error message and code and explain why the error occurred",
             backstory=f"""
@@ -56,12 +160,12 @@ class BiteFixAIAgents:
             Output Format: Your explanation should be in markdown format.
             """,
             allow_delegation=False,
-            llm=self.llm,
+            stage="diagnosis",
             verbose=False,
         )
 
-    def IdeaGeneratorAgent(self) -> Agent:
-        return Agent(
+    def IdeaGeneratorAgent(self) -> "Agent":
+        return self._agent(
             role="Senior Python code expert",
             goal="Generate ideas on how to fix the error",
             backstory=f"""
@@ -95,12 +199,12 @@ class BiteFixAIAgents:
 
             """,
             allow_delegation=False,
-            llm=self.llm,
+            stage="idea_generation",
             verbose=False,
         )
 
-    def IdeasEvaluatorAgent(self) -> Agent:
-        return Agent(
+    def IdeasEvaluatorAgent(self) -> "Agent":
+        return self._agent(
             role="Lead Python code expert",
             goal="Evaluate the ideas generated by BugFixIdeaGeneratorAgent and choose the best idea to fix the error",
             backstory=f"""
@@ -135,12 +239,12 @@ class BiteFixAIAgents:
             Output Format: Your output should be in markdown format.
             """,
             allow_delegation=False,
-            llm=self.llm,
+            stage="ideas_evaluation",
             verbose=False,
         )
 
-    def CodeDeveloperAgent(self) -> Agent:
-        return Agent(
+    def CodeDeveloperAgent(self) -> "Agent":
+        return self._agent(
             role="Python code developer",
             goal="Write the code to fix the error",
             backstory=f"""
@@ -172,6 +276,63 @@ class BiteFixAIAgents:
             
             """,
             allow_delegation=False,
-            llm=self.llm,
+            stage="code_development",
+            verbose=False,
+        )
+
+    def release(self, agents: List["Agent"]) -> None:
+        """
+        Gives agents back for reuse. Does nothing unless reuse is set.
+        """
+        if not self.reuse:
+            return
+        with self._lock:
+            for agent in agents:
+                self._idle.setdefault(agent.role, []).append(agent)
+
+    def crew(self, agents: List["Agent"]) -> "Crew":
+        """
+        Returns a crewai crew of the agents, without tasks. With reuse, the crew of the same checked out agents is reused,
+        which is safe as long as the agents are only used by one run at a time.
+        """
+        from crewai import Crew, Process
+
+        key = tuple(id(agent) for agent in agents)
+        if self.reuse:
+            with self._lock:
+                crew = self._crews.get(key)
+                if crew is not None:
+                    self._crews.move_to_end(key)
+                    return crew
+        crew = Crew(
+            agents=agents,
+            tasks=[],
             verbose=False,
+            process=Process.sequential,
+            full_output=True,
         )
+        if self.reuse:
+            with self._lock:
+                self._crews[key] = crew
+                while len(self._crews) > self.MAX_CREWS:
+                    self._crews.popitem(last=False)
+        return crew
+
+    def _agent(self, stage: str, **kwargs: Any) -> "Agent":
+        """
+        Builds a crewai agent with the LLM of its stage, importing crewai on first use so that decorating functions does not load it.
+        With reuse, an idle agent of the same role is checked out instead, with the LLM it was built with.
+        """
+        if self.reuse:
+            with self._lock:
+                idle = self._idle.get(kwargs["role"])
+                if idle:
+                    return idle.pop()
+        kwargs["llm"] = self.stage_llm(stage)
+        if self.prompt_layout == "prefix" or self.response_memo is not None:
+            from bitefix.BiteFixAICrewAgent import BiteFixAICrewAgent
+
+            return BiteFixAICrewAgent(**kwargs, prompt_layout=self.prompt_layout)
+        from crewai import Agent
+
+        return Agent(**kwargs)
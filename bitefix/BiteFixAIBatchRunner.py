@@ -0,0 +1,281 @@
+import json
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Iterable, Iterator, List, Union
+from bitefix.BiteFixAIAgents import BiteFixAIAgents
+from bitefix.BiteFixAICache import BiteFixAICache
+from bitefix.BiteFixAIRunner import BiteFixAIRunner
+from bitefix.BiteFixAISnapshot import BiteFixAISnapshot
+
+
+class BiteFixAIBatchRunner:
+
+    """
+    This class is responsible for resolving many recorded failures at once, such as the failures of an incident replayed from logs.
+    The failure records are grouped by fingerprint and each distinct error is resolved once by a BiteFixAIRunner, on at most max_workers
+    concurrent runs, so the number of LLM calls grows with the number of distinct errors and not with the number of occurrences.
+    The most frequent errors are resolved first. Each result is appended to the output JSON lines file as soon as it is ready,
+    and a later run on the same output file skips the errors already resolved, so an interrupted batch resumes where it stopped.
+
+    A failure record can be a BiteFixAISnapshot, a dict returned by BiteFixAISnapshot.to_dict, a dict with a "traceback" and optionally
+    "function_code", "function_description" and "function", or a formatted traceback string. A records file can hold one JSON record per line,
+    or plain log text, from which every "Traceback (most recent call last):" block is read.
+
+    Records that cannot be read, such as a malformed JSON line or text that is not a traceback, are counted as invalid and skipped.
+    A logged traceback is fingerprinted from its own frames and the function code given with it, so its fingerprint only matches
+    the one of the same error caught by a decorator, and its cached report, when the frames and the function code are the same.
+    Logged tracebacks usually hold the frames of the callers too, so they are grouped among themselves.
+
+    Each line of the output file is a JSON object with the "fingerprint", "function", "exception_type", "error_message", "occurrences",
+    "first_seen" and "last_seen" of an error, its "status" ("resolved", "cached" or "failed") and its "outputs", or its "error" if it failed.
+
+    Attributes:
+        llm (object): The language model object to use for error resolution.
+        output_path (str): Path of the output JSON lines file.
+        max_workers (int): Maximum number of errors resolved concurrently.
+        cache (BiteFixAICache): The cache used to reuse the error resolution report of an error resolved before. None disables it.
+        runner_options (dict): Other arguments of BiteFixAIRunner, such as process or stage_llms. The runs reuse the same agents unless agents is given.
+
+    Methods:
+        run: Groups the failure records, resolves each new distinct error and returns the counters of the batch.
+        read_records: Yields the failure records of a JSON lines or log file.
+        snapshot: Returns the BiteFixAISnapshot of a failure record.
+        completed: Returns the fingerprints already resolved in the output file.
+    """
+
+    _TRACEBACK_PATTERN = re.compile(
+        r"^Traceback \(most recent call last\):\n(?:[ \t].*\n)*\S.*$", re.MULTILINE
+    )
+
+    def __init__(
+        self,
+        llm: object,
+        output_path: str = "bitefix_batch.jsonl",
+        max_workers: int = 4,
+        cache: BiteFixAICache = None,
+        **runner_options: Any,
+    ):
+        if max_workers < 1:
+            raise ValueError("The batch runner needs at least one worker.")
+        self.llm = llm
+        self.output_path = output_path
+        self.max_workers = max_workers
+        self.cache = cache
+        self.runner_options = runner_options
+        self.runner_options.setdefault(
+            "agents",
+            BiteFixAIAgents(
+                llm=llm,
+                stage_llms=runner_options.get("stage_llms"),
+                instrumentation=runner_options.get("instrumentation"),
+                reuse=True,
+                prompt_layout=runner_options.get("prompt_layout", "default"),
+                response_memo=runner_options.get("response_memo"),
+            ),
+        )
+
+    def run(
+        self, records: Union[str, Iterable[Union[BiteFixAISnapshot, dict, str]]]
+    ) -> dict:
+        """
+        Resolves the distinct errors of the failure records that are not already resolved in the output file.
+
+        Args:
+            records (str | Iterable): The path of a records file, or the failure records.
+
+        Returns:
+            dict: The numbers of "records", "invalid" records that could not be read, distinct "errors",
+                errors "skipped" because they were already resolved, and errors "resolved", "cached" and "failed" by this run.
+        """
+        if isinstance(records, str):
+            records = self.read_records(records)
+        groups = {}
+        counters = {
+            "records": 0,
+            "invalid": 0,
+            "errors": 0,
+            "skipped": 0,
+            "resolved": 0,
+            "cached": 0,
+            "failed": 0,
+        }
+        for record in records:
+            counters["records"] += 1
+            try:
+                snapshot = self.snapshot(record)
+            except Exception as ex:
+                counters["invalid"] += 1
+                print(f"BiteFix AI batch - skipping an invalid record - {ex!r}\n")
+                continue
+            group = groups.get(snapshot.fingerprint)
+            if group is None:
+                groups[snapshot.fingerprint] = {
+                    "snapshot": snapshot,
+                    "occurrences": 1,
+                    "first_seen": snapshot.created_at,
+                    "last_seen": snapshot.created_at,
+                }
+            else:
+                group["occurrences"] += 1
+                group["first_seen"] = min(group["first_seen"], snapshot.created_at)
+                group["last_seen"] = max(group["last_seen"], snapshot.created_at)
+        counters["errors"] = len(groups)
+
+        completed = self.completed()
+        pending = sorted(
+            (group for key, group in groups.items() if key not in completed),
+            key=lambda group: group["occurrences"],
+            reverse=True,
+        )
+        counters["skipped"] = len(groups) - len(pending)
+        print(
+            f"BiteFix AI batch - {counters['records']} failures, {counters['invalid']} invalid, {counters['errors']} distinct errors, "
+            f"{counters['skipped']} already resolved.\n"
+        )
+
+        with open(self.output_path, "a", encoding="utf-8") as output:
+            self._terminate_last_line(output)
+            for line in self._resolve_groups(pending):
+                counters[line["status"]] += 1
+                output.write(json.dumps(line) + "\n")
+                output.flush()
+                print(
+                    f"BiteFix AI batch - {line['status']} {line['exception_type']} in {line['function']} "
+                    f"({line['occurrences']} occurrences).\n"
+                )
+        return counters
+
+    def _resolve_groups(self, groups: List[dict]) -> Iterator[dict]:
+        """
+        Resolves the groups on the worker threads and yields their output lines as they complete.
+        At most max_workers groups are submitted at a time, so an interruption does not leave a backlog of queued runs.
+        """
+        groups = iter(groups)
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="bitefix-batch"
+        ) as executor:
+            running = set()
+            try:
+                while True:
+                    for group in groups:
+                        running.add(executor.submit(self._resolve_group, group))
+                        if len(running) >= self.max_workers:
+                            break
+                    if not running:
+                        return
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            finally:
+                for future in running:
+                    future.cancel()
+
+    def _resolve_group(self, group: dict) -> dict:
+        snapshot = group["snapshot"]
+        line = {
+            "fingerprint": snapshot.fingerprint,
+            "function": snapshot.function,
+            "exception_type": snapshot.exception_type,
+            "error_message": snapshot.error_message,
+            "occurrences": group["occurrences"],
+            "first_seen": group["first_seen"],
+            "last_seen": group["last_seen"],
+        }
+        outputs = (
+            self.cache.get(snapshot.fingerprint) if self.cache is not None else None
+        )
+        if outputs is not None:
+            line.update(status="cached", outputs=outputs)
+            return line
+        try:
+            result = BiteFixAIRunner.from_snapshot(
+                snapshot, self.llm, **self.runner_options
+            ).run()
+            outputs = [output.result() for output in result["tasks_outputs"]]
+        except Exception as ex:
+            line.update(status="failed", error=repr(ex))
+            return line
+        if self.cache is not None:
+            self.cache.set(snapshot.fingerprint, outputs)
+        line.update(status="resolved", outputs=outputs)
+        return line
+
+    def completed(self) -> set:
+        """
+        Returns the fingerprints of the errors resolved in the output file. Failed errors are tried again,
+        and a line cut by an interruption is ignored.
+        """
+        completed = set()
+        if not os.path.exists(self.output_path):
+            return completed
+        with open(self.output_path, encoding="utf-8") as output:
+            for line in output:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    continue
+                if result.get("status") in ("resolved", "cached"):
+                    completed.add(result["fingerprint"])
+        return completed
+
+    @classmethod
+    def read_records(cls, path: str) -> Iterator[Union[dict, str]]:
+        """
+        Yields the failure records of a file with one JSON record per line, or the tracebacks of a plain log file.
+        A line that is not valid JSON is yielded as {"invalid": line}, which run counts as an invalid record.
+        """
+        with open(path, encoding="utf-8") as file:
+            first_line = next((line for line in file if line.strip()), "")
+            file.seek(0)
+            if first_line.lstrip().startswith("{"):
+                for line in file:
+                    if not line.strip():
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        yield {"invalid": line}
+                return
+            text = file.read()
+        for match in cls._TRACEBACK_PATTERN.finditer(text):
+            yield match.group(0)
+
+    @staticmethod
+    def snapshot(record: Union[BiteFixAISnapshot, dict, str]) -> BiteFixAISnapshot:
+        """
+        Returns the BiteFixAISnapshot of a failure record.
+        """
+        if isinstance(record, BiteFixAISnapshot):
+            return record
+        if isinstance(record, str):
+            return BiteFixAISnapshot.from_traceback(record)
+        if "fingerprint" in record:
+            return BiteFixAISnapshot.from_dict(record)
+        if "invalid" in record and "traceback" not in record:
+            raise ValueError(
+                f"The record is not valid JSON: {record['invalid'][:100]!r}."
+            )
+        if "traceback" not in record:
+            raise ValueError(
+                "A failure record should be a snapshot or hold a traceback."
+            )
+        return BiteFixAISnapshot.from_traceback(
+            record["traceback"],
+            function_code=record.get("function_code", ""),
+            function_description=record.get("function_description"),
+            function=record.get("function"),
+            created_at=record.get("created_at"),
+        )
+
+    @staticmethod
+    def _terminate_last_line(output: Any) -> None:
+        """
+        Ends the output file with a new line, in case the previous run was interrupted in the middle of a line.
+        """
+        if output.tell() == 0:
+            return
+        with open(output.name, "rb") as file:
+            file.seek(-1, os.SEEK_END)
+            if file.read(1) != b"\n":
+                output.write("\n")
@@ -0,0 +1,280 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+
+class BiteFixAICache:
+
+    """
+    This class is responsible for caching the error resolution reports produced by the BiteFix AI Agents.
+    Reports are keyed by an error fingerprint, so a repeated failure of the same function with the same error
+    is answered from the cache instead of running the whole crew again.
+
+    Attributes:
+        max_size (int): Maximum number of reports kept in the in-memory LRU tier.
+        ttl (float): Time to live of a report in seconds. None means reports never expire.
+        cache_dir (str): The path to the directory of the optional on-disk tier. None disables the on-disk tier.
+        max_disk_entries (int): Maximum number of reports kept in the on-disk tier.
+
+    Methods:
+        fingerprint: Returns the fingerprint of an error raised by a function.
+        fingerprint_parts: Returns the fingerprint of an error given by its parts.
+        get: Returns the cached report outputs for a fingerprint or None.
+        set: Stores the report outputs for a fingerprint.
+        clear: Removes all the cached reports.
+        stats: Returns the hit/miss/eviction counters of the cache.
+    """
+
+    _ADDRESS_PATTERN = re.compile(r"0x[0-9a-fA-F]+")
+    _NUMBER_PATTERN = re.compile(r"\d+")
+    _SPACE_PATTERN = re.compile(r"\s+")
+
+    def __init__(
+        self,
+        max_size: int = 256,
+        ttl: float = 3600,
+        cache_dir: str = None,
+        max_disk_entries: int = 10000,
+    ):
+        if max_size < 1:
+            raise ValueError("The cache max_size should be at least 1.")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+        self._entries = OrderedDict()
+        self._disk_entries = OrderedDict()
+        self._disk_writes = 0
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._scan_disk()
+
+    @classmethod
+    def normalize_message(cls, message: str) -> str:
+        message = cls._ADDRESS_PATTERN.sub("0x?", message)
+        message = cls._NUMBER_PATTERN.sub("N", message)
+        return cls._SPACE_PATTERN.sub(" ", message).strip()
+
+    @classmethod
+    def fingerprint(cls, function_code: str, error: BaseException) -> str:
+        """
+        Returns the fingerprint of an error raised by a function.
+        It is the hash of the function source, the exception type, the normalized error message and the traceback frames.
+
+        Args:
+            function_code (str): The function code.
+            error (BaseException): The error raised by the function.
+
+        Returns:
+            str: The hexadecimal fingerprint.
+        """
+        return cls.fingerprint_parts(
+            function_code,
+            f"{type(error).__module__}.{type(error).__qualname__}",
+            str(error),
+            [
+                (frame.filename, frame.name, frame.lineno)
+                for frame in traceback.extract_tb(error.__traceback__)
+            ],
+        )
+
+    @classmethod
+    def fingerprint_parts(
+        cls,
+        function_code: str,
+        exception_type: str,
+        message: str,
+        frames: List[Tuple[str, str, int]],
+    ) -> str:
+        """
+        Returns the fingerprint of an error given by its parts, such as an error parsed from a logged traceback.
+
+        Args:
+            function_code (str): The function code.
+            exception_type (str): The qualified name of the exception type, such as "builtins.KeyError".
+            message (str): The error message.
+            frames (List[Tuple[str, str, int]]): The file name, function name and line number of each traceback frame.
+
+        Returns:
+            str: The hexadecimal fingerprint.
+        """
+        parts = [
+            hashlib.sha256((function_code or "").encode("utf-8")).hexdigest(),
+            exception_type,
+            cls.normalize_message(message),
+            ";".join(
+                f"{os.path.basename(filename)}:{name}:{lineno}"
+                for filename, name, lineno in frames
+            ),
+        ]
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _scan_disk(self) -> None:
+        """
+        Indexes the reports on disk by modification time, oldest first, including those written by earlier or other processes.
+        The directory is listed when the cache is created and then once every tenth of max_disk_entries writes,
+        instead of on every write. Reports written by this process while the directory is listed are kept in the index.
+        """
+        started = time.time()
+        entries = {}
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.endswith(".json"):
+                try:
+                    mtime = os.path.getmtime(os.path.join(self.cache_dir, file_name))
+                except OSError:
+                    continue
+                entries[file_name[: -len(".json")]] = mtime
+        with self._lock:
+            for key, written in self._disk_entries.items():
+                if written >= started:
+                    entries[key] = max(written, entries.get(key, written))
+            self._disk_entries = OrderedDict(
+                sorted(entries.items(), key=lambda entry: entry[1])
+            )
+            self._disk_writes = 0
+
+    def _remember(self, key: str, created: float, outputs: List[str]) -> None:
+        self._entries[key] = (created, outputs)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def get(self, key: str) -> Optional[List[str]]:
+        """
+        Returns the cached report outputs for a fingerprint.
+
+        Args:
+            key (str): The error fingerprint.
+
+        Returns:
+            List[str]: The outputs of the four tasks, or None if the report is not cached or has expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[0]):
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return list(entry[1])
+                del self._entries[key]
+                self._counters["expirations"] += 1
+
+            if self.cache_dir:
+                entry = self._read_disk(key)
+                if entry is not None:
+                    self._remember(key, entry[0], entry[1])
+                    self._counters["disk_hits"] += 1
+                    return list(entry[1])
+
+            self._counters["misses"] += 1
+            return None
+
+    def set(self, key: str, outputs: List[str]) -> None:
+        """
+        Stores the report outputs for a fingerprint in the in-memory tier and in the on-disk tier if enabled.
+
+        Args:
+            key (str): The error fingerprint.
+            outputs (List[str]): The outputs of the four tasks.
+
+        Returns:
+            None
+        """
+        created = time.time()
+        with self._lock:
+            self._remember(key, created, list(outputs))
+        if self.cache_dir:
+            self._write_disk(key, created, outputs)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._disk_entries.clear()
+            if self.cache_dir:
+                for file_name in os.listdir(self.cache_dir):
+                    if file_name.endswith(".json"):
+                        os.remove(os.path.join(self.cache_dir, file_name))
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["size"] = len(self._entries)
+            stats["disk_size"] = len(self._disk_entries)
+        return stats
+
+    def _read_disk(self, key: str) -> Optional[tuple]:
+        path = self._disk_path(key)
+        try:
+            with open(path, "r") as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if self._expired(entry["created"]):
+            self._counters["expirations"] += 1
+            self._disk_entries.pop(key, None)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry["created"], entry["outputs"]
+
+    def _write_disk(self, key: str, created: float, outputs: List[str]) -> None:
+        """
+        Writes a report to the on-disk tier outside of the lock and evicts the oldest reports beyond max_disk_entries.
+        The temporary file is removed if the write fails, and the error is raised to the caller.
+        """
+        path = self._disk_path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "w") as file:
+                json.dump({"created": created, "outputs": list(outputs)}, file)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+        with self._lock:
+            self._disk_entries[key] = time.time()
+            self._disk_entries.move_to_end(key)
+            self._disk_writes += 1
+            rescan = self._disk_writes >= max(1, self.max_disk_entries // 10)
+        if rescan:
+            self._scan_disk()
+
+        with self._lock:
+            excess = len(self._disk_entries) - self.max_disk_entries
+            old_keys = [
+                self._disk_entries.popitem(last=False)[0] for _ in range(max(0, excess))
+            ]
+        for old_key in old_keys:
+            try:
+                os.remove(self._disk_path(old_key))
+            except OSError:
+                continue
+            with self._lock:
+                self._counters["evictions"] += 1
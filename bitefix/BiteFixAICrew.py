@@ -1,4 +1,7 @@
+import asyncio
+from typing import AsyncIterator, Iterator
 from crewai import Crew, Process, Agent, Task
+from crewai.tasks.task_output import TaskOutput
 
 
 class BiteFixAICrew:
@@ -9,22 +12,185 @@ class BiteFixAICrew:
     Attributes:
         agent (list[Agent]): List of AI Agents involved in the error fixing process.
         tasks (list[Task]): List of Tasks involved in the error fixing process.
+        crew (Crew): A crewai crew of the same agents, reused by kickoff with the tasks of this crew. Defaults to a new crewai crew.
 
     Methods:
         kickoff: Kicks off the crew. Returns the result of the agents.
+        akickoff: Kicks off the crew on the running event loop, awaiting the LLM calls with the async client. Returns the result of the agents.
+        stream: Kicks off the crew and yields the tokens and the output of each task as soon as they are produced.
+        astream: Async counterpart of stream. Tasks with `async_execution` stream concurrently.
     """
 
-    def __init__(self, agent: list[Agent], tasks: list[Task]):
+    FINAL_ANSWER = "Final Answer:"
+
+    def __init__(self, agent: list[Agent], tasks: list[Task], crew: Crew = None):
         self.agent = agent
         self.tasks = tasks
+        self.crew = crew
 
     def kickoff(self) -> dict:
-        crew = Crew(
-            agents=self.agent,
-            tasks=self.tasks,
-            verbose=False,
-            process=Process.sequential,
-            full_output=True,
-        )
+        if self.crew is not None:
+            crew = self.crew
+            crew.tasks = self.tasks
+        else:
+            crew = Crew(
+                agents=self.agent,
+                tasks=self.tasks,
+                verbose=False,
+                process=Process.sequential,
+                full_output=True,
+            )
         result = crew.kickoff()
         return result
+
+    async def akickoff(self) -> dict:
+        """
+        Runs the tasks the same way as the sequential crew process, but awaits each agent's LLM through `ainvoke`.
+        Tasks with `async_execution` run concurrently and tasks with `context` wait for the outputs of their context tasks.
+
+        Returns:
+            dict: The final output and the list of task outputs, in the same format as kickoff.
+        """
+        running = {}
+        task_output = ""
+        for task in self.tasks:
+            future = asyncio.ensure_future(self._aexecute(task, task_output, running))
+            running[id(task)] = future
+            if not task.async_execution:
+                task_output = await future
+        await asyncio.gather(*running.values())
+        return {
+            "final_output": task_output,
+            "tasks_outputs": [task.output for task in self.tasks],
+        }
+
+    def stream(self) -> Iterator[dict]:
+        """
+        Runs the tasks one after another through the `stream` method of each agent's LLM.
+        Tasks with `async_execution` are run in order too, but still receive the context they would get in akickoff.
+
+        Yields:
+            dict: {"event": "token", "task": index, "text": chunk} for each chunk of the LLM response,
+                then {"event": "output", "task": index, "text": output} once the task is complete.
+        """
+        outputs = {}
+        task_output = ""
+        for index, task in enumerate(self.tasks):
+            if task.context:
+                context = "\n".join(
+                    outputs[id(context_task)] for context_task in task.context
+                )
+            else:
+                context = task_output
+            chunks = []
+            for chunk in task.agent.llm.stream(self._task_prompt(task, context)):
+                text = getattr(chunk, "content", chunk)
+                chunks.append(text)
+                yield {"event": "token", "task": index, "text": text}
+            output = self._set_output(task, "".join(chunks))
+            outputs[id(task)] = output
+            if not task.async_execution:
+                task_output = output
+            yield {"event": "output", "task": index, "text": output}
+
+    async def astream(self) -> AsyncIterator[dict]:
+        """
+        Async counterpart of stream. Runs the tasks the same way as akickoff through the `astream` method of each agent's LLM,
+        so the events of concurrent tasks are interleaved.
+
+        Yields:
+            dict: The same events as stream.
+        """
+        queue = asyncio.Queue()
+        running = {}
+
+        async def produce() -> None:
+            task_output = ""
+            try:
+                for index, task in enumerate(self.tasks):
+                    future = asyncio.ensure_future(
+                        self._astream_task(index, task, task_output, running, queue)
+                    )
+                    running[id(task)] = future
+                    if not task.async_execution:
+                        task_output = await future
+                await asyncio.gather(*running.values())
+            except BaseException:
+                for future in running.values():
+                    future.cancel()
+                raise
+
+        producer = asyncio.ensure_future(produce())
+        producer.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                yield event
+            await producer
+        finally:
+            producer.cancel()
+
+    async def _astream_task(
+        self, index: int, task: Task, context: str, running: dict, queue: asyncio.Queue
+    ) -> str:
+        if task.context:
+            outputs = await asyncio.gather(
+                *(running[id(context_task)] for context_task in task.context)
+            )
+            context = "\n".join(outputs)
+        chunks = []
+        async for chunk in task.agent.llm.astream(self._task_prompt(task, context)):
+            text = getattr(chunk, "content", chunk)
+            chunks.append(text)
+            queue.put_nowait({"event": "token", "task": index, "text": text})
+        output = self._set_output(task, "".join(chunks))
+        queue.put_nowait({"event": "output", "task": index, "text": output})
+        return output
+
+    async def _aexecute(self, task: Task, context: str, running: dict) -> str:
+        if task.context:
+            outputs = await asyncio.gather(
+                *(running[id(context_task)] for context_task in task.context)
+            )
+            context = "\n".join(outputs)
+        response = await task.agent.llm.ainvoke(self._task_prompt(task, context))
+        return self._set_output(task, response)
+
+    @staticmethod
+    def _task_prompt(task: Task, context: str) -> str:
+        """
+        Renders the prompt that the crewai agent executor would send for a task without tools.
+        """
+        agent = task.agent
+        task_prompt = task.prompt()
+        if context:
+            task_prompt = agent.i18n.slice("task_with_context").format(
+                task=task_prompt, context=context
+            )
+        template = "".join(
+            agent.i18n.slice(component)
+            for component in ("role_playing", "no_tools", "task")
+        )
+        return template.format(
+            role=agent.role,
+            goal=agent.goal,
+            backstory=agent.backstory,
+            input=task_prompt,
+        )
+
+    @classmethod
+    def _set_output(cls, task: Task, response: object) -> str:
+        text = getattr(response, "content", response)
+        if cls.FINAL_ANSWER in text:
+            text = text.split(cls.FINAL_ANSWER)[-1]
+        result = text.strip()
+        task.output = TaskOutput(
+            description=task.description,
+            exported_output=result,
+            raw_output=result,
+        )
+        if task.callback:
+            task.callback(task.output)
+        return result
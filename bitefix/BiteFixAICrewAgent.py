@@ -0,0 +1,58 @@
+from typing import Any
+from crewai import Agent
+from crewai.utilities.i18n import I18N
+from bitefix.BiteFixAIResponseMemo import BiteFixAIResponseMemo
+
+
+class BiteFixAIPrefixI18N(I18N):
+
+    """
+    This class is responsible for the crewai prompt slices of the "prefix" prompt layout.
+    The role, backstory and goal of the agent, which differ for each agent, are moved from the start of the prompt to after the task,
+    so the prompt starts with the answer format instructions, the same for all the agents, followed by the task description,
+    which starts with the shared context block of the error (see BiteFixAITasks).
+
+    Methods:
+        slice: Returns a prompt slice.
+    """
+
+    def slice(self, slice: str) -> str:
+        if slice == "role_playing":
+            return ""
+        if slice == "task":
+            task, _, begin = super().slice("task").partition("{input}")
+            return f"{task}{{input}}\n\n{super().slice('role_playing')}{begin}"
+        return super().slice(slice)
+
+
+PREFIX_I18N = BiteFixAIPrefixI18N()
+
+
+class BiteFixAICrewAgent(Agent):
+
+    """
+    This class is responsible for the crewai agents using the "prefix" prompt layout or a BiteFixAIResponseMemo.
+    In the "prefix" layout, it uses the BiteFixAIPrefixI18N prompt slices and keeps them when a crewai crew resets the slices of its agents on kickoff.
+    When its LLM uses a BiteFixAIResponseMemo, its agent executor invokes the LLM instead of streaming it, as langchain only looks up
+    the cache of an LLM on invoke.
+
+    Attributes:
+        prompt_layout (str): "default" or "prefix".
+    """
+
+    prompt_layout: str = "default"
+
+    def __init__(self, **kwargs: Any):
+        if kwargs.get("prompt_layout") == "prefix":
+            kwargs["i18n"] = PREFIX_I18N
+        super().__init__(**kwargs)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name == "i18n" and self.prompt_layout == "prefix":
+            value = PREFIX_I18N
+        super().__setattr__(name, value)
+
+    def create_agent_executor(self, tools: Any = None) -> None:
+        super().create_agent_executor(tools=tools)
+        if isinstance(getattr(self.llm, "cache", None), BiteFixAIResponseMemo):
+            self.agent_executor.agent.stream_runnable = False
@@ -0,0 +1,373 @@
+import atexit
+import json
+import os
+import socket
+import socketserver
+import stat
+import threading
+import time
+from collections import deque
+from typing import Any, Tuple, Union
+from bitefix.BiteFixAIResolver import BiteFixAIResolver
+from bitefix.BiteFixAISnapshot import BiteFixAISnapshot
+from bitefix.BiteFixAIWorkerPool import BiteFixAIWorkerPool
+
+# Maximum size of a message, a JSON line holding one snapshot.
+MAX_MESSAGE_BYTES = 1 << 20
+
+
+def connect(address: Union[str, Tuple[str, int]], timeout: float) -> socket.socket:
+    """
+    Connects to a daemon listening on a Unix socket path or on a (host, port) TCP address.
+    """
+    if isinstance(address, str):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(timeout)
+        try:
+            connection.connect(address)
+        except OSError:
+            connection.close()
+            raise
+        return connection
+    return socket.create_connection(tuple(address), timeout=timeout)
+
+
+class BiteFixAIDaemon:
+
+    """
+    This class is responsible for resolving the failures of many application processes in one separate process.
+    It listens on a Unix socket or a localhost TCP port for snapshots sent by BiteFixAIDaemonClient, one JSON line per request,
+    and hands them to the worker pool of its resolver. The bounded queue of the pool is shared by all the clients, the pool coalesces
+    identical failures in flight and the cache of the resolver reuses past reports, so a failure repeated across a fleet of processes
+    is resolved once. When the queue is full the snapshot is rejected and the client backs off.
+
+    Requests and replies:
+        {"op": "resolve", "snapshot": {...}} -> {"status": "accepted" | "rejected", "queued": ..., "max_queue_size": ...}
+        {"op": "stats"} -> {"status": "ok", "stats": {...}}
+        {"op": "ping"} -> {"status": "ok"}
+        Invalid requests get {"status": "error", "error": ...}.
+
+    Attributes:
+        resolver (BiteFixAIResolver): Resolves the snapshots. A worker pool with max_workers and max_queue_size is attached if it has none.
+        address (str | tuple): Path of the Unix socket, or (host, port) of the TCP socket.
+        max_workers (int): Number of snapshots resolved concurrently, when the resolver has no worker pool.
+        max_queue_size (int): Maximum number of snapshots waiting for a worker, when the resolver has no worker pool.
+        trust_arguments (bool): Whether to keep the pickled arguments of the received snapshots, so that a BiteFixAIVerifier runs the fixes on them.
+            Unpickling them runs code chosen by the client, so it should only be enabled when every client able to reach the address is trusted.
+            Otherwise they are cleared and the fixes are only compiled.
+
+    Methods:
+        start: Serves in a background thread.
+        serve_forever: Serves in the calling thread until close is called.
+        close: Stops serving and waits for the queued resolutions.
+        stats: Returns the accepted, rejected and invalid counters and the worker pool stats.
+    """
+
+    def __init__(
+        self,
+        resolver: BiteFixAIResolver,
+        address: Union[str, Tuple[str, int]] = "bitefix.sock",
+        max_workers: int = 2,
+        max_queue_size: int = 64,
+        trust_arguments: bool = False,
+    ):
+        if resolver.worker_pool is None:
+            resolver.worker_pool = BiteFixAIWorkerPool(
+                max_workers=max_workers, max_queue_size=max_queue_size
+            )
+        self.resolver = resolver
+        self.address = address
+        self.max_workers = resolver.worker_pool.max_workers
+        self.max_queue_size = resolver.worker_pool.max_queue_size
+        self.trust_arguments = trust_arguments
+        self._lock = threading.Lock()
+        self._counters = {"accepted": 0, "rejected": 0, "invalid": 0}
+        self._thread = None
+        self._server = self._bind()
+
+    def start(self) -> "BiteFixAIDaemon":
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="bitefix-daemon", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        print(f"BiteFix AI daemon is listening on {self.address}.")
+        self._server.serve_forever()
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if isinstance(self.address, str):
+            try:
+                self._remove_socket(self.address)
+            except FileExistsError:
+                pass
+        self.resolver.worker_pool.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+        stats["worker_pool"] = self.resolver.worker_pool.stats()
+        if self.resolver.cache is not None:
+            stats["cache"] = self.resolver.cache.stats()
+        return stats
+
+    def handle(self, request: Any) -> dict:
+        """
+        Returns the reply to a decoded request.
+        """
+        if not isinstance(request, dict):
+            return self._invalid("The request should be a JSON object.")
+        if request.get("op") == "ping":
+            return {"status": "ok"}
+        if request.get("op") == "stats":
+            return {"status": "ok", "stats": self.stats()}
+        if request.get("op") != "resolve":
+            return self._invalid(f"Unknown op {request.get('op')!r}.")
+        try:
+            snapshot = BiteFixAISnapshot.from_dict(request["snapshot"])
+        except (KeyError, TypeError) as exc:
+            return self._invalid(f"Invalid snapshot: {exc!r}.")
+        if not self.trust_arguments:
+            snapshot.pickled_arguments = ""
+
+        future = self.resolver.resolve_snapshot(snapshot)
+        with self._lock:
+            self._counters["accepted" if future is not None else "rejected"] += 1
+        return {
+            "status": "accepted" if future is not None else "rejected",
+            "queued": self.resolver.worker_pool.stats()["queued"],
+            "max_queue_size": self.max_queue_size,
+        }
+
+    def _invalid(self, error: str) -> dict:
+        with self._lock:
+            self._counters["invalid"] += 1
+        return {"status": "error", "error": error}
+
+    def _bind(self) -> socketserver.BaseServer:
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                while True:
+                    line = self.rfile.readline(MAX_MESSAGE_BYTES + 1)
+                    if not line:
+                        return
+                    if len(line) > MAX_MESSAGE_BYTES:
+                        self._reply(daemon._invalid("The request is too large."))
+                        return
+                    try:
+                        request = json.loads(line)
+                    except ValueError:
+                        self._reply(daemon._invalid("The request is not valid JSON."))
+                        continue
+                    self._reply(daemon.handle(request))
+
+            def _reply(self, reply: dict) -> None:
+                self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+                self.wfile.flush()
+
+        if isinstance(self.address, str):
+
+            class UnixServer(socketserver.ThreadingUnixStreamServer):
+                daemon_threads = True
+
+            self._remove_socket(self.address)
+            umask = os.umask(0o177)
+            try:
+                return UnixServer(self.address, Handler)
+            finally:
+                os.umask(umask)
+
+        class TCPServer(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        return TCPServer(tuple(self.address), Handler)
+
+    @staticmethod
+    def _remove_socket(path: str) -> None:
+        """
+        Removes the Unix socket left at a path by a previous daemon. Any other file at the path is left alone.
+        """
+        try:
+            mode = os.lstat(path).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise FileExistsError(
+                f"{path} already exists and is not a socket, the BiteFix AI daemon cannot listen on it."
+            )
+        os.remove(path)
+
+
+class BiteFixAIDaemonClient:
+
+    """
+    This class is responsible for sending the snapshots of failures to a BiteFixAIDaemon, without blocking the failing call.
+    send only appends the snapshot to a bounded local buffer. A background thread keeps one connection to the daemon and sends
+    the buffered snapshots in order. When the daemon rejects a snapshot because its queue is full, the client keeps it at the head
+    of the buffer and sends it again after retry_interval seconds, and while the daemon is unreachable it retries every retry_interval seconds.
+    Snapshots arriving while the buffer is full are dropped. The snapshots still buffered are sent, for up to timeout seconds,
+    when the interpreter exits.
+
+    Attributes:
+        address (str | tuple): Path of the Unix socket, or (host, port) of the TCP socket of the daemon.
+        max_pending (int): Maximum number of snapshots buffered locally.
+        timeout (float): Timeout in seconds of the connection and of each reply.
+        retry_interval (float): Seconds to wait after a rejection or a connection failure.
+
+    Methods:
+        send: Buffers a snapshot for the daemon and returns whether it was accepted in the buffer.
+        flush: Waits until the buffered snapshots have been sent.
+        close: Sends the buffered snapshots and stops the background thread.
+        stats: Returns the sent, accepted, rejected, dropped and errors counters, the pending count and whether the daemon is busy.
+        request: Sends a request to the daemon and returns its reply, such as {"op": "stats"}.
+    """
+
+    def __init__(
+        self,
+        address: Union[str, Tuple[str, int]] = "bitefix.sock",
+        max_pending: int = 256,
+        timeout: float = 1.0,
+        retry_interval: float = 1.0,
+    ):
+        self.address = address
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._sending = False
+        self._closed = False
+        self._busy_until = 0.0
+        self._thread = None
+        self._connection = None
+        self._counters = {
+            "sent": 0,
+            "accepted": 0,
+            "rejected": 0,
+            "dropped": 0,
+            "errors": 0,
+        }
+
+    def send(self, snapshot: BiteFixAISnapshot) -> bool:
+        """
+        Buffers a snapshot for the daemon. It never blocks on the daemon.
+
+        Returns:
+            bool: False if the buffer was full and the snapshot was dropped.
+        """
+        with self._condition:
+            if self._closed or len(self._pending) >= self.max_pending:
+                self._counters["dropped"] += 1
+                return False
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._send_loop, name="bitefix-daemon-client", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.close)
+            self._pending.append(snapshot.to_dict())
+            self._condition.notify_all()
+        return True
+
+    def flush(self, timeout: float = None) -> bool:
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._pending and not self._sending, timeout
+            )
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self.flush(self.timeout)
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(self.timeout)
+            atexit.unregister(self.close)
+
+    def stats(self) -> dict:
+        with self._condition:
+            stats = dict(self._counters)
+            stats["pending"] = len(self._pending)
+            stats["busy"] = time.monotonic() < self._busy_until
+        return stats
+
+    def request(self, request: dict) -> dict:
+        """
+        Sends one request to the daemon on a new connection and returns its reply.
+        """
+        with connect(self.address, self.timeout) as connection:
+            connection.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            with connection.makefile("rb") as replies:
+                return json.loads(replies.readline(MAX_MESSAGE_BYTES))
+
+    def _send_loop(self) -> None:
+        while True:
+            with self._condition:
+                while not self._closed and (
+                    not self._pending or time.monotonic() < self._busy_until
+                ):
+                    self._condition.wait(
+                        max(self._busy_until - time.monotonic(), 0)
+                        if self._pending
+                        else None
+                    )
+                if self._closed:
+                    self._disconnect()
+                    self._condition.notify_all()
+                    return
+                snapshot = self._pending[0]
+                self._sending = True
+
+            reply = None
+            try:
+                reply = self._exchange({"op": "resolve", "snapshot": snapshot})
+            except (OSError, ValueError) as exc:
+                self._disconnect()
+                print(
+                    "Error occurred while sending a snapshot to the BiteFix AI daemon - ",
+                    exc,
+                )
+
+            with self._condition:
+                self._sending = False
+                if reply is None:
+                    self._counters["errors"] += 1
+                    self._busy_until = time.monotonic() + self.retry_interval
+                elif reply.get("status") == "rejected":
+                    self._counters["rejected"] += 1
+                    self._busy_until = time.monotonic() + self.retry_interval
+                else:
+                    self._pending.popleft()
+                    self._counters["sent"] += 1
+                    if reply.get("status") == "accepted":
+                        self._counters["accepted"] += 1
+                    else:
+                        self._counters["errors"] += 1
+                self._condition.notify_all()
+
+    def _exchange(self, request: dict) -> dict:
+        if self._connection is None:
+            connection = connect(self.address, self.timeout)
+            self._connection = (connection, connection.makefile("rb"))
+        connection, replies = self._connection
+        connection.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        line = replies.readline(MAX_MESSAGE_BYTES)
+        if not line:
+            raise ConnectionError("The BiteFix AI daemon closed the connection.")
+        return json.loads(line)
+
+    def _disconnect(self) -> None:
+        if self._connection is not None:
+            connection, replies = self._connection
+            self._connection = None
+            replies.close()
+            connection.close()
@@ -0,0 +1,159 @@
+import asyncio
+import random
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+from langchain_core.pydantic_v1 import PrivateAttr
+
+
+class BiteFixAIFakeLLM(LLM):
+
+    """
+    This class is responsible for standing in for a real LLM offline, to measure and test BiteFix without calling a provider.
+    It can be passed as the `llm` of the decorators, BiteFixAIRunner or BiteFixAIAgents, and supports invoke, ainvoke, stream and astream.
+    With a seed, the responses, latencies and failures are the same on every run.
+
+    Attributes:
+        responses (List[str]): Responses returned in turn. When empty, a default response naming the agent of the prompt is returned,
+            with a high confidence and a low severity for the triage prompt.
+            The crewai agents only accept responses holding "Final Answer:".
+        response_fn (Callable[[str], str]): Returns the response to a prompt. Takes precedence over responses.
+        latency (float): Seconds each call takes.
+        jitter (float): Maximum number of seconds randomly added to or removed from the latency.
+        failure_rate (float): Probability of a call raising RuntimeError, between 0 and 1.
+        seed (int): Seed of the random jitter and failures.
+
+    Methods:
+        stats: Returns the number of calls and of simulated failures.
+    """
+
+    DEFAULT_RESPONSE = (
+        "Thought: I now know the final answer\n"
+        "Final Answer: Fake answer {call} of the {agent}."
+    )
+    # Appended to the default response when the prompt asks for the triage scores.
+    DEFAULT_SCORES = "\nConfidence: 0.9\nSeverity: 0.1"
+
+    responses: List[str] = []
+    response_fn: Optional[Callable[[str], str]] = None
+    latency: float = 0.0
+    jitter: float = 0.0
+    failure_rate: float = 0.0
+    seed: Optional[int] = None
+
+    _random: random.Random = PrivateAttr()
+    _lock: Any = PrivateAttr()
+    _counters: dict = PrivateAttr()
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        if not 0 <= self.failure_rate <= 1:
+            raise ValueError("The failure rate should be between 0 and 1.")
+        self._random = random.Random(self.seed)
+        self._lock = threading.Lock()
+        self._counters = {"calls": 0, "failures": 0}
+
+    @property
+    def _llm_type(self) -> str:
+        return "bitefix-fake"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {
+            "latency": self.latency,
+            "jitter": self.jitter,
+            "failure_rate": self.failure_rate,
+            "seed": self.seed,
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._counters)
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        response, delay, failed = self._next(prompt)
+        time.sleep(delay)
+        if failed:
+            raise RuntimeError("Simulated LLM failure.")
+        return response
+
+    async def _acall(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        response, delay, failed = self._next(prompt)
+        await asyncio.sleep(delay)
+        if failed:
+            raise RuntimeError("Simulated LLM failure.")
+        return response
+
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[GenerationChunk]:
+        for token in self._tokens(self._call(prompt)):
+            if run_manager is not None:
+                run_manager.on_llm_new_token(token)
+            yield GenerationChunk(text=token)
+
+    async def _astream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[GenerationChunk]:
+        for token in self._tokens(await self._acall(prompt)):
+            if run_manager is not None:
+                await run_manager.on_llm_new_token(token)
+            yield GenerationChunk(text=token)
+
+    def _next(self, prompt: str) -> tuple:
+        """
+        Draws the response, the delay and whether the call fails, under the lock so that a seeded run is reproducible.
+        """
+        with self._lock:
+            call = self._counters["calls"]
+            self._counters["calls"] += 1
+            delay = self.latency
+            if self.jitter:
+                delay += self._random.uniform(-self.jitter, self.jitter)
+            failed = self.failure_rate > 0 and self._random.random() < self.failure_rate
+            if failed:
+                self._counters["failures"] += 1
+
+        if self.response_fn is not None:
+            response = self.response_fn(prompt)
+        elif self.responses:
+            response = self.responses[call % len(self.responses)]
+        else:
+            match = re.search(r"^You are (.+?)\.?$", prompt, re.MULTILINE)
+            agent = match.group(1) if match else "agent"
+            response = self.DEFAULT_RESPONSE.format(call=call + 1, agent=agent)
+            if "Confidence:" in prompt:
+                response += self.DEFAULT_SCORES
+        return response, max(delay, 0.0), failed
+
+    @staticmethod
+    def _tokens(text: str) -> List[str]:
+        tokens = text.split(" ")
+        return [token + " " for token in tokens[:-1]] + tokens[-1:]
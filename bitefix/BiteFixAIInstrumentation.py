@@ -0,0 +1,137 @@
+import contextlib
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Iterator, List
+
+if TYPE_CHECKING:
+    from bitefix.BiteFixAILLMCallbackHandler import BiteFixAILLMCallbackHandler
+
+
+class BiteFixAIInstrumentation:
+
+    """
+    This class is responsible for collecting the timings and the metrics of BiteFix.
+    Each span, counter and observation is aggregated for `stats` and passed to every hook as an event dict:
+    {"type": "span" | "counter" | "observation", "name": ..., "value": ..., "attributes": {...}, "timestamp": ...},
+    where the value of a span is its duration in seconds. Hooks can forward the events to a metrics exporter such as OpenTelemetry.
+    When no instance is passed to the decorators, instrumentation is disabled and costs nothing.
+
+    The events are:
+        bitefix.calls (counter): Calls of the decorated functions, when count_calls is True.
+        bitefix.errors (counter): Errors raised by the decorated functions, whether count_calls is True or not.
+        bitefix.source_capture (span): Capture of the source code of a function at decoration time.
+        bitefix.snapshot (span): Capture of the BiteFixAISnapshot of an error, while the error is handled.
+        bitefix.resolution (span): Error resolution, from the cache lookup to the report.
+        bitefix.cache.hits, bitefix.cache.misses (counters): Cache lookups of the error resolution reports.
+        bitefix.index.search (span), bitefix.index.hits, bitefix.index.misses (counters): Lookups in the index of past error resolutions.
+        bitefix.queue.submitted, bitefix.queue.dropped (counters), bitefix.queue.depth (observation): Worker pool submissions.
+        bitefix.prompt_build (span): Building of the task prompts.
+        bitefix.prompt_size (observation): Estimated token count of the description of each task, with the task as attribute.
+        bitefix.task (span): Each task, from its first LLM call to its output, with its stage as attribute.
+        bitefix.llm (span), bitefix.llm.errors (counter): Each LLM call, with its stage as attribute.
+        bitefix.llm.prompt_tokens, bitefix.llm.completion_tokens (observations): Token counts of each LLM call,
+            as reported by the LLM or estimated from the text.
+
+    Attributes:
+        hooks (List[Callable[[dict], None]]): Called with each event.
+        count_calls (bool): Whether to count the calls of the decorated functions, which adds a counter increment to every call.
+            Errors are always counted, since they already take the slow path.
+
+    Methods:
+        span: Context manager timing a span.
+        record_span: Records a span measured by the caller.
+        count: Increments a counter.
+        observe: Records an observation.
+        llm_callback: Returns a langchain callback handler recording the LLM calls and the task of an agent.
+        stats: Returns the aggregated counters, spans and observations.
+    """
+
+    def __init__(
+        self,
+        hooks: List[Callable[[dict], None]] = None,
+        count_calls: bool = True,
+    ):
+        self.hooks = list(hooks or [])
+        self.count_calls = count_calls
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._summaries = {}
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[dict]:
+        """
+        Times the body of the with statement. The yielded attributes can be completed inside the body.
+        """
+        start = time.perf_counter()
+        try:
+            yield attributes
+        except BaseException as exc:
+            attributes["error"] = type(exc).__name__
+            raise
+        finally:
+            self.record_span(name, time.perf_counter() - start, **attributes)
+
+    def record_span(self, name: str, duration: float, **attributes: Any) -> None:
+        self._summarize("span", name, duration, attributes)
+
+    def count(self, name: str, value: int = 1, **attributes: Any) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+        self._emit("counter", name, value, attributes)
+
+    def observe(self, name: str, value: float, **attributes: Any) -> None:
+        self._summarize("observation", name, value, attributes)
+
+    def llm_callback(self, stage: str) -> "BiteFixAILLMCallbackHandler":
+        from bitefix.BiteFixAILLMCallbackHandler import BiteFixAILLMCallbackHandler
+
+        return BiteFixAILLMCallbackHandler(self, stage)
+
+    def stats(self) -> dict:
+        """
+        Returns the counters, and the count, total and maximum of each span and observation.
+        """
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "spans": {
+                    name: dict(summary)
+                    for (kind, name), summary in self._summaries.items()
+                    if kind == "span"
+                },
+                "observations": {
+                    name: dict(summary)
+                    for (kind, name), summary in self._summaries.items()
+                    if kind == "observation"
+                },
+            }
+
+    def _summarize(self, kind: str, name: str, value: float, attributes: dict) -> None:
+        with self._lock:
+            summary = self._summaries.get((kind, name))
+            if summary is None:
+                summary = self._summaries[(kind, name)] = {
+                    "count": 0,
+                    "total": 0,
+                    "max": value,
+                }
+            summary["count"] += 1
+            summary["total"] += value
+            summary["max"] = max(summary["max"], value)
+        self._emit(kind, name, value, attributes)
+
+    def _emit(self, kind: str, name: str, value: float, attributes: dict) -> None:
+        if not self.hooks:
+            return
+        event = {
+            "type": kind,
+            "name": name,
+            "value": value,
+            "attributes": attributes,
+            "timestamp": time.time(),
+        }
+        for hook in self.hooks:
+            try:
+                hook(event)
+            except Exception as exc:
+                print("Error occurred in a BiteFix AI instrumentation hook - ", exc)
@@ -0,0 +1,91 @@
+import time
+from typing import Any, Dict, List
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from bitefix.BiteFixAIInstrumentation import BiteFixAIInstrumentation
+from bitefix.BiteFixAIPromptBuilder import BiteFixAIPromptBuilder
+
+
+class BiteFixAILLMCallbackHandler(BaseCallbackHandler):
+
+    """
+    Langchain callback handler recording the LLM calls of one agent, and its task once `on_task_end` is called with the task output.
+    """
+
+    def __init__(self, instrumentation: BiteFixAIInstrumentation, stage: str):
+        self.instrumentation = instrumentation
+        self.stage = stage
+        self.task_start = None
+        self._calls = {}
+
+    def on_llm_start(
+        self,
+        serialized: Dict[str, Any],
+        prompts: List[str],
+        *,
+        run_id: UUID,
+        **kwargs: Any
+    ) -> None:
+        self._start(run_id, "".join(prompts))
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[list],
+        *,
+        run_id: UUID,
+        **kwargs: Any
+    ) -> None:
+        self._start(
+            run_id,
+            "".join(str(message.content) for batch in messages for message in batch),
+        )
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        start, prompt = self._calls.pop(run_id, (None, ""))
+        if start is None:
+            return
+        self.instrumentation.record_span(
+            "bitefix.llm", time.perf_counter() - start, stage=self.stage
+        )
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens")
+        completion_tokens = usage.get("completion_tokens")
+        if prompt_tokens is None:
+            prompt_tokens = BiteFixAIPromptBuilder.estimate_tokens(prompt)
+        if completion_tokens is None:
+            completion_tokens = BiteFixAIPromptBuilder.estimate_tokens(
+                "".join(
+                    generation.text
+                    for generations in response.generations
+                    for generation in generations
+                )
+            )
+        self.instrumentation.observe(
+            "bitefix.llm.prompt_tokens", prompt_tokens, stage=self.stage
+        )
+        self.instrumentation.observe(
+            "bitefix.llm.completion_tokens", completion_tokens, stage=self.stage
+        )
+
+    def on_llm_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._calls.pop(run_id, None)
+        self.instrumentation.count(
+            "bitefix.llm.errors", stage=self.stage, error=type(error).__name__
+        )
+
+    def on_task_end(self, output: Any) -> None:
+        if self.task_start is not None:
+            self.instrumentation.record_span(
+                "bitefix.task", time.perf_counter() - self.task_start, stage=self.stage
+            )
+            self.task_start = None
+
+    def _start(self, run_id: UUID, prompt: str) -> None:
+        now = time.perf_counter()
+        if self.task_start is None:
+            self.task_start = now
+        self._calls[run_id] = (now, prompt)
@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+import threading
+from typing import TYPE_CHECKING, Any, List
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+    from bitefix.BiteFixAIRouter import BiteFixAIRouter
+
+
+class BiteFixAILLMPool:
+
+    """
+    This class is responsible for sharing LLM clients across the process.
+    A client is built once per configuration and reused by every decorator with the same configuration, so back-to-back
+    error resolutions reuse its keep-alive HTTP connections instead of paying the connection and TLS setup each time.
+    The API key is passed to the client explicitly and never written to the environment.
+    langchain_openai and httpx are only imported when the first client is built.
+    Requests without a timeout use DEFAULT_REQUEST_TIMEOUT, so a stalled connection cannot block an error resolution forever.
+
+    Methods:
+        openai: Returns the shared ChatOpenAI client for a configuration.
+        openai_router: Returns the shared BiteFixAIRouter over the ChatOpenAI clients of several models.
+        clear: Closes and forgets all the shared clients.
+    """
+
+    DEFAULT_REQUEST_TIMEOUT = 600.0
+
+    _clients = {}
+    _http_clients = []
+    _closing = set()
+    _lock = threading.Lock()
+
+    @classmethod
+    def openai(
+        cls,
+        openai_api_key: str,
+        model_name: str = "gpt-4",
+        temperature: float = 0.7,
+        request_timeout: float = None,
+        max_retries: int = 2,
+        max_concurrency: int = 10,
+    ) -> "ChatOpenAI":
+        """
+        Returns the shared ChatOpenAI client for a configuration, building it on first use.
+
+        Args:
+            openai_api_key (str): The API key for OpenAI.
+            model_name (str, optional): The name of the model to use. Defaults to "gpt-4".
+            temperature (float, optional): The temperature for generating responses. Defaults to 0.7.
+            request_timeout (float, optional): Timeout of each request in seconds. Defaults to None, which uses DEFAULT_REQUEST_TIMEOUT.
+            max_retries (int, optional): Number of retries of a failed request. Defaults to 2.
+            max_concurrency (int, optional): Maximum number of concurrent connections of the client. Defaults to 10.
+
+        Returns:
+            ChatOpenAI: The shared client.
+        """
+        if request_timeout is None:
+            request_timeout = cls.DEFAULT_REQUEST_TIMEOUT
+        key = (
+            hashlib.sha256(openai_api_key.encode("utf-8")).hexdigest(),
+            model_name,
+            temperature,
+            request_timeout,
+            max_retries,
+            max_concurrency,
+        )
+        with cls._lock:
+            llm = cls._clients.get(key)
+            if llm is None:
+                from langchain_openai import ChatOpenAI
+
+                llm = ChatOpenAI(
+                    openai_api_key=openai_api_key,
+                    model_name=model_name,
+                    temperature=temperature,
+                    request_timeout=request_timeout,
+                    max_retries=max_retries,
+                    **cls._http_client_kwargs(request_timeout, max_concurrency),
+                )
+                cls._clients[key] = llm
+        return llm
+
+    @classmethod
+    def openai_router(
+        cls,
+        openai_api_key: str,
+        model_names: List[str],
+        hedge_after: float = None,
+        **options: Any,
+    ) -> "BiteFixAIRouter":
+        """
+        Returns the shared BiteFixAIRouter over the shared ChatOpenAI clients of several models, building it on first use.
+
+        Args:
+            openai_api_key (str): The API key for OpenAI.
+            model_names (List[str]): The names of the models, in order of preference.
+            hedge_after (float, optional): Seconds after which a call is hedged before the latency of a model is known. Defaults to None.
+            **options: The other arguments of openai, such as temperature or request_timeout.
+
+        Returns:
+            BiteFixAIRouter: The shared router.
+        """
+        key = (
+            "router",
+            hashlib.sha256(openai_api_key.encode("utf-8")).hexdigest(),
+            tuple(model_names),
+            hedge_after,
+            tuple(sorted(options.items())),
+        )
+        with cls._lock:
+            router = cls._clients.get(key)
+        if router is not None:
+            return router
+        from bitefix.BiteFixAIRouter import BiteFixAIRouter
+
+        backends = {
+            model_name: cls.openai(openai_api_key, model_name=model_name, **options)
+            for model_name in model_names
+        }
+        with cls._lock:
+            return cls._clients.setdefault(
+                key,
+                BiteFixAIRouter(
+                    backends,
+                    hedge_after=hedge_after,
+                    max_concurrency=options.get("max_concurrency", 10),
+                ),
+            )
+
+    @classmethod
+    def clear(cls) -> None:
+        """
+        Closes and forgets all the shared clients. The async HTTP clients are closed on the running event loop
+        when called from a coroutine, and with their own event loop otherwise.
+        """
+        with cls._lock:
+            http_clients = list(cls._http_clients)
+            cls._http_clients.clear()
+            cls._clients.clear()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        for http_client in http_clients:
+            if not hasattr(http_client, "aclose"):
+                http_client.close()
+            elif loop is None:
+                asyncio.run(cls._aclose(http_client))
+            else:
+                task = loop.create_task(cls._aclose(http_client))
+                cls._closing.add(task)
+                task.add_done_callback(cls._closing.discard)
+
+    @staticmethod
+    async def _aclose(http_client: Any) -> None:
+        """
+        Closes an async HTTP client. Connections opened on an event loop that has since been closed cannot be closed
+        gracefully and are dropped.
+        """
+        try:
+            await http_client.aclose()
+        except RuntimeError:
+            pass
+
+    @classmethod
+    def _http_client_kwargs(cls, request_timeout: float, max_concurrency: int) -> dict:
+        """
+        Builds keep-alive HTTP clients whose connection pool bounds the concurrency of the LLM client.
+        Older langchain_openai releases share one http_client between the sync and the async OpenAI clients,
+        which only accepts the default clients, so custom ones are only passed when http_async_client is supported.
+        """
+        import httpx
+        from langchain_openai import ChatOpenAI
+
+        if "http_async_client" not in ChatOpenAI.__fields__:
+            return {}
+        limits = httpx.Limits(
+            max_connections=max_concurrency,
+            max_keepalive_connections=max_concurrency,
+        )
+        timeout = httpx.Timeout(request_timeout)
+        http_client = httpx.Client(limits=limits, timeout=timeout)
+        http_async_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+        cls._http_clients.extend([http_client, http_async_client])
+        return {"http_client": http_client, "http_async_client": http_async_client}
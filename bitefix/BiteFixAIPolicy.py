@@ -0,0 +1,170 @@
+import random
+import threading
+import time
+
+
+class TokenBucket:
+
+    """
+    Token bucket refilled at `rate` tokens per second and holding at most `burst` tokens.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+
+    def try_acquire(self) -> bool:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+
+class CircuitBreaker:
+
+    """
+    Circuit breaker that opens after `failure_threshold` consecutive failures and lets one trial call through
+    (half-open) once `cooldown` seconds have passed. A successful trial closes it again, a failed one re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+
+    def can_pass(self) -> bool:
+        if self.state == self.OPEN:
+            return time.monotonic() - self._opened_at >= self.cooldown
+        return self.state == self.CLOSED
+
+    def on_pass(self) -> None:
+        if self.state == self.OPEN:
+            self.state = self.HALF_OPEN
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self._failures = 0
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+
+class BiteFixAIPolicy:
+
+    """
+    This class is responsible for deciding whether an error should be resolved by the BiteFix AI Agents.
+    It bounds how often the pipeline starts with probabilistic sampling, a token-bucket rate per decorated function,
+    a global token-bucket rate, and a circuit breaker that stops resolutions after repeated BiteFix AI pipeline errors.
+    Share one policy object between decorators to make the global rate and the circuit breaker cover all of them.
+
+    Attributes:
+        rate (float): Resolutions per second allowed for each decorated function. None disables the per-function limit.
+        burst (float): Maximum burst of resolutions for each decorated function.
+        global_rate (float): Resolutions per second allowed across all the functions using this policy. None disables the global limit.
+        global_burst (float): Maximum burst of resolutions across all the functions using this policy.
+        sample_rate (float): Probability of resolving an error, between 0 and 1.
+        failure_threshold (int): Number of consecutive pipeline errors opening the circuit breaker.
+        cooldown (float): Seconds the circuit breaker stays open before letting a trial resolution through.
+
+    Methods:
+        admit: Returns whether an error of the given function should be resolved.
+        record_success: Records a successful pipeline run.
+        record_failure: Records a pipeline error.
+        stats: Returns the admitted/suppressed counters and the circuit breaker state.
+    """
+
+    def __init__(
+        self,
+        rate: float = None,
+        burst: float = 1,
+        global_rate: float = None,
+        global_burst: float = 1,
+        sample_rate: float = 1.0,
+        failure_threshold: int = 5,
+        cooldown: float = 60,
+        seed: int = None,
+    ):
+        if not 0 <= sample_rate <= 1:
+            raise ValueError("The sample rate should be between 0 and 1.")
+        self.rate = rate
+        self.burst = burst
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+        self.sample_rate = sample_rate
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._random = random.Random(seed)
+        self._buckets = {}
+        self._global_bucket = (
+            TokenBucket(global_rate, global_burst) if global_rate is not None else None
+        )
+        self._breaker = CircuitBreaker(failure_threshold, cooldown)
+        self._lock = threading.Lock()
+        self._counters = {
+            "admitted": 0,
+            "sampled_out": 0,
+            "rate_limited": 0,
+            "global_rate_limited": 0,
+            "circuit_open": 0,
+            "pipeline_errors": 0,
+        }
+
+    def admit(self, key: str) -> bool:
+        """
+        Returns whether an error raised by a decorated function should be resolved.
+
+        Args:
+            key (str): The identity of the decorated function.
+
+        Returns:
+            bool: True if the resolution is admitted, False if it is suppressed.
+        """
+        with self._lock:
+            if not self._breaker.can_pass():
+                return self._suppress("circuit_open")
+            if self.sample_rate < 1 and self._random.random() >= self.sample_rate:
+                return self._suppress("sampled_out")
+            if self.rate is not None:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+                if not bucket.try_acquire():
+                    return self._suppress("rate_limited")
+            if self._global_bucket is not None and not self._global_bucket.try_acquire():
+                return self._suppress("global_rate_limited")
+            self._breaker.on_pass()
+            self._counters["admitted"] += 1
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._breaker.record_success()
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._counters["pipeline_errors"] += 1
+            self._breaker.record_failure()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["circuit_state"] = self._breaker.state
+        return stats
+
+    def _suppress(self, reason: str) -> bool:
+        self._counters[reason] += 1
+        return False
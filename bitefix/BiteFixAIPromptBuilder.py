@@ -0,0 +1,149 @@
+import math
+import reprlib
+import traceback
+from typing import Any, Dict, List, Tuple
+
+
+class BiteFixAIPromptBuilder:
+
+    """
+    This class is responsible for keeping the prompts of the BiteFix AI tasks within a token budget.
+    Arguments are summarized into bounded previews and the function code is trimmed to the lines involved in the traceback when it does not fit.
+
+    Attributes:
+        max_argument_chars (int): Maximum number of characters of the preview of each argument.
+        code_window (int): Number of lines kept around each traceback line when the function code is trimmed.
+
+    Methods:
+        estimate_tokens: Returns a rough token count of a text.
+        summarize_arguments: Returns bounded previews of the positional and keyword arguments.
+        fit_code: Returns the function code trimmed to fit a token budget.
+        fit_text: Returns a text cut to fit a token budget.
+        fit_error: Returns the description of an error cut to fit a token budget.
+    """
+
+    CHARS_PER_TOKEN = 4
+
+    def __init__(self, max_argument_chars: int = 1000, code_window: int = 3):
+        self.max_argument_chars = max_argument_chars
+        self.code_window = code_window
+        self._repr = reprlib.Repr()
+        self._repr.maxstring = max_argument_chars
+        self._repr.maxother = max_argument_chars
+        self._repr.maxlist = self._repr.maxtuple = self._repr.maxdict = 20
+        self._repr.maxset = self._repr.maxfrozenset = self._repr.maxdeque = 20
+        self._repr.maxlevel = 3
+
+    @classmethod
+    def estimate_tokens(cls, text: str) -> int:
+        return math.ceil(len(text) / cls.CHARS_PER_TOKEN)
+
+    def summarize_argument(self, value: Any) -> str:
+        """
+        Returns a bounded preview of an argument: its type, shape or length when it has one, and a truncated repr.
+        """
+        details = [type(value).__name__]
+        shape = getattr(value, "shape", None)
+        if isinstance(shape, tuple):
+            details.append(f"shape={shape}")
+        elif hasattr(value, "__len__"):
+            try:
+                details.append(f"len={len(value)}")
+            except TypeError:
+                pass
+        try:
+            preview = self._repr.repr(value)
+        except Exception as exc:
+            preview = f"<repr failed: {exc!r}>"
+        if len(preview) > self.max_argument_chars:
+            preview = preview[: self.max_argument_chars] + "..."
+        return f"{preview} ({', '.join(details)})"
+
+    def summarize_arguments(
+        self, arguments: Tuple[Any, ...], keyword_arguments: Dict[str, Any] = None
+    ) -> str:
+        previews = [self.summarize_argument(value) for value in arguments]
+        previews.extend(
+            f"{name}={self.summarize_argument(value)}"
+            for name, value in (keyword_arguments or {}).items()
+        )
+        return "(" + ", ".join(previews) + ")"
+
+    def fit_code(self, code: str, error: Any, max_tokens: int) -> str:
+        """
+        Returns the function code if it fits in max_tokens. Otherwise keeps the first line and the lines around the
+        lines of the traceback, and cuts the result if it is still too long.
+
+        Args:
+            code (str): The function code.
+            error (Any): The error raised by the function, or its BiteFixAISnapshot. Its traceback selects the lines to keep.
+            max_tokens (int): The token budget of the code.
+
+        Returns:
+            str: The code fitting the budget.
+        """
+        if max_tokens is None or self.estimate_tokens(code) <= max_tokens:
+            return code
+
+        lines = code.splitlines()
+        keep = {0}
+        for line in self._traceback_lines(error):
+            for number, code_line in enumerate(lines):
+                if code_line.strip() == line:
+                    keep.update(
+                        range(
+                            max(number - self.code_window, 0),
+                            min(number + self.code_window + 1, len(lines)),
+                        )
+                    )
+
+        trimmed = []
+        omitted = 0
+        for number, code_line in enumerate(lines):
+            if number in keep:
+                if omitted:
+                    trimmed.append(f"    # ... {omitted} lines omitted ...")
+                    omitted = 0
+                trimmed.append(code_line)
+            else:
+                omitted += 1
+        if omitted:
+            trimmed.append(f"    # ... {omitted} lines omitted ...")
+        code = "\n".join(trimmed)
+
+        max_chars = max(max_tokens, 0) * self.CHARS_PER_TOKEN
+        if len(code) > max_chars:
+            code = code[:max_chars] + "\n    # ... truncated ..."
+        return code
+
+    @classmethod
+    def fit_text(cls, text: str, max_tokens: int, keep_end: bool = False) -> str:
+        """
+        Returns the text if it fits in max_tokens, otherwise its start, or its end if keep_end is set.
+        """
+        max_chars = max(max_tokens, 0) * cls.CHARS_PER_TOKEN
+        if len(text) <= max_chars:
+            return text
+        if keep_end:
+            return "..." + text[len(text) - max(max_chars - 3, 0) :]
+        return text[: max(max_chars - 3, 0)] + "..."
+
+    @classmethod
+    def fit_error(cls, error: Any, max_tokens: int) -> str:
+        """
+        Returns the description of an error fitting max_tokens. The description of a BiteFixAISnapshot loses the code of the other frames first,
+        then the local variables, then the start of the traceback. Other errors keep the end of their text, where the error message is.
+        """
+        if hasattr(error, "describe"):
+            return error.describe(max(max_tokens, 0) * cls.CHARS_PER_TOKEN)
+        return cls.fit_text(str(error), max_tokens, keep_end=True)
+
+    @staticmethod
+    def _traceback_lines(error: Any) -> List[str]:
+        if not isinstance(error, BaseException):
+            return list(getattr(error, "traceback_lines", []))
+        return [
+            frame.line.strip()
+            for frame in traceback.extract_tb(error.__traceback__)
+            if frame.line
+        ]
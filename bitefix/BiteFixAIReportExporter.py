@@ -0,0 +1,331 @@
+import atexit
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import List
+
+REPORT_SECTIONS = [
+    "## Error Diagnosis Report by Python Code Diagnosis Expert",
+    "## Error resolution ideas Report by Senior Python Code Expert",
+    "## Best Idea Evaluation Report by Lead Python Code Expert",
+    "## Resolution Idea Implemenation Report by Python Code Developer",
+]
+
+# Section of the only output of a report of the tiered mode that was not escalated.
+TRIAGE_SECTION = "## Error Triage Report by Python Code Triage Expert"
+
+
+def report_id() -> str:
+    """
+    Returns a unique report id starting with its microsecond timestamp, so that reports sort by creation time.
+    """
+    return f"{datetime.now().strftime('%Y%m%d%H%M%S%f')}_{uuid.uuid4().hex[:8]}"
+
+
+def report_file_name(id: str) -> str:
+    return f"BiteFixAIErrorResolutionReport_{id}.md"
+
+
+def render_report_section(stage: int, output: str) -> str:
+    if stage < 3:
+        output = output.replace("```", "")
+    return f"{REPORT_SECTIONS[stage]}\n\n{output}\n\n"
+
+
+def render_report(outputs: List[str]) -> str:
+    if len(outputs) == 1:
+        return f"# BiteFix AI Error Resolution Report\n\n{TRIAGE_SECTION}\n\n{outputs[0]}\n\n"
+    return "# BiteFix AI Error Resolution Report\n\n" + "".join(
+        render_report_section(stage, output) for stage, output in enumerate(outputs)
+    )
+
+
+def atomic_write(path: str, text: str) -> None:
+    """
+    Writes a file through a temporary file in the same directory, so that readers never see a partial file.
+    """
+    directory = os.path.dirname(path) or "."
+    file_descriptor, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, "w") as file:
+            file.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class BiteFixAIMarkdownSink:
+
+    """
+    Writes each report to its own Markdown file in a directory, atomically and under a collision-free name.
+    """
+
+    def __init__(self, export_dir: str):
+        self.export_dir = export_dir
+
+    def write(self, reports: List[dict]) -> None:
+        for report in reports:
+            path = os.path.join(self.export_dir, report_file_name(report["id"]))
+            atomic_write(path, render_report(report["outputs"]))
+            print(f"\nError Resolution Report has been saved to {path}")
+
+    def close(self) -> None:
+        pass
+
+
+class BiteFixAIJSONLinesSink:
+
+    """
+    Appends the reports to a JSON Lines file, one line per report and one write per batch.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, reports: List[dict]) -> None:
+        lines = "".join(json.dumps(report) + "\n" for report in reports)
+        with open(self.path, "a") as file:
+            file.write(lines)
+            file.flush()
+            os.fsync(file.fileno())
+
+    def close(self) -> None:
+        pass
+
+
+class BiteFixAISQLiteSink:
+
+    """
+    Inserts the reports into the `reports` table of a SQLite database, one transaction per batch.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection = None
+
+    def write(self, reports: List[dict]) -> None:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS reports ("
+                "id TEXT PRIMARY KEY, created_at TEXT, function TEXT, "
+                "fingerprint TEXT, error TEXT, outputs TEXT)"
+            )
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        report["id"],
+                        report["created_at"],
+                        report["function"],
+                        report["fingerprint"],
+                        report["error"],
+                        json.dumps(report["outputs"]),
+                    )
+                    for report in reports
+                ],
+            )
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class BiteFixAIReportExporter:
+
+    """
+    This class is responsible for exporting the error resolution reports without slowing down the failing calls.
+    Reports are queued and written by a background thread in batches, flushed when max_batch_size reports are queued
+    or flush_interval seconds after the oldest queued report. The queue is unbounded so bursts never drop reports,
+    and the reports still queued are flushed when the interpreter exits. A batch a sink fails to write is retried
+    max_retries times with an exponential backoff, before it is given up on and counted as failed for that sink.
+
+    Attributes:
+        sinks (list): Objects with `write(reports)` and `close()` methods receiving each batch, such as
+            BiteFixAIMarkdownSink, BiteFixAIJSONLinesSink or BiteFixAISQLiteSink.
+        max_batch_size (int): Number of queued reports triggering a flush.
+        flush_interval (float): Maximum number of seconds a report waits in the queue.
+        max_retries (int): Number of retries of a batch a sink failed to write.
+        retry_backoff (float): Seconds before the first retry, doubled for each following retry.
+
+    Methods:
+        export: Queues a report and returns it.
+        flush: Waits until every queued report has been written.
+        close: Flushes the queue, stops the background thread and closes the sinks.
+        stats: Returns the exported, failed, batches, retries, sink_errors and queued counters.
+            exported counts the reports written by every sink and failed the reports a sink gave up on.
+    """
+
+    def __init__(
+        self,
+        sinks: list,
+        max_batch_size: int = 32,
+        flush_interval: float = 1.0,
+        max_retries: int = 3,
+        retry_backoff: float = 0.1,
+    ):
+        if not sinks:
+            raise ValueError("At least one sink is needed.")
+        self.sinks = list(sinks)
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._writing = 0
+        self._flushing = 0
+        self._thread = None
+        self._closed = False
+        self._counters = {
+            "exported": 0,
+            "failed": 0,
+            "batches": 0,
+            "retries": 0,
+            "sink_errors": 0,
+        }
+
+    def export(
+        self,
+        outputs: List[str],
+        function: str = None,
+        fingerprint: str = None,
+        error: str = None,
+    ) -> dict:
+        """
+        Queues an error resolution report for the sinks.
+
+        Args:
+            outputs (List[str]): The outputs of the BiteFix AI tasks.
+            function (str, optional): The qualified name of the decorated function. Defaults to None.
+            fingerprint (str, optional): The fingerprint of the error. Defaults to None.
+            error (str, optional): The error message. Defaults to None.
+
+        Returns:
+            dict: The queued report, with its unique "id" and its "created_at" timestamp.
+        """
+        report = {
+            "id": report_id(),
+            "created_at": datetime.now().isoformat(),
+            "function": function,
+            "fingerprint": fingerprint,
+            "error": error,
+            "outputs": list(outputs),
+        }
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("The report exporter is closed.")
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._write_loop, name="bitefix-report-exporter", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.close)
+            self._queue.append((time.monotonic(), report))
+            if len(self._queue) >= self.max_batch_size:
+                self._condition.notify_all()
+        return report
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Waits until every queued report has been written.
+
+        Returns:
+            bool: False if the timeout expired first.
+        """
+        with self._condition:
+            self._flushing += 1
+            self._condition.notify_all()
+            try:
+                return self._condition.wait_for(
+                    lambda: not self._queue and not self._writing, timeout
+                )
+            finally:
+                self._flushing -= 1
+
+    def close(self) -> None:
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            atexit.unregister(self.close)
+        for sink in self.sinks:
+            sink.close()
+
+    def stats(self) -> dict:
+        with self._condition:
+            stats = dict(self._counters)
+            stats["queued"] = len(self._queue)
+        return stats
+
+    def _write_loop(self) -> None:
+        while True:
+            with self._condition:
+                while not self._closed and len(self._queue) < self.max_batch_size:
+                    if not self._queue:
+                        self._condition.wait()
+                        continue
+                    if self._flushing:
+                        break
+                    remaining = (
+                        self._queue[0][0] + self.flush_interval - time.monotonic()
+                    )
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                if not self._queue:
+                    self._condition.notify_all()
+                    return
+                batch = [
+                    self._queue.popleft()[1]
+                    for _ in range(min(len(self._queue), self.max_batch_size))
+                ]
+                self._writing += 1
+
+            errors = [self._write_batch(sink, batch) for sink in self.sinks]
+            written = all(error <= self.max_retries for error in errors)
+
+            with self._condition:
+                self._writing -= 1
+                self._counters["exported" if written else "failed"] += len(batch)
+                self._counters["batches"] += 1
+                self._counters["retries"] += sum(
+                    min(error, self.max_retries) for error in errors
+                )
+                self._counters["sink_errors"] += sum(errors)
+                self._condition.notify_all()
+
+    def _write_batch(self, sink: object, batch: List[dict]) -> int:
+        """
+        Writes a batch to a sink, retrying max_retries times with an exponential backoff.
+
+        Returns:
+            int: The number of failed attempts, max_retries + 1 if the batch could not be written.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                sink.write(batch)
+                return attempt
+            except Exception as exc:
+                print(
+                    "Error occurred while exporting the error resolution reports - ",
+                    exc,
+                )
+            if attempt < self.max_retries:
+                time.sleep(self.retry_backoff * 2**attempt)
+        return self.max_retries + 1
@@ -0,0 +1,362 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+from array import array
+from datetime import datetime
+from typing import Any, List, Optional
+from bitefix.BiteFixAICache import BiteFixAICache
+
+
+class BiteFixAIResolutionIndex:
+
+    """
+    This class is responsible for keeping a searchable local index of past error resolutions.
+    Each resolution is stored in a SQLite database with the outputs of the four tasks, the error fingerprint, the function identity,
+    and a MinHash signature of the function code and the error message. A new error is first matched on its exact fingerprint,
+    then on its signature through locality-sensitive hashing, so the same exception in a slightly edited function
+    finds the past resolution in a few milliseconds even with tens of thousands of stored resolutions.
+
+    The signature uses one-permutation MinHash: each token trigram of the code, without its comments, numbers and function name, and each token of the error message is hashed once,
+    and the signature keeps the minimum hash falling into each of `num_bins` bins. The bins are grouped into `bands`
+    for the candidate lookup, and the similarity of two signatures estimates the Jaccard similarity of their n-grams.
+
+    Attributes:
+        path (str): Path of the SQLite database.
+        threshold (float): Minimum similarity, between 0 and 1, of a near-duplicate match.
+        num_bins (int): Number of bins of the MinHash signatures.
+        bands (int): Number of locality-sensitive hashing bands. It should divide num_bins.
+
+    Methods:
+        add: Stores a resolution and returns its id.
+        search: Returns the past resolutions most similar to an error, best first.
+        get: Returns a stored resolution.
+        stats: Returns the number of stored resolutions.
+        close: Closes the database.
+    """
+
+    EMPTY = (1 << 64) - 1
+
+    def __init__(
+        self,
+        path: str = "bitefix_index.db",
+        threshold: float = 0.7,
+        num_bins: int = 64,
+        bands: int = 16,
+    ):
+        if num_bins % bands:
+            raise ValueError("The number of bands should divide the number of bins.")
+        self.path = path
+        self.threshold = threshold
+        self.num_bins = num_bins
+        self.bands = bands
+        self._rows = num_bins // bands
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS resolutions (
+                    id INTEGER PRIMARY KEY,
+                    created_at TEXT,
+                    fingerprint TEXT,
+                    function TEXT,
+                    exception_type TEXT,
+                    error TEXT,
+                    signature BLOB,
+                    outputs TEXT
+                );
+                CREATE INDEX IF NOT EXISTS resolutions_fingerprint ON resolutions (fingerprint);
+                CREATE TABLE IF NOT EXISTS bands (
+                    band INTEGER,
+                    hash INTEGER,
+                    resolution_id INTEGER
+                );
+                CREATE INDEX IF NOT EXISTS bands_hash ON bands (band, hash);
+                """)
+
+    def add(
+        self,
+        outputs: List[str],
+        code: str,
+        error: Any,
+        function: str = None,
+        fingerprint: str = None,
+    ) -> int:
+        """
+        Stores an error resolution.
+
+        Args:
+            outputs (List[str]): The outputs of the BiteFix AI tasks.
+            code (str): The source code of the function.
+            error (Any): The error raised by the function, or its message.
+            function (str, optional): The qualified name of the function. Defaults to None.
+            fingerprint (str, optional): The fingerprint of the error. Defaults to the BiteFixAICache fingerprint of the code and error.
+
+        Returns:
+            int: The id of the stored resolution.
+        """
+        if fingerprint is None:
+            fingerprint = BiteFixAICache.fingerprint(code, error)
+        exception_type, message = self._describe(error)
+        signature = self.signature(code, message)
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "INSERT INTO resolutions (created_at, fingerprint, function, exception_type, error, signature, outputs) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    datetime.now().isoformat(),
+                    fingerprint,
+                    function,
+                    exception_type,
+                    message,
+                    array("Q", signature).tobytes(),
+                    json.dumps(list(outputs)),
+                ),
+            )
+            resolution_id = cursor.lastrowid
+            self._connection.executemany(
+                "INSERT INTO bands (band, hash, resolution_id) VALUES (?, ?, ?)",
+                [
+                    (band, band_hash, resolution_id)
+                    for band, band_hash in enumerate(self._band_hashes(signature))
+                ],
+            )
+        return resolution_id
+
+    def search(
+        self,
+        code: str,
+        error: Any,
+        limit: int = 1,
+        threshold: float = None,
+        fingerprint: str = None,
+    ) -> List[dict]:
+        """
+        Returns the past resolutions most similar to an error, best first. Only resolutions of the same exception type, when it is known,
+        with a similarity of at least the threshold are returned. An exact fingerprint match has a similarity of 1.
+
+        Args:
+            code (str): The source code of the function. Can be empty to search on the error only.
+            error (Any): The error raised by the function, or a "ExceptionType: message" string.
+                Without code, the resolutions are compared on the tokens of their error message.
+            limit (int, optional): Maximum number of resolutions returned. Defaults to 1.
+            threshold (float, optional): Minimum similarity. Defaults to the threshold of the index.
+            fingerprint (str, optional): The fingerprint of the error. Defaults to the BiteFixAICache fingerprint of the code and error.
+
+        Returns:
+            List[dict]: The matching resolutions, each with its "similarity".
+        """
+        threshold = self.threshold if threshold is None else threshold
+        exception_type, message = self._describe(error)
+        if fingerprint is None and isinstance(error, BaseException):
+            fingerprint = BiteFixAICache.fingerprint(code, error)
+        if not code:
+            scores = self._message_scores(exception_type, message)
+        else:
+            scores = self._signature_scores(
+                exception_type, self.signature(code, message), fingerprint
+            )
+
+        best = sorted(
+            (
+                (similarity, resolution_id)
+                for resolution_id, similarity in scores.items()
+                if similarity >= threshold
+            ),
+            reverse=True,
+        )[:limit]
+        matches = []
+        for similarity, resolution_id in best:
+            resolution = self.get(resolution_id)
+            if resolution is not None:
+                resolution["similarity"] = similarity
+                matches.append(resolution)
+        return matches
+
+    def get(self, resolution_id: int) -> Optional[dict]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT * FROM resolutions WHERE id = ?", (resolution_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        resolution = self._resolution(row)
+        resolution.pop("signature")
+        return resolution
+
+    def stats(self) -> dict:
+        with self._lock:
+            (count,) = self._connection.execute(
+                "SELECT COUNT(*) FROM resolutions"
+            ).fetchone()
+        return {"resolutions": count}
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def _signature_scores(
+        self, exception_type: str, signature: List[int], fingerprint: str
+    ) -> dict:
+        """
+        Returns the similarity of the resolutions with the same fingerprint, or sharing a band with the signature, keyed by id.
+        """
+        with self._lock:
+            scores = {}
+            if fingerprint is not None:
+                scores.update(
+                    (row[0], 1.0)
+                    for row in self._connection.execute(
+                        "SELECT id FROM resolutions WHERE fingerprint = ?",
+                        (fingerprint,),
+                    )
+                )
+            candidates = set()
+            for band, band_hash in enumerate(self._band_hashes(signature)):
+                candidates.update(
+                    row[0]
+                    for row in self._connection.execute(
+                        "SELECT resolution_id FROM bands WHERE band = ? AND hash = ?",
+                        (band, band_hash),
+                    )
+                )
+            candidates.difference_update(scores)
+            if not candidates:
+                return scores
+            query = f"SELECT id, signature FROM resolutions WHERE id IN ({','.join('?' * len(candidates))})"
+            parameters = list(candidates)
+            if exception_type is not None:
+                query += " AND exception_type = ?"
+                parameters.append(exception_type)
+            rows = self._connection.execute(query, parameters).fetchall()
+        for resolution_id, other in rows:
+            scores[resolution_id] = self.similarity(
+                signature, array("Q", other).tolist()
+            )
+        return scores
+
+    def _message_scores(self, exception_type: str, message: str) -> dict:
+        """
+        Returns the Jaccard similarity of the error message tokens of the resolutions with the same exception type, keyed by id.
+        Only the resolutions whose error holds the longest token of the message are compared.
+        """
+        tokens = set(re.findall(r"\w+", BiteFixAICache.normalize_message(message)))
+        if not tokens:
+            return {}
+        query = "SELECT id, error FROM resolutions WHERE error LIKE ?"
+        parameters = [f"%{max(tokens, key=len)}%"]
+        if exception_type is not None:
+            query += " AND exception_type = ?"
+            parameters.append(exception_type)
+        with self._lock:
+            rows = self._connection.execute(query, parameters).fetchall()
+        scores = {}
+        for resolution_id, error in rows:
+            other = set(re.findall(r"\w+", BiteFixAICache.normalize_message(error)))
+            scores[resolution_id] = len(tokens & other) / len(tokens | other)
+        return scores
+
+    def signature(self, code: str, message: str) -> List[int]:
+        """
+        Returns the one-permutation MinHash signature of the token trigrams of the code and the tokens of the error message.
+        """
+        signature = [self.EMPTY] * self.num_bins
+        for shingle in self._shingles(code, message):
+            value = int.from_bytes(
+                hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(),
+                "little",
+            )
+            bin_index = value % self.num_bins
+            if value < signature[bin_index]:
+                signature[bin_index] = value
+        return self._densify(signature)
+
+    def _densify(self, signature: List[int]) -> List[int]:
+        """
+        Fills each empty bin from the next non-empty bin, shifted by their distance, so that short functions
+        with fewer n-grams than bins still get comparable signatures and distinct bands.
+        """
+        filled = [index for index, value in enumerate(signature) if value != self.EMPTY]
+        if not filled or len(filled) == self.num_bins:
+            return signature
+        densified = list(signature)
+        for index, value in enumerate(signature):
+            if value != self.EMPTY:
+                continue
+            distance = 1
+            while signature[(index + distance) % self.num_bins] == self.EMPTY:
+                distance += 1
+            source = signature[(index + distance) % self.num_bins]
+            densified[index] = (source + distance * 0x9E3779B97F4A7C15) % self.EMPTY
+        return densified
+
+    def similarity(self, signature: List[int], other: List[int]) -> float:
+        """
+        Estimates the Jaccard similarity of the n-grams behind two signatures, from the share of their equal bins.
+        """
+        compared = equal = 0
+        for value, other_value in zip(signature, other):
+            if value == other_value == self.EMPTY:
+                continue
+            compared += 1
+            equal += value == other_value
+        return equal / compared if compared else 0.0
+
+    def _band_hashes(self, signature: List[int]) -> List[int]:
+        return [
+            int.from_bytes(
+                hashlib.blake2b(
+                    array("Q", signature[start : start + self._rows]).tobytes(),
+                    digest_size=7,
+                ).digest(),
+                "little",
+            )
+            for start in range(0, self.num_bins, self._rows)
+        ]
+
+    @staticmethod
+    def _shingles(code: str, message: str) -> set:
+        code = re.sub(r"#[^\n]*", "", code or "")
+        code = re.sub(r"\b(def|class)\s+\w+", r"\1 NAME", code)
+        tokens = re.findall(r"[A-Za-z_]\w*|\S", re.sub(r"\d+", "N", code))
+        shingles = {
+            " ".join(tokens[index : index + 3]) for index in range(len(tokens) - 2)
+        }
+        shingles.update(
+            "message:" + token
+            for token in re.findall(r"\w+", BiteFixAICache.normalize_message(message))
+        )
+        return shingles
+
+    @staticmethod
+    def _describe(error: Any) -> tuple:
+        """
+        Returns the exception type and the message of an error, or of a "ExceptionType: message" string.
+        """
+        if isinstance(error, BaseException):
+            return type(error).__name__, str(error)
+        exception_type, separator, message = str(error).partition(":")
+        if separator and re.fullmatch(r"[\w.]+", exception_type.strip()):
+            return exception_type.strip().rsplit(".", 1)[-1], message.strip()
+        return None, str(error)
+
+    @staticmethod
+    def _resolution(row: tuple) -> dict:
+        resolution = dict(
+            zip(
+                (
+                    "id",
+                    "created_at",
+                    "fingerprint",
+                    "function",
+                    "exception_type",
+                    "error",
+                    "signature",
+                    "outputs",
+                ),
+                row,
+            )
+        )
+        resolution["outputs"] = json.loads(resolution["outputs"])
+        return resolution
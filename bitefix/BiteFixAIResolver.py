@@ -0,0 +1,960 @@
+import asyncio
+import contextlib
+import functools
+import inspect
+import os
+import threading
+import traceback
+import types
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Callable, List
+from bitefix.BiteFixAIRunner import BiteFixAIRunner
+from bitefix.BiteFixAIAgents import BiteFixAIAgents
+from bitefix.BiteFixAICache import BiteFixAICache
+from bitefix.BiteFixAIWorkerPool import BiteFixAIWorkerPool
+from bitefix.BiteFixAISingleFlight import BiteFixAISingleFlight
+from bitefix.BiteFixAIPolicy import BiteFixAIPolicy
+from bitefix.BiteFixAIInstrumentation import BiteFixAIInstrumentation
+from bitefix.BiteFixAIResolutionIndex import BiteFixAIResolutionIndex
+from bitefix.BiteFixAISnapshot import BiteFixAISnapshot
+from bitefix.BiteFixAISourceCache import BiteFixAISourceCache
+from bitefix.BiteFixAIVerifier import BiteFixAIVerifier
+from bitefix.BiteFixAIReportExporter import (
+    BiteFixAIReportExporter,
+    BiteFixAIMarkdownSink,
+)
+
+if TYPE_CHECKING:
+    from bitefix.BiteFixAIDaemon import BiteFixAIDaemonClient
+    from bitefix.BiteFixAIResponseMemo import BiteFixAIResponseMemo
+
+
+class BiteFixAIResolver:
+
+    """
+    This class is responsible for resolving the errors raised by decorated functions with the BiteFix AI Agents.
+    It is built once per decorator configuration, and wraps functions so that a successful call costs about as much as a bare call:
+    the description check, the LLM and the source capture are all done at decoration time.
+
+    Attributes:
+        llm (object): The language model object to use for error resolution.
+        llm_factory (Callable[[], object]): Builds the language model object on the first error resolution when llm is None,
+            so that decorating functions does not import the LLM client.
+        daemon (BiteFixAIDaemonClient): Sends the snapshots of the errors to a BiteFixAIDaemon resolving them in another process,
+            instead of resolving them in this process. The other options then only apply to the daemon's own resolver.
+        export_dir (str): The directory to export the error resolution report. The reports are written by a background BiteFixAIReportExporter,
+            except in the stream mode, where each stage is appended to the report file as soon as it is produced.
+        verbose (bool): Whether to print the output of the BiteFix AI process.
+        cache (BiteFixAICache): The cache used to reuse the error resolution report of a repeated error. Triage results of the tiered mode are not cached,
+            so a repeated error is triaged again and can still escalate.
+        worker_pool (BiteFixAIWorkerPool): Runs the error resolution in the background.
+        single_flight (BiteFixAISingleFlight): Makes concurrent identical errors share one in-flight error resolution.
+        policy (BiteFixAIPolicy): Sampling, rate limits and circuit breaker deciding which errors are resolved.
+        on_resolved (Callable): Called with the list of task outputs once the error resolution report is ready.
+        reraise (bool): Whether to re-raise the error instead of returning None.
+        process (str): The process of the BiteFixAIRunner, "sequential" or "parallel".
+        idea_generators (int): Number of idea generation tasks run concurrently in the "parallel" process.
+        max_prompt_tokens (int): Token ceiling of each task prompt. None means no ceiling.
+        stream (bool): Whether to print and export the output of each stage as soon as it is produced instead of once all of them are complete.
+        stage_llms (dict): LLM objects overriding llm for some stages, keyed by the stage name (see BiteFixAIAgents.STAGES).
+        tiered (bool): Whether to run a single triage call first and only run the full crew when the triage calls for it.
+        escalate_confidence (float): In the tiered mode, the full crew runs when the triage confidence is below this value.
+        escalate_severity (float): In the tiered mode, the full crew runs when the triage severity is at least this value.
+        instrumentation (BiteFixAIInstrumentation): Records the spans and metrics of the decorated functions and their error resolutions. None disables it.
+        exporter (BiteFixAIReportExporter): Exports the error resolution reports to its sinks in the background.
+        index (BiteFixAIResolutionIndex): Index of past error resolutions. A new error reuses the resolution of a near-duplicate past error
+            instead of running the crew, and each new resolution by the full crew is added to it.
+        source_cache (BiteFixAISourceCache): Finds the source code of the decorated functions once, again when their file changes,
+            and extracts the code around the failing lines of the other functions in the traceback.
+        verifier (BiteFixAIVerifier): Runs the fixes of the full crew on the failing arguments in sandboxed subprocesses,
+            and appends the result to the answer of the code developer. None disables the verification.
+        prompt_layout (str): "default" or "prefix". "prefix" starts the prompts of all the stages with the same shared context block,
+            the function code, description, arguments and error, so that the provider can cache it across the stages of an error.
+        response_memo (BiteFixAIResponseMemo): Reuses the LLM responses to prompts already sent with the same model parameters. None disables it.
+
+    Methods:
+        wrap: Returns the decorated version of a function or coroutine function.
+        resolve_error: Records a snapshot of an error raised by a wrapped function and resolves it, inline or in the background.
+        resolve_exception: Records a snapshot of an uncaught error from its traceback and resolves it, such as from an excepthook.
+        aresolve_error: Async counterpart of resolve_error.
+        resolve_snapshot: Resolves a recorded BiteFixAISnapshot, inline or in the background.
+        aresolve_snapshot: Async counterpart of resolve_snapshot.
+        escalate: Runs the full crew on an error that was only triaged.
+        warmup: Imports the agent stack and builds the language model object ahead of the first error resolution.
+        warmup_stack: Imports the agent stack ahead of the first error resolution.
+    """
+
+    REPORT_HEADINGS = [
+        "[PYTHON CODE DIAGNOSIS EXPERT] Error Diagnosis :\n\n",
+        "\n\n[SENIOR PYTHON CODE EXPERT] Error resolution Ideas :\n\n",
+        "\n\n[LEAD PYTHON CODE EXPERT] Best Idea Evaluation :\n\n",
+        "\n\n[PYTHON CODE DEVELOPER] Resolution Idea Implemenation :\n\n",
+    ]
+    TRIAGE_HEADING = "[PYTHON CODE TRIAGE EXPERT] Error Triage :\n\n"
+
+    # Number of triaged errors kept for a later escalation.
+    MAX_TRIAGED = 32
+
+    def __init__(
+        self,
+        llm: object,
+        export_dir: str = None,
+        verbose: bool = True,
+        cache: BiteFixAICache = None,
+        worker_pool: BiteFixAIWorkerPool = None,
+        single_flight: BiteFixAISingleFlight = None,
+        policy: BiteFixAIPolicy = None,
+        on_resolved: Callable[[List[str]], None] = None,
+        reraise: bool = False,
+        process: str = "sequential",
+        idea_generators: int = 1,
+        max_prompt_tokens: int = None,
+        stream: bool = False,
+        stage_llms: dict = None,
+        tiered: bool = False,
+        escalate_confidence: float = 0.5,
+        escalate_severity: float = 0.7,
+        instrumentation: BiteFixAIInstrumentation = None,
+        exporter: BiteFixAIReportExporter = None,
+        index: BiteFixAIResolutionIndex = None,
+        llm_factory: Callable[[], object] = None,
+        daemon: "BiteFixAIDaemonClient" = None,
+        source_cache: BiteFixAISourceCache = None,
+        verifier: BiteFixAIVerifier = None,
+        prompt_layout: str = "default",
+        response_memo: "BiteFixAIResponseMemo" = None,
+    ):
+        if process not in BiteFixAIRunner.PROCESSES:
+            raise ValueError(
+                f"The process should be one of {', '.join(BiteFixAIRunner.PROCESSES)}."
+            )
+        unknown_stages = set(stage_llms or {}) - set(BiteFixAIAgents.STAGES)
+        if unknown_stages:
+            raise ValueError(
+                f"Unknown stages {', '.join(sorted(unknown_stages))}. The stages are {', '.join(BiteFixAIAgents.STAGES)}."
+            )
+        if prompt_layout not in BiteFixAIAgents.PROMPT_LAYOUTS:
+            raise ValueError(
+                f"The prompt layout should be one of {', '.join(BiteFixAIAgents.PROMPT_LAYOUTS)}."
+            )
+        if llm is None and llm_factory is None and daemon is None:
+            raise ValueError("Either llm, llm_factory or daemon is needed.")
+        self.llm = llm
+        self.llm_factory = llm_factory
+        self.daemon = daemon
+        self.export_dir = export_dir
+        self.verbose = verbose
+        self.cache = cache
+        self.worker_pool = worker_pool
+        self.single_flight = single_flight
+        self.policy = policy
+        self.on_resolved = on_resolved
+        self.reraise = reraise
+        self.process = process
+        self.idea_generators = idea_generators
+        self.max_prompt_tokens = max_prompt_tokens
+        self.stream = stream
+        self.stage_llms = stage_llms
+        self.tiered = tiered
+        self.escalate_confidence = escalate_confidence
+        self.escalate_severity = escalate_severity
+        self.instrumentation = instrumentation
+        self.exporter = exporter
+        self.index = index
+        self.source_cache = (
+            source_cache if source_cache is not None else BiteFixAISourceCache()
+        )
+        self.verifier = verifier
+        self.prompt_layout = prompt_layout
+        self.response_memo = response_memo
+        if response_memo is not None:
+            response_memo.check_temperature(llm)
+            for stage, stage_llm in (stage_llms or {}).items():
+                response_memo.check_temperature(
+                    stage_llm, name=f"The LLM of the {stage} stage"
+                )
+        self._export_dir_exporter = (
+            BiteFixAIReportExporter([BiteFixAIMarkdownSink(export_dir)])
+            if export_dir
+            else None
+        )
+        self._triaged = OrderedDict()
+        self._agents = None
+        self._lock = threading.Lock()
+
+    def wrap(
+        self,
+        func: Callable,
+        function_description: str = None,
+        capture_source: bool = True,
+        reraise: bool = None,
+    ) -> Callable:
+        """
+        Returns the decorated version of a function. The wrapper keeps the metadata of the function
+        and does nothing but call it unless it raises, or count the call when the instrumentation counts calls.
+
+        Args:
+            func (Callable): The function or coroutine function to decorate.
+            function_description (str, optional): The description of the function. Defaults to None.
+            capture_source (bool, optional): Whether to find the source code of the function now rather than on its first error,
+                so that it is still known if its file changes or goes away. Defaults to True.
+            reraise (bool, optional): Whether the wrapper raises the error again after resolving it. Defaults to None, the reraise attribute of the resolver.
+
+        Returns:
+            Callable: The decorated function.
+        """
+        code = None
+        if capture_source:
+            with self._span("bitefix.source_capture", function=self._policy_key(func)):
+                code = self.source_cache.source(func)
+        resolve_error = self.resolve_error
+        reraise = self.reraise if reraise is None else reraise
+        call = func
+        if self.instrumentation is not None and self.instrumentation.count_calls:
+            call = self._counted(func)
+
+        if inspect.iscoroutinefunction(func):
+            aresolve_error = self.aresolve_error
+
+            @functools.wraps(func)
+            async def async_function_causing_error(*args, **kwargs) -> Any:
+                try:
+                    return await call(*args, **kwargs)
+                except Exception as e:
+                    await aresolve_error(
+                        func, function_description, code, args, e, kwargs
+                    )
+                    if reraise:
+                        raise
+                    return None
+
+            async_function_causing_error.bitefix_resolver = self
+            return async_function_causing_error
+
+        @functools.wraps(func)
+        def function_causing_error(*args, **kwargs) -> Any:
+            try:
+                return call(*args, **kwargs)
+            except Exception as e:
+                resolve_error(func, function_description, code, args, e, kwargs)
+                if reraise:
+                    raise
+                return None
+
+        function_causing_error.bitefix_resolver = self
+        return function_causing_error
+
+    def resolve_error(
+        self,
+        func: Callable,
+        function_description: str,
+        code: str,
+        arguments: tuple,
+        error: Exception,
+        keyword_arguments: dict = None,
+    ) -> None:
+        """
+        Records a BiteFixAISnapshot of the error, then resolves it inline, or hands it to the worker pool when one is configured.
+        The resolution only works from the snapshot, so the error, its frames and the arguments are not kept alive by it.
+        In the background mode the future of the resolution is attached to the error as `bitefix_future`.
+        An error is only resolved once, so an error re-raised through several wrapped functions is resolved by the innermost one.
+
+        Args:
+            func (Callable): The decorated function.
+            function_description (str): The description of the decorated function.
+            code (str): The source code of the decorated function captured at decoration time, used when it is no longer available.
+            arguments (tuple): Positional arguments passed to the decorated function.
+            error (Exception): The error raised by the decorated function.
+            keyword_arguments (dict, optional): Keyword arguments passed to the decorated function. Defaults to None.
+
+        Returns:
+            None
+        """
+        if not self._claim(error):
+            return None
+        snapshot = self._snapshot(
+            func, function_description, code, arguments, keyword_arguments, error
+        )
+        future = self.resolve_snapshot(snapshot)
+        if self.worker_pool is not None and self.daemon is None:
+            error.bitefix_future = future
+        return None
+
+    def resolve_exception(
+        self, error: BaseException, function_description: str = None
+    ) -> Any:
+        """
+        Records a BiteFixAISnapshot of an error that was not raised by a wrapped function, such as an uncaught error given to an excepthook,
+        and resolves it. The failing function is the innermost frame of the traceback outside the standard library and the installed packages.
+        Errors already resolved by a wrapped function are skipped.
+
+        Args:
+            error (BaseException): The error, with its traceback.
+            function_description (str, optional): The description of the failing function. Defaults to None.
+
+        Returns:
+            Any: The same as resolve_snapshot, or None if the error was already resolved.
+        """
+        if not self._claim(error):
+            return None
+        frames = [frame for frame, _ in traceback.walk_tb(error.__traceback__)]
+        user_frames = [
+            frame
+            for frame in frames
+            if not os.path.abspath(frame.f_code.co_filename).startswith(
+                BiteFixAISourceCache.LIBRARY_PATHS
+            )
+        ]
+        frame = (user_frames or frames or [None])[-1]
+        if frame is None:
+            func = types.SimpleNamespace(
+                __module__="__main__", __qualname__="<unknown>"
+            )
+            code = None
+        else:
+            qualname = getattr(frame.f_code, "co_qualname", frame.f_code.co_name)
+            func = types.SimpleNamespace(
+                __module__=frame.f_globals.get("__name__", "__main__"),
+                __qualname__=qualname,
+            )
+            if frame.f_code.co_name == "<module>":
+                code = self.source_cache.frame_code(
+                    [(frame.f_code.co_filename, frame.f_lineno, qualname)]
+                )
+            else:
+                func.__code__ = frame.f_code
+                code = None
+        frames = user_frames = frame = None
+        snapshot = self._snapshot(func, function_description, code, (), {}, error)
+        return self.resolve_snapshot(snapshot)
+
+    async def aresolve_error(
+        self,
+        func: Callable,
+        function_description: str,
+        code: str,
+        arguments: tuple,
+        error: Exception,
+        keyword_arguments: dict = None,
+    ) -> None:
+        """
+        Async counterpart of resolve_error. Awaits the error resolution on the running event loop unless a worker pool or a daemon is configured.
+        """
+        if self.worker_pool is not None or self.daemon is not None:
+            return self.resolve_error(
+                func, function_description, code, arguments, error, keyword_arguments
+            )
+        if not self._claim(error):
+            return None
+
+        snapshot = self._snapshot(
+            func, function_description, code, arguments, keyword_arguments, error
+        )
+        await self.aresolve_snapshot(snapshot)
+        return None
+
+    def resolve_snapshot(self, snapshot: BiteFixAISnapshot) -> Any:
+        """
+        Resolves a recorded failure inline, or hands it to the worker pool when one is configured.
+        Snapshots recorded in another process, or loaded from disk with BiteFixAISnapshot.from_dict, can be resolved with it.
+
+        Args:
+            snapshot (BiteFixAISnapshot): The snapshot of the failure.
+
+        Returns:
+            Any: The outputs of the tasks, or the future of the resolution in the background mode,
+                or whether the snapshot was buffered for the daemon.
+        """
+        if self.daemon is not None:
+            sent = self.daemon.send(snapshot)
+            if sent:
+                print("BiteFix AI error resolution was sent to the daemon.\n")
+            else:
+                print(
+                    "BiteFix AI daemon client is full, the error resolution was dropped.\n"
+                )
+            return sent
+
+        if self.worker_pool is None:
+            outputs = self._resolve(snapshot)
+            if self.on_resolved is not None and outputs is not None:
+                self.on_resolved(outputs)
+            return outputs
+
+        future = self.worker_pool.submit(
+            self._resolve,
+            snapshot,
+            key=snapshot.fingerprint,
+            callback=self.on_resolved,
+        )
+        if future is None:
+            print("BiteFix AI worker pool is full, the error resolution was dropped.\n")
+        else:
+            print("BiteFix AI is resolving the error in the background.\n")
+        if self.instrumentation is not None:
+            self.instrumentation.count(
+                "bitefix.queue.submitted"
+                if future is not None
+                else "bitefix.queue.dropped"
+            )
+            self.instrumentation.observe(
+                "bitefix.queue.depth", self.worker_pool.stats()["queued"]
+            )
+        return future
+
+    async def aresolve_snapshot(self, snapshot: BiteFixAISnapshot) -> Any:
+        """
+        Async counterpart of resolve_snapshot.
+        """
+        if self.worker_pool is not None or self.daemon is not None:
+            return self.resolve_snapshot(snapshot)
+        outputs = await self._aresolve(snapshot)
+        if self.on_resolved is not None and outputs is not None:
+            self.on_resolved(outputs)
+        return outputs
+
+    def escalate(self, fingerprint: str = None) -> List[str]:
+        """
+        Runs the full crew on an error that the tiered mode only triaged, bypassing the policy.
+        The resolver of a decorated function is available as its `bitefix_resolver` attribute.
+
+        Args:
+            fingerprint (str, optional): The fingerprint of the error, printed with its triage. Defaults to the latest triaged error.
+
+        Returns:
+            List[str]: The outputs of the four tasks, or None if BiteFix AI failed.
+        """
+        with self._lock:
+            if fingerprint is None and self._triaged:
+                fingerprint = next(reversed(self._triaged))
+            snapshot = self._triaged.pop(fingerprint, None)
+        if snapshot is None:
+            raise ValueError("There is no triaged error to escalate.")
+
+        print("Escalating the error to the full BiteFix AI crew ...\n")
+        streamed = []
+        try:
+            outputs = self._run(snapshot, streamed=streamed, escalated=True)
+        except Exception as ex:
+            print("Error occurred while running BiteFix AI - ", ex)
+            return None
+        if self.on_resolved is not None:
+            self.on_resolved(outputs)
+        return outputs
+
+    def warmup(self) -> None:
+        """
+        Imports the crewai agent stack and builds the language model object, which otherwise happens on the first error resolution.
+        """
+        self.warmup_stack()
+        self._llm()
+
+    @staticmethod
+    def warmup_stack() -> None:
+        import bitefix.BiteFixAICrew
+        import bitefix.BiteFixAITasks
+        import bitefix.BiteFixAILLMCallbackHandler
+
+    def _llm(self) -> object:
+        if self.llm is None:
+            with self._lock:
+                if self.llm is None:
+                    self.llm = self.llm_factory()
+        return self.llm
+
+    def _snapshot(
+        self,
+        func: Callable,
+        function_description: str,
+        code: str,
+        arguments: tuple,
+        keyword_arguments: dict,
+        error: Exception,
+    ) -> BiteFixAISnapshot:
+        print("Error occurred while executing the function. - ", error)
+        if self.instrumentation is not None:
+            self.instrumentation.count(
+                "bitefix.errors", function=self._policy_key(func)
+            )
+        with self._span("bitefix.snapshot", function=self._policy_key(func)):
+            code = (
+                self.source_cache.source(func)
+                or code
+                or f"# The source code of {func.__qualname__} is not available."
+            )
+            return BiteFixAISnapshot.capture(
+                func,
+                code,
+                function_description,
+                arguments,
+                keyword_arguments,
+                error,
+                source_cache=self.source_cache,
+                keep_arguments=self.verifier is not None,
+            )
+
+    def _resolve(self, snapshot: BiteFixAISnapshot) -> List[str]:
+        """
+        Runs the BiteFix AI Agents on the snapshot of the error, or reuses the cached report of the same error.
+        The report of a run is printed and exported once, by the run, even when concurrent callers share it through the single flight.
+
+        Returns:
+            List[str]: The outputs of the four tasks, or None if BiteFix AI failed or the policy suppressed the resolution.
+        """
+        with self._span("bitefix.resolution", function=snapshot.function) as attributes:
+            outputs = self._cached_outputs(snapshot)
+            streamed = []
+            attributes["outcome"] = "cached"
+
+            if outputs is None:
+                print("Starting Bite Fix AI ...\n")
+                try:
+                    if self.single_flight is not None:
+                        outputs = self.single_flight.do(
+                            snapshot.fingerprint,
+                            self._run,
+                            snapshot,
+                            streamed=streamed,
+                        )
+                    else:
+                        outputs = self._run(snapshot, streamed=streamed)
+                except Exception as ex:
+                    print("Error occurred while running BiteFix AI - ", ex)
+                    attributes["outcome"] = "failed"
+                    return None
+                if outputs is None:
+                    print("BiteFix AI error resolution was suppressed by the policy.\n")
+                    attributes["outcome"] = "suppressed"
+                    return None
+                attributes["outcome"] = "resolved"
+            else:
+                self._report_outputs(outputs, snapshot)
+            return outputs
+
+    async def _aresolve(self, snapshot: BiteFixAISnapshot) -> List[str]:
+        """
+        Async counterpart of _resolve.
+        """
+        with self._span("bitefix.resolution", function=snapshot.function) as attributes:
+            outputs = self._cached_outputs(snapshot)
+            streamed = []
+            attributes["outcome"] = "cached"
+
+            if outputs is None:
+                print("Starting Bite Fix AI ...\n")
+                try:
+                    if self.single_flight is not None:
+                        outputs = await self.single_flight.ado(
+                            snapshot.fingerprint,
+                            self._arun,
+                            snapshot,
+                            streamed=streamed,
+                        )
+                    else:
+                        outputs = await self._arun(snapshot, streamed=streamed)
+                except Exception as ex:
+                    print("Error occurred while running BiteFix AI - ", ex)
+                    attributes["outcome"] = "failed"
+                    return None
+                if outputs is None:
+                    print("BiteFix AI error resolution was suppressed by the policy.\n")
+                    attributes["outcome"] = "suppressed"
+                    return None
+                attributes["outcome"] = "resolved"
+            else:
+                self._report_outputs(outputs, snapshot)
+            return outputs
+
+    def _run(
+        self,
+        snapshot: BiteFixAISnapshot,
+        streamed: list = None,
+        escalated: bool = False,
+    ) -> List[str]:
+        """
+        Runs the BiteFix AI Agents, stores the report in the cache and reports it.
+        In the tiered mode only the triage agent runs, unless its scores call for the full crew or the error is `escalated`.
+        In the stream mode each stage is reported as soon as it is produced, and True is appended to `streamed`.
+
+        Returns:
+            List[str]: The outputs of the tasks, or None if the policy suppressed the resolution.
+        """
+        if (
+            not escalated
+            and self.policy is not None
+            and not self.policy.admit(snapshot.function)
+        ):
+            return None
+        try:
+            biteFixAIRunner = self._runner(snapshot)
+            result = None
+            if self.tiered and not escalated:
+                result = self._triage(biteFixAIRunner.triage(), snapshot)
+            if result is None and self.stream:
+                report = {}
+                for event in biteFixAIRunner.stream():
+                    result = self._report_event(event, report, streamed)
+            elif result is None:
+                result = biteFixAIRunner.run()
+        except Exception:
+            if self.policy is not None:
+                self.policy.record_failure()
+            raise
+        outputs = self._store_outputs(result, snapshot)
+        self._report_run(outputs, snapshot, streamed)
+        return outputs
+
+    async def _arun(
+        self,
+        snapshot: BiteFixAISnapshot,
+        streamed: list = None,
+    ) -> List[str]:
+        """
+        Async counterpart of _run. The outputs are stored in a worker thread when that means disk or subprocess work,
+        which is verifying the code, writing the on-disk cache or adding to the resolution index, so the event loop is not blocked.
+        """
+        if self.policy is not None and not self.policy.admit(snapshot.function):
+            return None
+        try:
+            biteFixAIRunner = self._runner(snapshot)
+            result = None
+            if self.tiered:
+                result = self._triage(await biteFixAIRunner.atriage(), snapshot)
+            if result is None and self.stream:
+                report = {}
+                async for event in biteFixAIRunner.astream():
+                    result = self._report_event(event, report, streamed)
+            elif result is None:
+                result = await biteFixAIRunner.arun()
+        except Exception:
+            if self.policy is not None:
+                self.policy.record_failure()
+            raise
+        if (
+            self.verifier is not None
+            or self.index is not None
+            or (self.cache is not None and self.cache.cache_dir)
+        ):
+            outputs = await asyncio.get_running_loop().run_in_executor(
+                None, self._store_outputs, result, snapshot
+            )
+        else:
+            outputs = self._store_outputs(result, snapshot)
+        self._report_run(outputs, snapshot, streamed)
+        return outputs
+
+    def _runner(self, snapshot: BiteFixAISnapshot) -> BiteFixAIRunner:
+        return BiteFixAIRunner.from_snapshot(
+            snapshot,
+            llm=self._llm(),
+            process=self.process,
+            idea_generators=self.idea_generators,
+            max_prompt_tokens=self.max_prompt_tokens,
+            stage_llms=self.stage_llms,
+            instrumentation=self.instrumentation,
+            agents=self._reused_agents(),
+            prompt_layout=self.prompt_layout,
+            response_memo=self.response_memo,
+        )
+
+    def _reused_agents(self) -> BiteFixAIAgents:
+        """
+        Returns the agents reused by all the error resolutions of this resolver, built on the first one.
+        """
+        if self._agents is None:
+            llm = self._llm()
+            with self._lock:
+                if self._agents is None:
+                    self._agents = BiteFixAIAgents(
+                        llm=llm,
+                        stage_llms=self.stage_llms,
+                        instrumentation=self.instrumentation,
+                        reuse=True,
+                        prompt_layout=self.prompt_layout,
+                        response_memo=self.response_memo,
+                    )
+        return self._agents
+
+    def _triage(self, result: dict, snapshot: BiteFixAISnapshot) -> dict:
+        """
+        Decides from the triage scores whether the full crew should run.
+
+        Returns:
+            dict: The triage result if it is enough, or None if the full crew should run.
+        """
+        confidence, severity = result["confidence"], result["severity"]
+        print(f"BiteFix AI triage - confidence: {confidence}, severity: {severity}.\n")
+        if (
+            confidence is None
+            or confidence < self.escalate_confidence
+            or (severity is not None and severity >= self.escalate_severity)
+        ):
+            print("Escalating the error to the full BiteFix AI crew ...\n")
+            return None
+
+        fingerprint = snapshot.fingerprint
+        with self._lock:
+            self._triaged[fingerprint] = snapshot
+            self._triaged.move_to_end(fingerprint)
+            while len(self._triaged) > self.MAX_TRIAGED:
+                self._triaged.popitem(last=False)
+        print(
+            f"Call escalate('{fingerprint}') on the BiteFix AI resolver to run the full crew on this error.\n"
+        )
+        return result
+
+    def _store_outputs(self, result: dict, snapshot: BiteFixAISnapshot) -> List[str]:
+        if self.policy is not None:
+            self.policy.record_success()
+        if self.instrumentation is not None:
+            for task, size in result["prompt_sizes"].items():
+                self.instrumentation.observe("bitefix.prompt_size", size, task=task)
+        outputs = [output.result() for output in result["tasks_outputs"]]
+        if self.verifier is not None and len(outputs) == len(self.REPORT_HEADINGS):
+            outputs[-1] = self._verify(outputs, snapshot)
+        if self.cache is not None and len(outputs) == len(self.REPORT_HEADINGS):
+            try:
+                self.cache.set(snapshot.fingerprint, outputs)
+            except Exception as exc:
+                print(
+                    "Error occurred while caching the error resolution report - ", exc
+                )
+        if self.index is not None and len(outputs) == len(self.REPORT_HEADINGS):
+            try:
+                self.index.add(
+                    outputs,
+                    snapshot.function_code,
+                    self._error_text(snapshot),
+                    function=snapshot.function,
+                    fingerprint=snapshot.fingerprint,
+                )
+            except Exception as exc:
+                print(
+                    "Error occurred while indexing the error resolution report - ", exc
+                )
+        return outputs
+
+    def _verify(self, outputs: List[str], snapshot: BiteFixAISnapshot) -> str:
+        """
+        Verifies the fix of the code developer, and the other candidates written from the chosen idea, on the failing arguments.
+
+        Returns:
+            str: The answer of the code developer followed by the verification result.
+        """
+        function_name = snapshot.function.rsplit(".", 1)[-1]
+        answers = [outputs[-1]]
+        with self._span("bitefix.verification", function=snapshot.function):
+            try:
+                answers += self._runner(snapshot).candidates(
+                    outputs[-2], self.verifier.candidates - 1
+                )
+            except Exception as exc:
+                print("Error occurred while writing the candidate fixes - ", exc)
+            verification = self.verifier.verify(
+                [
+                    self.verifier.extract_code(answer, function_name)
+                    for answer in answers
+                ],
+                snapshot,
+            )
+        summary = self.verifier.summary(verification)
+        print(f"{summary}\n")
+        if self.instrumentation is not None:
+            self.instrumentation.count(
+                "bitefix.verification.passed"
+                if verification["passed"] is not None
+                else "bitefix.verification.failed"
+            )
+        return f"{outputs[-1]}\n\n{summary}"
+
+    def _cached_outputs(self, snapshot: BiteFixAISnapshot) -> List[str]:
+        """
+        Looks the error up in the cache, then in the index of past error resolutions.
+
+        Returns:
+            List[str]: The reused outputs, or None.
+        """
+        outputs = None
+        if self.cache is not None:
+            outputs = self.cache.get(snapshot.fingerprint)
+            if self.instrumentation is not None:
+                self.instrumentation.count(
+                    "bitefix.cache.hits"
+                    if outputs is not None
+                    else "bitefix.cache.misses"
+                )
+            if outputs is not None:
+                print("Reusing the cached BiteFix AI Error Resolution Report.\n")
+        if outputs is None and self.index is not None:
+            outputs = self._indexed_outputs(snapshot)
+        return outputs
+
+    def _indexed_outputs(self, snapshot: BiteFixAISnapshot) -> list:
+        try:
+            with self._span("bitefix.index.search"):
+                matches = self.index.search(
+                    snapshot.function_code,
+                    self._error_text(snapshot),
+                    fingerprint=snapshot.fingerprint,
+                )
+        except Exception as exc:
+            print("Error occurred while searching the error resolution index - ", exc)
+            return None
+        if self.instrumentation is not None:
+            self.instrumentation.count(
+                "bitefix.index.hits" if matches else "bitefix.index.misses"
+            )
+        if not matches:
+            return None
+        match = matches[0]
+        print(
+            f"Reusing the BiteFix AI Error Resolution Report of a similar past error "
+            f"(resolution {match['id']} of {match['function']}, similarity {match['similarity']:.2f}).\n"
+        )
+        return match["outputs"]
+
+    def _report_outputs(
+        self, outputs: List[str], snapshot: BiteFixAISnapshot = None
+    ) -> None:
+        """
+        Prints the error resolution report if verbose and queues it for the exporter and the export directory.
+        """
+        if self.verbose:
+            print("BiteFix AI Error Resoltion Report: \n\n")
+            if len(outputs) == 1:
+                print(self.TRIAGE_HEADING, outputs[0], flush=True)
+            else:
+                for stage, output in enumerate(outputs):
+                    self._print_stage(stage, output)
+
+        for exporter in (self.exporter, self._export_dir_exporter):
+            self._export(exporter, outputs, snapshot)
+
+    def _report_run(
+        self, outputs: List[str], snapshot: BiteFixAISnapshot, streamed: list
+    ) -> None:
+        """
+        Reports the outputs of a run. It is called by the run itself, so the callers sharing a run through the single flight
+        do not report it again. A streamed report was already printed stage by stage and is only exported.
+        """
+        print("BiteFix AI completed.\n")
+        if streamed:
+            self._export(self.exporter, outputs, snapshot)
+        else:
+            self._report_outputs(outputs, snapshot)
+
+    def _export(
+        self,
+        exporter: BiteFixAIReportExporter,
+        outputs: List[str],
+        snapshot: BiteFixAISnapshot,
+    ) -> None:
+        if exporter is None:
+            return
+        try:
+            exporter.export(
+                outputs,
+                function=snapshot.function if snapshot is not None else None,
+                fingerprint=snapshot.fingerprint if snapshot is not None else None,
+                error=snapshot.error_message if snapshot is not None else None,
+            )
+        except Exception as exc:
+            print(
+                "Error occurred while exporting the error resolution report - ",
+                exc,
+            )
+
+    def _report_event(self, event: dict, report: dict, streamed: list) -> dict:
+        """
+        Prints and appends to the exported report the output of a stage streamed by the BiteFixAIRunner.
+
+        Returns:
+            dict: The result of the BiteFixAIRunner once the "result" event is reached, otherwise None.
+        """
+        if event["event"] == "result":
+            if streamed is not None:
+                streamed.append(True)
+            if report.get("path"):
+                print(f"\nError Resolution Report has been saved to {report['path']}")
+            return event["result"]
+        if event["event"] != "output":
+            return None
+
+        stage = event["stage"]
+        if self.verbose:
+            if stage == 0:
+                print("BiteFix AI Error Resoltion Report: \n\n")
+            self._print_stage(stage, event["text"])
+
+        if self.export_dir:
+            from bitefix.bitefix_utils import (
+                start_error_resolution_report,
+                append_error_resolution_report,
+            )
+
+            try:
+                if "path" not in report:
+                    report["path"] = None
+                    report["path"] = start_error_resolution_report(self.export_dir)
+                if report["path"]:
+                    append_error_resolution_report(report["path"], stage, event["text"])
+            except Exception as exc:
+                report["path"] = None
+                print(
+                    "Error occurred while exporting the error resolution report - ",
+                    exc,
+                )
+        return None
+
+    def _print_stage(self, stage: int, output: str) -> None:
+        if stage < 3:
+            output = output.replace("```", "")
+        print(self.REPORT_HEADINGS[stage], output, flush=True)
+
+    def _span(self, name: str, **attributes: Any) -> contextlib.AbstractContextManager:
+        if self.instrumentation is None:
+            return contextlib.nullcontext(attributes)
+        return self.instrumentation.span(name, **attributes)
+
+    def _counted(self, func: Callable) -> Callable:
+        """
+        Returns a function counting the calls of func before calling it.
+        """
+        count_call = functools.partial(
+            self.instrumentation.count, "bitefix.calls", function=self._policy_key(func)
+        )
+
+        if inspect.iscoroutinefunction(func):
+
+            async def counted(*args, **kwargs) -> Any:
+                count_call()
+                return await func(*args, **kwargs)
+
+            return counted
+
+        def counted(*args, **kwargs) -> Any:
+            count_call()
+            return func(*args, **kwargs)
+
+        return counted
+
+    @staticmethod
+    def _error_text(snapshot: BiteFixAISnapshot) -> str:
+        return f"{snapshot.exception_type}: {snapshot.error_message}"
+
+    @staticmethod
+    def _claim(error: BaseException) -> bool:
+        """
+        Marks an error as resolved by BiteFix. Returns False if it already was.
+        """
+        if getattr(error, "bitefix_claimed", False):
+            return False
+        try:
+            error.bitefix_claimed = True
+        except AttributeError:
+            pass
+        return True
+
+    @staticmethod
+    def _policy_key(func: Callable) -> str:
+        return f"{func.__module__}.{func.__qualname__}"
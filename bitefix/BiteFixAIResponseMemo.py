@@ -0,0 +1,169 @@
+import copy
+import hashlib
+import re
+import threading
+import warnings
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Sequence
+from langchain_core.caches import BaseCache
+from langchain_core.outputs import Generation
+
+
+class BiteFixAIResponseMemo(BaseCache):
+
+    """
+    This class is responsible for reusing the LLM response to a prompt that was already sent, such as the prompt of a stage
+    of an error resolved again after its report was evicted from the BiteFixAICache, or of a stage shared by errors with the same context.
+    The responses are kept in memory, keyed on a hash of the exact prompt and of the model parameters, so a different model,
+    temperature or stop sequence is a different entry. It is attached to the LLM of each agent as its langchain cache.
+
+    A response sampled at a temperature above max_temperature is expected to vary from one call to the next, so these calls bypass the memo:
+    they are neither looked up nor stored. The temperature is read from the model parameters. Models without a temperature are memoized.
+    Streamed calls are not memoized. check_temperature warns, when a decorator is built, about an LLM whose calls would all bypass the memo.
+
+    attach gives each LLM object a shallow copy using the memo as its cache. The copy shares the clients and the mutable state of the LLM object,
+    so counters kept in mutable objects, such as the stats of BiteFixAIFakeLLM and BiteFixAIRouter, stay on the original object.
+
+    Attributes:
+        max_entries (int): Maximum number of responses kept, the least recently used ones are dropped first.
+        max_temperature (float): Highest temperature whose responses are memoized.
+
+    Methods:
+        attach: Returns a copy of a langchain LLM using the memo.
+        check_temperature: Warns when every call of an LLM would bypass the memo.
+        lookup: Returns the memoized response to a prompt, or None.
+        update: Memoizes the response to a prompt.
+        clear: Removes all the memoized responses.
+        stats: Returns the hit/miss/bypass counters of the memo.
+    """
+
+    _TEMPERATURE_PATTERN = re.compile(
+        r"""['"]temperature['"]\s*[:,]\s*(-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)"""
+    )
+
+    def __init__(self, max_entries: int = 256, max_temperature: float = 0.0):
+        self.max_entries = max_entries
+        self.max_temperature = max_temperature
+        self._entries = OrderedDict()
+        self._attached = {}
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "bypassed": 0}
+
+    def attach(self, llm: object) -> object:
+        """
+        Returns a copy of a langchain LLM or chat model using the memo as its cache. The copy is made once per LLM object
+        and forgotten when the LLM object is garbage collected. Other objects are returned unchanged.
+        """
+        from langchain_core.language_models import BaseLanguageModel
+
+        if not isinstance(llm, BaseLanguageModel):
+            return llm
+        key = id(llm)
+        with self._lock:
+            attached = self._attached.get(key)
+            if attached is None or attached[0]() is not llm:
+                memoized = copy.copy(llm)
+                memoized.cache = self
+                attached = (weakref.ref(llm, self._forget(key)), memoized)
+                self._attached[key] = attached
+        return attached[1]
+
+    def check_temperature(
+        self, llm: object = None, temperature: float = None, name: str = "The LLM"
+    ) -> bool:
+        """
+        Warns when the temperature of an LLM object, or the given temperature, is above max_temperature,
+        in which case none of its calls would use the memo.
+
+        Args:
+            llm (object, optional): The LLM object, whose temperature is read from its model parameters. Defaults to None.
+            temperature (float, optional): The temperature, when the LLM object is not built yet. Defaults to None.
+            name (str, optional): The name of the LLM in the warning. Defaults to "The LLM".
+
+        Returns:
+            bool: Whether the calls bypass the memo.
+        """
+        if temperature is None and llm is not None:
+            params = getattr(llm, "_identifying_params", None)
+            temperature = (
+                params.get("temperature") if isinstance(params, dict) else None
+            )
+            if temperature is None:
+                temperature = getattr(llm, "temperature", None)
+        if (
+            not isinstance(temperature, (int, float))
+            or temperature <= self.max_temperature
+        ):
+            return False
+        warnings.warn(
+            f"{name} samples at temperature {temperature}, above the max_temperature {self.max_temperature} of the response memo, "
+            f"so none of its calls will use the memo. Lower its temperature to {self.max_temperature} or raise max_temperature.",
+            stacklevel=3,
+        )
+        return True
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        if self._bypassed(llm_string):
+            return None
+        key = self._key(prompt, llm_string)
+        with self._lock:
+            generations = self._entries.get(key)
+            if generations is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return generations
+
+    def update(
+        self, prompt: str, llm_string: str, return_val: Sequence[Generation]
+    ) -> None:
+        if self._bypassed(llm_string, count=False):
+            return
+        key = self._key(prompt, llm_string)
+        with self._lock:
+            self._entries[key] = return_val
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["size"] = len(self._entries)
+        return stats
+
+    def _forget(self, key: int) -> Callable[[weakref.ref], None]:
+        """
+        Returns the callback removing the copy of a garbage collected LLM object. It does not hold the memo itself.
+        """
+        memo_reference = weakref.ref(self)
+
+        def forget(reference: weakref.ref) -> None:
+            memo = memo_reference()
+            if memo is None:
+                return
+            with memo._lock:
+                attached = memo._attached.get(key)
+                if attached is not None and attached[0] is reference:
+                    del memo._attached[key]
+
+        return forget
+
+    def _bypassed(self, llm_string: str, count: bool = True) -> bool:
+        match = self._TEMPERATURE_PATTERN.search(llm_string)
+        if match is None or float(match.group(1)) <= self.max_temperature:
+            return False
+        if count:
+            with self._lock:
+                self._counters["bypassed"] += 1
+        return True
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\0{prompt}".encode("utf-8")).hexdigest()
@@ -0,0 +1,428 @@
+import asyncio
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple, Union
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+from langchain_core.pydantic_v1 import PrivateAttr
+
+
+class BiteFixAIRouter(LLM):
+
+    """
+    This class is responsible for spreading the LLM calls of the BiteFix AI Agents over several LLM backends, such as models of different providers.
+    Each call goes to the healthy backend with the lowest expected latency, its rolling median latency divided by its rolling success rate.
+    Backends that have not been called yet come next, in order of preference, and backends that have only failed come last. If the backend fails, the call falls back to the next backend. A backend failing max_failures times in a row is skipped for cooldown seconds,
+    unless all the backends are skipped. With hedging, when the first backend has not answered by its rolling p95 latency, the call is also sent
+    to the next healthy backend and the first answer wins. The other call is left to complete, in the background, and its answer is discarded
+    but still counted in the statistics of its backend. Backends being skipped are not used for hedging.
+
+    It can be passed as the `llm` of the decorators, BiteFixAIRunner or BiteFixAIAgents, or as the LLM of some stages in stage_llms,
+    for example a router of fast models for the diagnosis and a router of strong models for the code development.
+    It supports invoke, ainvoke, stream and astream. Streamed calls are not hedged, and only fall back when the backend fails before its first chunk.
+
+    Attributes:
+        backends (Dict[str, Any]): The LLM objects by name, in order of preference. A list is named after the model of each LLM.
+        hedge (bool): Whether to send slow calls to a second backend.
+        hedge_after (float): Seconds after which a call is hedged while the backend has fewer than min_samples latency samples. None waits for them.
+        window (int): Number of recent calls of each backend kept for its latency and error statistics.
+        min_samples (int): Number of latency samples needed to use the p95 latency of a backend as its hedging deadline.
+        max_failures (int): Number of consecutive failures after which a backend is skipped.
+        cooldown (float): Seconds during which a failing backend is skipped.
+        max_concurrency (int): Maximum number of concurrent invoke calls sharing the router, each with its hedge.
+            The hedging deadline starts when the call starts running, not while it waits for a free worker.
+
+    Methods:
+        stats: Returns the calls, errors, wins, hedges, fallbacks and latency percentiles of each backend.
+    """
+
+    backends: Dict[str, Any]
+    hedge: bool = True
+    hedge_after: Optional[float] = None
+    window: int = 50
+    min_samples: int = 5
+    max_failures: int = 3
+    cooldown: float = 30.0
+    max_concurrency: int = 32
+
+    _lock: Any = PrivateAttr()
+    _stats: Dict[str, dict] = PrivateAttr()
+    _executor: Any = PrivateAttr()
+    _background: set = PrivateAttr()
+
+    def __init__(self, backends: Union[List[Any], Dict[str, Any]], **kwargs: Any):
+        if not isinstance(backends, dict):
+            backends = {
+                f"{index}:{self._model_name(llm)}": llm
+                for index, llm in enumerate(backends)
+            }
+        if not backends:
+            raise ValueError("The router needs at least one backend.")
+        super().__init__(backends=backends, **kwargs)
+        self._lock = threading.Lock()
+        self._stats = {
+            name: {
+                "calls": 0,
+                "errors": 0,
+                "wins": 0,
+                "hedges": 0,
+                "fallbacks": 0,
+                "consecutive_failures": 0,
+                "skipped_until": 0.0,
+                "latencies": deque(maxlen=self.window),
+                "outcomes": deque(maxlen=self.window),
+            }
+            for name in backends
+        }
+        self._executor = ThreadPoolExecutor(
+            max_workers=2 * self.max_concurrency, thread_name_prefix="bitefix-router"
+        )
+        self._background = set()
+
+    @property
+    def _llm_type(self) -> str:
+        return "bitefix-router"
+
+    @property
+    def _identifying_params(self) -> dict:
+        """
+        The names of the backends, and their highest temperature, so that a BiteFixAIResponseMemo can bypass sampled calls.
+        """
+        temperatures = [
+            llm.temperature
+            for llm in self.backends.values()
+            if isinstance(getattr(llm, "temperature", None), (int, float))
+        ]
+        params = {"backends": list(self.backends)}
+        if temperatures:
+            params["temperature"] = max(temperatures)
+        return params
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    "calls": stats["calls"],
+                    "errors": stats["errors"],
+                    "wins": stats["wins"],
+                    "hedges": stats["hedges"],
+                    "fallbacks": stats["fallbacks"],
+                    "error_rate": (
+                        stats["outcomes"].count(False) / len(stats["outcomes"])
+                        if stats["outcomes"]
+                        else 0.0
+                    ),
+                    "p50": self._percentile(stats["latencies"], 0.5),
+                    "p95": self._percentile(stats["latencies"], 0.95),
+                    "skipped": time.monotonic() < stats["skipped_until"],
+                }
+                for name, stats in self._stats.items()
+            }
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        ranked = iter(self._ranked())
+        running = {}
+        error = None
+        hedged = False
+        while True:
+            if not running:
+                name = next(ranked, None)
+                if name is None:
+                    raise error
+                if error is not None:
+                    self._count(name, "fallbacks")
+                started = threading.Event()
+                running[
+                    self._executor.submit(
+                        self._invoke, name, prompt, stop, kwargs, started
+                    )
+                ] = name
+                deadline = self._deadline(name)
+            if self.hedge and not hedged and deadline is not None:
+                started.wait()
+            done, _ = wait(
+                running,
+                timeout=deadline if self.hedge and not hedged else None,
+                return_when=FIRST_COMPLETED,
+            )
+            if not done:
+                hedged = True
+                name = next(ranked, None)
+                if name is not None and self._cooling(name):
+                    ranked, name = itertools.chain([name], ranked), None
+                if name is not None:
+                    self._count(name, "hedges")
+                    running[
+                        self._executor.submit(self._invoke, name, prompt, stop, kwargs)
+                    ] = name
+                continue
+            for future in done:
+                name = running.pop(future)
+                try:
+                    text = future.result()
+                except Exception as exc:
+                    error = exc
+                    continue
+                self._count(name, "wins")
+                return text
+
+    async def _acall(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        ranked = iter(self._ranked())
+        running = {}
+        error = None
+        hedged = False
+        try:
+            while True:
+                if not running:
+                    name = next(ranked, None)
+                    if name is None:
+                        raise error
+                    if error is not None:
+                        self._count(name, "fallbacks")
+                    running[
+                        asyncio.ensure_future(self._ainvoke(name, prompt, stop, kwargs))
+                    ] = name
+                    deadline = self._deadline(name)
+                done, _ = await asyncio.wait(
+                    running,
+                    timeout=deadline if self.hedge and not hedged else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    hedged = True
+                    name = next(ranked, None)
+                    if name is not None and self._cooling(name):
+                        ranked, name = itertools.chain([name], ranked), None
+                    if name is not None:
+                        self._count(name, "hedges")
+                        running[
+                            asyncio.ensure_future(
+                                self._ainvoke(name, prompt, stop, kwargs)
+                            )
+                        ] = name
+                    continue
+                for task in done:
+                    name = running.pop(task)
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    self._count(name, "wins")
+                    return task.result()
+        finally:
+            for task in running:
+                self._background.add(task)
+                task.add_done_callback(self._forget_task)
+
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[GenerationChunk]:
+        error = None
+        for name in self._ranked():
+            if error is not None:
+                self._count(name, "fallbacks")
+            start = time.perf_counter()
+            started = False
+            try:
+                for chunk in self.backends[name].stream(prompt, stop=stop, **kwargs):
+                    if not started:
+                        started = True
+                        self._record(name, time.perf_counter() - start)
+                    token = self._text(chunk)
+                    if run_manager is not None:
+                        run_manager.on_llm_new_token(token)
+                    yield GenerationChunk(text=token)
+            except Exception as exc:
+                if started:
+                    raise
+                self._record(name, None)
+                error = exc
+                continue
+            if not started:
+                self._record(name, time.perf_counter() - start)
+            self._count(name, "wins")
+            return
+        raise error
+
+    async def _astream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[GenerationChunk]:
+        error = None
+        for name in self._ranked():
+            if error is not None:
+                self._count(name, "fallbacks")
+            start = time.perf_counter()
+            started = False
+            try:
+                async for chunk in self.backends[name].astream(
+                    prompt, stop=stop, **kwargs
+                ):
+                    if not started:
+                        started = True
+                        self._record(name, time.perf_counter() - start)
+                    token = self._text(chunk)
+                    if run_manager is not None:
+                        await run_manager.on_llm_new_token(token)
+                    yield GenerationChunk(text=token)
+            except Exception as exc:
+                if started:
+                    raise
+                self._record(name, None)
+                error = exc
+                continue
+            if not started:
+                self._record(name, time.perf_counter() - start)
+            self._count(name, "wins")
+            return
+        raise error
+
+    def _invoke(
+        self,
+        name: str,
+        prompt: str,
+        stop: List[str],
+        kwargs: dict,
+        started: threading.Event = None,
+    ) -> str:
+        if started is not None:
+            started.set()
+        start = time.perf_counter()
+        try:
+            response = self.backends[name].invoke(prompt, stop=stop, **kwargs)
+        except Exception:
+            self._record(name, None)
+            raise
+        self._record(name, time.perf_counter() - start)
+        return self._text(response)
+
+    async def _ainvoke(
+        self, name: str, prompt: str, stop: List[str], kwargs: dict
+    ) -> str:
+        start = time.perf_counter()
+        try:
+            response = await self.backends[name].ainvoke(prompt, stop=stop, **kwargs)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._record(name, None)
+            raise
+        self._record(name, time.perf_counter() - start)
+        return self._text(response)
+
+    def _ranked(self) -> List[str]:
+        """
+        Returns the backend names in the order they should be tried: the healthy backends by expected latency,
+        then those not called yet in order of preference, then those that have only failed, then the skipped ones.
+        """
+        now = time.monotonic()
+        order = list(self.backends)
+        with self._lock:
+            keys = {
+                name: (
+                    now < stats["skipped_until"],
+                    *self._expected_latency(stats),
+                    order.index(name),
+                )
+                for name, stats in self._stats.items()
+            }
+        return sorted(order, key=keys.get)
+
+    def _expected_latency(self, stats: dict) -> Tuple[int, float]:
+        """
+        Returns the rank of a backend and its rolling median latency divided by its rolling success rate,
+        which is the expected time until an answer when failed calls are retried.
+        The rank is 0 for a backend with successful calls, 1 for one not called yet and 2 for one that has only failed.
+        """
+        outcomes = stats["outcomes"]
+        if not outcomes:
+            return 1, math.inf
+        if not stats["latencies"] or True not in outcomes:
+            return 2, math.inf
+        success_rate = outcomes.count(True) / len(outcomes)
+        return 0, self._percentile(stats["latencies"], 0.5) / success_rate
+
+    def _cooling(self, name: str) -> bool:
+        with self._lock:
+            return time.monotonic() < self._stats[name]["skipped_until"]
+
+    def _forget_task(self, task: asyncio.Task) -> None:
+        """
+        Drops a losing hedged call once it completes. Its outcome was recorded by _ainvoke.
+        """
+        self._background.discard(task)
+        if not task.cancelled():
+            task.exception()
+
+    def _deadline(self, name: str) -> Optional[float]:
+        with self._lock:
+            latencies = self._stats[name]["latencies"]
+            if len(latencies) >= self.min_samples:
+                return self._percentile(latencies, 0.95)
+        return self.hedge_after
+
+    def _record(self, name: str, latency: Optional[float]) -> None:
+        """
+        Records the outcome of a call, with its latency if it succeeded or None if it failed.
+        """
+        with self._lock:
+            stats = self._stats[name]
+            stats["calls"] += 1
+            stats["outcomes"].append(latency is not None)
+            if latency is not None:
+                stats["latencies"].append(latency)
+                stats["consecutive_failures"] = 0
+                return
+            stats["errors"] += 1
+            stats["consecutive_failures"] += 1
+            if stats["consecutive_failures"] >= self.max_failures:
+                stats["skipped_until"] = time.monotonic() + self.cooldown
+
+    def _count(self, name: str, counter: str) -> None:
+        with self._lock:
+            self._stats[name][counter] += 1
+
+    @staticmethod
+    def _percentile(values: deque, quantile: float) -> Optional[float]:
+        if not values:
+            return None
+        ordered = sorted(values)
+        return ordered[min(int(quantile * len(ordered)), len(ordered) - 1)]
+
+    @staticmethod
+    def _text(response: Any) -> str:
+        return getattr(response, "content", response)
+
+    @staticmethod
+    def _model_name(llm: Any) -> str:
+        return str(
+            getattr(llm, "model_name", None)
+            or getattr(llm, "model", None)
+            or type(llm).__name__
+        )
@@ -1,7 +1,15 @@
+import contextlib
+import re
 from bitefix.BiteFixAIAgents import BiteFixAIAgents
-from bitefix.BiteFixAITasks import BiteFixAITasks
-from bitefix.BiteFixAICrew import BiteFixAICrew
-from typing import Any, Tuple
+from bitefix.BiteFixAIInstrumentation import BiteFixAIInstrumentation
+from bitefix.BiteFixAISnapshot import BiteFixAISnapshot
+from typing import TYPE_CHECKING, Any, AsyncIterator, Iterator, List, Tuple
+
+if TYPE_CHECKING:
+    from crewai import Agent, Crew
+    from bitefix.BiteFixAIResponseMemo import BiteFixAIResponseMemo
+    from bitefix.BiteFixAITasks import BiteFixAITasks
+    from bitefix.BiteFixAICrew import BiteFixAICrew
 
 
 class BiteFixAIRunner:
@@ -11,14 +19,37 @@ class BiteFixAIRunner:
 
     Attributes:
         function_code (str): The function code.
-        arguments (Tuple[Any, ...]): The arguments passed to the function.
-        error_message (str): The error message.
+        arguments (Tuple[Any, ...]): The arguments passed to the function, or their previews as a string.
+        error_message (str): The error message, or the BiteFixAISnapshot of the error.
         llm (object): The LLM object.
+        process (str): "sequential" runs the four tasks one after another. "parallel" runs the diagnosis and the idea generation concurrently,
+            and only the ideas evaluation and the code development wait for their inputs.
+        idea_generators (int): Number of idea generation tasks run concurrently with separate LLM calls in the "parallel" process.
+        max_prompt_tokens (int): Token ceiling of each task prompt. None means no ceiling.
+        max_argument_chars (int): Maximum number of characters of the preview of each argument in the prompts.
+        stage_llms (dict): LLM objects overriding llm for some stages, keyed by the stage name (see BiteFixAIAgents.STAGES).
+        instrumentation (BiteFixAIInstrumentation): Records the prompt build, the tasks and the LLM calls. None disables it.
+        prompt_sizes (dict): Estimated token count of the prompt of each task of the last run. It is also returned in the result.
+        agents (BiteFixAIAgents): Agents built with reuse, shared by the runners of the same LLM configuration, so that the agents and crews
+            are not built again for each error. Their llm, stage_llms, instrumentation, prompt_layout and response_memo take precedence.
+            Defaults to new agents for each run.
+        prompt_layout (str): "default" or "prefix", the layout of the prompts. "prefix" starts the prompts of all the stages with the same
+            shared context block, so that the provider can cache it (see BiteFixAITasks).
+        response_memo (BiteFixAIResponseMemo): Reuses the LLM responses to prompts already sent with the same model parameters. None disables it.
 
     Methods:
+        from_snapshot: Returns a runner resolving the failure recorded by a BiteFixAISnapshot.
         run: Initializes the Bite Fix AI Agents and Tasks involved in the error fixing process and passes them to the Bite Fix AI Crew to kickoff.
+        arun: Same as run, but awaits the LLM calls with the async client of the LLM.
+        stream: Same as run, but yields the tokens and the output of each stage as soon as they are produced.
+        astream: Async counterpart of stream.
+        triage: Runs only the triage agent, a single LLM call returning a quick diagnosis with a confidence and a severity score.
+        atriage: Async counterpart of triage.
+        candidates: Runs more code developer agents concurrently, each writing one more candidate fix for the BiteFixAIVerifier.
     """
 
+    PROCESSES = ("sequential", "parallel")
+
     def __init__(
         self,
         function_code: str,
@@ -26,24 +57,310 @@ class BiteFixAIRunner:
         arguments: Tuple[Any, ...],
         error_message: str,
         llm: object,
+        process: str = "sequential",
+        idea_generators: int = 1,
+        max_prompt_tokens: int = None,
+        max_argument_chars: int = 1000,
+        stage_llms: dict = None,
+        instrumentation: BiteFixAIInstrumentation = None,
+        agents: BiteFixAIAgents = None,
+        prompt_layout: str = "default",
+        response_memo: "BiteFixAIResponseMemo" = None,
     ):
+        if process not in self.PROCESSES:
+            raise ValueError(
+                f"The process should be one of {', '.join(self.PROCESSES)}."
+            )
+        if idea_generators < 1:
+            raise ValueError("At least one idea generator is needed.")
+        if prompt_layout not in BiteFixAIAgents.PROMPT_LAYOUTS:
+            raise ValueError(
+                f"The prompt layout should be one of {', '.join(BiteFixAIAgents.PROMPT_LAYOUTS)}."
+            )
         self.function_code = function_code
         self.function_description = function_description
         self.arguments = arguments
         self.error_message = error_message
         self.llm = llm
+        self.process = process
+        self.idea_generators = idea_generators
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_argument_chars = max_argument_chars
+        self.stage_llms = stage_llms
+        self.instrumentation = instrumentation
+        self.agents = agents
+        self.prompt_layout = prompt_layout
+        self.response_memo = response_memo
+        self.prompt_sizes = {}
+
+    @classmethod
+    def from_snapshot(
+        cls, snapshot: BiteFixAISnapshot, llm: object, **kwargs: Any
+    ) -> "BiteFixAIRunner":
+        """
+        Returns a runner resolving the failure recorded by a snapshot. The agents get the argument previews,
+        the formatted traceback and the local variables of the snapshot instead of the live arguments and error.
+
+        Args:
+            snapshot (BiteFixAISnapshot): The snapshot of the failure.
+            llm (object): The LLM object.
+            **kwargs: The other arguments of BiteFixAIRunner, such as process or stage_llms.
+
+        Returns:
+            BiteFixAIRunner: The runner.
+        """
+        return cls(
+            function_code=snapshot.function_code,
+            function_description=snapshot.function_description,
+            arguments=snapshot.arguments,
+            error_message=snapshot,
+            llm=llm,
+            **kwargs,
+        )
 
     def run(self) -> dict:
-        biteFixAIAgents = BiteFixAIAgents(
-            llm=self.llm,
+        biteFixAICrew = self._crew()
+        result = biteFixAICrew.kickoff()
+        self._release(biteFixAICrew)
+        result["prompt_sizes"] = self.prompt_sizes
+        return self._merge_ideas(result)
+
+    async def arun(self) -> dict:
+        biteFixAICrew = self._crew()
+        result = await biteFixAICrew.akickoff()
+        self._release(biteFixAICrew)
+        result["prompt_sizes"] = self.prompt_sizes
+        return self._merge_ideas(result)
+
+    def stream(self) -> Iterator[dict]:
+        """
+        Runs the BiteFix AI Crew and yields its events as soon as they are produced.
+        The stages are numbered 0 to 3: diagnosis, ideas, ideas evaluation and code development.
+
+        Yields:
+            dict: {"event": "token", "stage": stage, "task": index, "text": chunk} for each chunk of an LLM response,
+                {"event": "output", "stage": stage, "text": output} once a stage is complete,
+                and finally {"event": "result", "result": result} with the same result as run.
+        """
+        biteFixAICrew = self._crew()
+        ideas = {}
+        for event in biteFixAICrew.stream():
+            yield from self._stage_events(event, ideas)
+        self._release(biteFixAICrew)
+        yield {"event": "result", "result": self._crew_result(biteFixAICrew)}
+
+    async def astream(self) -> AsyncIterator[dict]:
+        """
+        Async counterpart of stream.
+        """
+        biteFixAICrew = self._crew()
+        ideas = {}
+        async for event in biteFixAICrew.astream():
+            for stage_event in self._stage_events(event, ideas):
+                yield stage_event
+        self._release(biteFixAICrew)
+        yield {"event": "result", "result": self._crew_result(biteFixAICrew)}
+
+    def candidates(self, idea: str, count: int) -> List[str]:
+        """
+        Runs code developer agents concurrently, each writing one more candidate fix from the chosen idea.
+
+        Args:
+            idea (str): The output of the ideas evaluation task.
+            count (int): Number of candidates.
+
+        Returns:
+            List[str]: The answers of the code developer agents.
+        """
+        from bitefix.BiteFixAICrew import BiteFixAICrew
+
+        if count < 1:
+            return []
+        biteFixAIAgents = self._agents()
+        biteFixAITasks = self._tasks()
+        codeDeveloperAgents = [
+            biteFixAIAgents.CodeDeveloperAgent() for _ in range(count)
+        ]
+        codeCandidateTasks = [
+            biteFixAITasks.CodeCandidateTask(agent=agent, idea=idea, candidate=index)
+            for index, agent in enumerate(codeDeveloperAgents, start=2)
+        ]
+        biteFixAICrew = self._instrumented(
+            BiteFixAICrew(
+                agent=codeDeveloperAgents,
+                tasks=codeCandidateTasks,
+                crew=self._reused_crew(biteFixAIAgents, codeDeveloperAgents),
+            )
+        )
+        biteFixAICrew.kickoff()
+        for task in codeCandidateTasks:
+            task.thread.join()
+        self._release(biteFixAICrew)
+        return [
+            task.output.result() if task.output is not None else ""
+            for task in codeCandidateTasks
+        ]
+
+    def triage(self) -> dict:
+        """
+        Runs only the triage agent.
+
+        Returns:
+            dict: The result in the same format as run, with the triage output as the only task output,
+                and its "confidence" and "severity" scores between 0 and 1 (None when the LLM did not give them).
+        """
+        biteFixAICrew = self._triage_crew()
+        result = biteFixAICrew.kickoff()
+        self._release(biteFixAICrew)
+        return self._triage_result(result)
+
+    async def atriage(self) -> dict:
+        """
+        Async counterpart of triage.
+        """
+        biteFixAICrew = self._triage_crew()
+        result = await biteFixAICrew.akickoff()
+        self._release(biteFixAICrew)
+        return self._triage_result(result)
+
+    def _triage_crew(self) -> "BiteFixAICrew":
+        from bitefix.BiteFixAICrew import BiteFixAICrew
+
+        biteFixAIAgents = self._agents()
+        biteFixAITasks = self._tasks()
+        triageAgent = biteFixAIAgents.TriageAgent()
+        triageTask = biteFixAITasks.TriageTask(agent=triageAgent)
+        return self._instrumented(
+            BiteFixAICrew(
+                agent=[triageAgent],
+                tasks=[triageTask],
+                crew=self._reused_crew(biteFixAIAgents, [triageAgent]),
+            )
         )
 
-        biteFixAITasks = BiteFixAITasks(
-            function_code=self.function_code,
-            function_description=self.function_description,
-            arguments=self.arguments,
-            error_message=self.error_message,
+    def _triage_result(self, result: dict) -> dict:
+        text = result["tasks_outputs"][0].result()
+        result["prompt_sizes"] = self.prompt_sizes
+        result["confidence"] = self._score("Confidence", text)
+        result["severity"] = self._score("Severity", text)
+        return result
+
+    @staticmethod
+    def _score(name: str, text: str) -> float:
+        """
+        Reads a "<name>: <number>" line of the triage output. Scores given out of 10 or as percentages are scaled to between 0 and 1.
+        """
+        match = re.search(rf"{name}\W*?(\d+(?:\.\d+)?)\s*(%?)", text, re.IGNORECASE)
+        if match is None:
+            return None
+        score = float(match.group(1))
+        if match.group(2) or score > 10:
+            score /= 100
+        elif score > 1:
+            score /= 10
+        return min(max(score, 0.0), 1.0)
+
+    def _crew_result(self, biteFixAICrew: "BiteFixAICrew") -> dict:
+        tasks_outputs = [task.output for task in biteFixAICrew.tasks]
+        result = {
+            "final_output": tasks_outputs[-1].result(),
+            "tasks_outputs": tasks_outputs,
+            "prompt_sizes": self.prompt_sizes,
+        }
+        return self._merge_ideas(result)
+
+    def _stage_events(self, event: dict, ideas: dict) -> List[dict]:
+        """
+        Adds the stage to a crew event. The outputs of several idea generation tasks are held back
+        and merged into one output event of the ideas stage once all of them are complete.
+        """
+        idea_tasks = self.idea_generators if self.process == "parallel" else 1
+        index = event["task"]
+        stage = (
+            0 if index == 0 else 1 if index <= idea_tasks else index - idea_tasks + 1
+        )
+        if event["event"] == "token":
+            return [dict(event, stage=stage)]
+        if stage != 1 or idea_tasks == 1:
+            return [{"event": "output", "stage": stage, "text": event["text"]}]
+        ideas[index] = event["text"]
+        if len(ideas) < idea_tasks:
+            return []
+        merged = self._merged_ideas([ideas[index] for index in sorted(ideas)])
+        return [{"event": "output", "stage": stage, "text": merged}]
+
+    def _tasks(self) -> "BiteFixAITasks":
+        from bitefix.BiteFixAITasks import BiteFixAITasks
+
+        span = (
+            self.instrumentation.span("bitefix.prompt_build")
+            if self.instrumentation is not None
+            else contextlib.nullcontext()
         )
+        with span:
+            biteFixAITasks = BiteFixAITasks(
+                function_code=self.function_code,
+                function_description=self.function_description,
+                arguments=self.arguments,
+                error_message=self.error_message,
+                max_prompt_tokens=self.max_prompt_tokens,
+                max_argument_chars=self.max_argument_chars,
+                prompt_layout=(
+                    self.agents.prompt_layout
+                    if self.agents is not None
+                    else self.prompt_layout
+                ),
+            )
+        self.prompt_sizes = biteFixAITasks.prompt_sizes
+        return biteFixAITasks
+
+    def _agents(self) -> BiteFixAIAgents:
+        if self.agents is not None:
+            return self.agents
+        return BiteFixAIAgents(
+            llm=self.llm,
+            stage_llms=self.stage_llms,
+            instrumentation=self.instrumentation,
+            prompt_layout=self.prompt_layout,
+            response_memo=self.response_memo,
+        )
+
+    @staticmethod
+    def _reused_crew(biteFixAIAgents: BiteFixAIAgents, agents: List["Agent"]) -> "Crew":
+        return biteFixAIAgents.crew(agents) if biteFixAIAgents.reuse else None
+
+    def _release(self, biteFixAICrew: "BiteFixAICrew") -> None:
+        """
+        Gives the agents of a complete run back to the reused agents. The agents of a failed run are not reused.
+        """
+        if self.agents is not None:
+            self.agents.release(biteFixAICrew.agent)
+
+    def _instrumented(self, biteFixAICrew: "BiteFixAICrew") -> "BiteFixAICrew":
+        """
+        Makes each task report its end to the instrumentation callback handler of its agent.
+        """
+        if self.instrumentation is None:
+            return biteFixAICrew
+        from bitefix.BiteFixAILLMCallbackHandler import BiteFixAILLMCallbackHandler
+
+        for task in biteFixAICrew.tasks:
+            for handler in task.agent.llm.config.get("callbacks", []):
+                if isinstance(handler, BiteFixAILLMCallbackHandler):
+                    task.callback = handler.on_task_end
+        return biteFixAICrew
+
+    def _crew(self) -> "BiteFixAICrew":
+        from bitefix.BiteFixAICrew import BiteFixAICrew
+
+        biteFixAIAgents = self._agents()
+
+        biteFixAITasks = self._tasks()
+
+        if self.process == "parallel":
+            return self._instrumented(
+                self._parallel_crew(biteFixAIAgents, biteFixAITasks)
+            )
 
         diagnosisAgent = biteFixAIAgents.DiagnosisAgent()
         ideaGeneratorAgent = biteFixAIAgents.IdeaGeneratorAgent()
@@ -51,28 +368,107 @@ class BiteFixAIRunner:
         codeDeveloperAgent = biteFixAIAgents.CodeDeveloperAgent()
 
         diagnosisTask = biteFixAITasks.DiagnosisTask(agent=diagnosisAgent)
-        ideaGenerationTask = biteFixAITasks.IdeaGenerationTask(agent=ideaGeneratorAgent)
+        ideaGenerationTask = biteFixAITasks.IdeaGenerationTask(
+            agent=ideaGeneratorAgent, context=[diagnosisTask]
+        )
         ideasEvaluationTask = biteFixAITasks.IdeasEvaluationTask(
-            agent=ideasEvaluatorAgent
+            agent=ideasEvaluatorAgent, context=[diagnosisTask, ideaGenerationTask]
         )
         codeDevelopmentTask = biteFixAITasks.CodeDevelopmentTask(
-            agent=codeDeveloperAgent
+            agent=codeDeveloperAgent, context=[diagnosisTask, ideasEvaluationTask]
         )
 
+        agents = [
+            diagnosisAgent,
+            ideaGeneratorAgent,
+            ideasEvaluatorAgent,
+            codeDeveloperAgent,
+        ]
         biteFixAICrew = BiteFixAICrew(
-            agent=[
-                diagnosisAgent,
-                ideaGeneratorAgent,
-                ideasEvaluatorAgent,
-                codeDeveloperAgent,
-            ],
+            agent=agents,
             tasks=[
                 diagnosisTask,
                 ideaGenerationTask,
                 ideasEvaluationTask,
                 codeDevelopmentTask,
             ],
+            crew=self._reused_crew(biteFixAIAgents, agents),
         )
+        return self._instrumented(biteFixAICrew)
 
-        result = biteFixAICrew.kickoff()
+    def _parallel_crew(
+        self, biteFixAIAgents: BiteFixAIAgents, biteFixAITasks: "BiteFixAITasks"
+    ) -> "BiteFixAICrew":
+        """
+        Builds the crew for the "parallel" process. The diagnosis and idea generation tasks run asynchronously,
+        the ideas evaluation takes all of them as context and the code development takes the diagnosis and the evaluation as context.
+        """
+        from bitefix.BiteFixAICrew import BiteFixAICrew
+
+        diagnosisAgent = biteFixAIAgents.DiagnosisAgent()
+        ideaGeneratorAgents = [
+            biteFixAIAgents.IdeaGeneratorAgent() for _ in range(self.idea_generators)
+        ]
+        ideasEvaluatorAgent = biteFixAIAgents.IdeasEvaluatorAgent()
+        codeDeveloperAgent = biteFixAIAgents.CodeDeveloperAgent()
+
+        diagnosisTask = biteFixAITasks.DiagnosisTask(
+            agent=diagnosisAgent, async_execution=True
+        )
+        ideaGenerationTasks = [
+            biteFixAITasks.IdeaGenerationTask(agent=agent, async_execution=True)
+            for agent in ideaGeneratorAgents
+        ]
+        ideasEvaluationTask = biteFixAITasks.IdeasEvaluationTask(
+            agent=ideasEvaluatorAgent, context=[diagnosisTask, *ideaGenerationTasks]
+        )
+        codeDevelopmentTask = biteFixAITasks.CodeDevelopmentTask(
+            agent=codeDeveloperAgent, context=[diagnosisTask, ideasEvaluationTask]
+        )
+
+        agents = [
+            diagnosisAgent,
+            *ideaGeneratorAgents,
+            ideasEvaluatorAgent,
+            codeDeveloperAgent,
+        ]
+        biteFixAICrew = BiteFixAICrew(
+            agent=agents,
+            tasks=[
+                diagnosisTask,
+                *ideaGenerationTasks,
+                ideasEvaluationTask,
+                codeDevelopmentTask,
+            ],
+            crew=self._reused_crew(biteFixAIAgents, agents),
+        )
+        return biteFixAICrew
+
+    @staticmethod
+    def _merge_ideas(result: dict) -> dict:
+        """
+        Merges the outputs of several idea generation tasks into one, so the result always holds the four task outputs.
+        """
+        tasks_outputs = result["tasks_outputs"]
+        if len(tasks_outputs) == 4:
+            return result
+        from crewai.tasks.task_output import TaskOutput
+
+        ideas_outputs = tasks_outputs[1:-2]
+        merged = BiteFixAIRunner._merged_ideas(
+            [output.result() for output in ideas_outputs]
+        )
+        ideas_output = TaskOutput(
+            description=ideas_outputs[0].description,
+            exported_output=merged,
+            raw_output=merged,
+        )
+        result["tasks_outputs"] = [tasks_outputs[0], ideas_output, *tasks_outputs[-2:]]
         return result
+
+    @staticmethod
+    def _merged_ideas(ideas: List[str]) -> str:
+        return "\n\n".join(
+            f"### Ideas from generator {index}\n\n{idea}"
+            for index, idea in enumerate(ideas, start=1)
+        )
@@ -0,0 +1,100 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class BiteFixAISingleFlight:
+
+    """
+    This class is responsible for deduplicating concurrent error resolutions.
+    While a resolution for a key is in flight, every other caller with the same key waits for it and shares its result instead of starting its own BiteFix AI run.
+
+    Methods:
+        do: Runs fn for a key, or waits for the in-flight call with the same key and returns its result.
+        ado: Async counterpart of do for coroutine functions.
+        stats: Returns the executed/coalesced counters and the number of in-flight calls.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._async_calls = {}
+        self._lock = threading.Lock()
+        self._counters = {"executed": 0, "coalesced": 0}
+
+    def do(self, key: str, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Runs fn(*args, **kwargs) once per key among concurrent callers.
+
+        Args:
+            key (str): The key identifying the resolution, e.g. the error fingerprint.
+            fn (Callable): The resolution to run.
+
+        Returns:
+            Any: The result of fn. If fn raised, the error is raised in every caller sharing the call.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self._counters["coalesced"] += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self._counters["executed"] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = fn(*args, **kwargs)
+            except BaseException as exc:
+                call.error = exc
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    async def ado(self, key: str, fn: Callable[..., Awaitable], *args, **kwargs) -> Any:
+        """
+        Awaits fn(*args, **kwargs) once per key among the coroutines of the running event loop.
+
+        Args:
+            key (str): The key identifying the resolution, e.g. the error fingerprint.
+            fn (Callable): The coroutine function running the resolution.
+
+        Returns:
+            Any: The result of fn. If fn raised, the error is raised in every caller sharing the call.
+        """
+        loop_key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            future = self._async_calls.get(loop_key)
+            if future is not None:
+                self._counters["coalesced"] += 1
+            else:
+                future = asyncio.ensure_future(fn(*args, **kwargs))
+                self._async_calls[loop_key] = future
+                self._counters["executed"] += 1
+                future.add_done_callback(lambda _: self._forget(loop_key))
+        return await asyncio.shield(future)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["in_flight"] = len(self._calls) + len(self._async_calls)
+        return stats
+
+    def _forget(self, loop_key: tuple) -> None:
+        with self._lock:
+            self._async_calls.pop(loop_key, None)
@@ -0,0 +1,356 @@
+import base64
+import io
+import os
+import pickle
+import re
+import time
+import traceback
+from typing import Any, Callable, Dict, List, Tuple
+from bitefix.BiteFixAICache import BiteFixAICache
+from bitefix.BiteFixAIPromptBuilder import BiteFixAIPromptBuilder
+from bitefix.BiteFixAISourceCache import BiteFixAISourceCache
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+
+class _BoundedBuffer(io.BytesIO):
+
+    """
+    Buffer raising OverflowError once more than max_bytes bytes are written to it.
+    """
+
+    def __init__(self, max_bytes: int):
+        super().__init__()
+        self.max_bytes = max_bytes
+
+    def write(self, data: bytes) -> int:
+        if self.tell() + len(data) > self.max_bytes:
+            raise OverflowError("The pickle is larger than the limit.")
+        return super().write(data)
+
+
+class BiteFixAISnapshot:
+
+    """
+    This class is responsible for recording a failure as soon as it happens, so that it can be resolved later.
+    The snapshot only holds bounded strings: the arguments, the keyword arguments and the local variables of the failing frame
+    are summarized into previews, and the traceback is formatted. It keeps no reference to the error, its frames or the arguments,
+    which are released as soon as the failing call returns. A snapshot can be pickled, or converted to a dict with to_dict,
+    to be queued, persisted or resolved in another process with BiteFixAIResolver.resolve_snapshot or BiteFixAIRunner.from_snapshot.
+
+    str(snapshot) is the description of the error given to the agents: the formatted traceback, the local variables of the failing frame
+    and the code around the failing lines of the other functions in the traceback.
+
+    Attributes:
+        function (str): The qualified name of the function, with its module.
+        function_code (str): The source code of the function.
+        function_description (str): The description of the function.
+        exception_type (str): The name of the exception type.
+        error_message (str): The error message.
+        traceback (str): The formatted traceback, without the frames of BiteFix, cut to its last MAX_TRACEBACK_CHARS characters.
+        traceback_lines (List[str]): The source lines of the traceback frames, used to trim long function code.
+        arguments (str): Previews of the positional and keyword arguments.
+        local_variables (Dict[str, str]): Previews of the local variables of the innermost frame of the function, at most MAX_LOCALS.
+        fingerprint (str): The BiteFixAICache fingerprint of the error.
+        created_at (float): The timestamp of the failure.
+        frame_code (str): The code around the failing lines of the traceback frames outside the function, such as the helpers it calls.
+        pickled_arguments (str): The base64 pickle of the positional and keyword arguments, recorded with keep_arguments to verify the fixes
+            on the failing arguments. Empty when they were not recorded, could not be pickled or were larger than MAX_PICKLED_ARGUMENTS bytes.
+
+    Methods:
+        capture: Records a failure.
+        from_traceback: Builds a snapshot from a traceback captured in a log.
+        to_dict: Returns the snapshot as a JSON-serializable dict.
+        from_dict: Builds a snapshot from the dict returned by to_dict.
+        describe: Returns the description of the error given to the agents, cut to a number of characters.
+    """
+
+    MAX_TRACEBACK_CHARS = 4000
+    MAX_LOCALS = 20
+    MAX_LOCAL_CHARS = 200
+    MAX_PICKLED_ARGUMENTS = 1 << 20
+
+    _FRAME_PATTERN = re.compile(r'^\s*File "(.+)", line (\d+), in (.+)$')
+
+    FIELDS = (
+        "function",
+        "function_code",
+        "function_description",
+        "exception_type",
+        "error_message",
+        "traceback",
+        "traceback_lines",
+        "arguments",
+        "local_variables",
+        "fingerprint",
+        "created_at",
+        "frame_code",
+        "pickled_arguments",
+    )
+
+    def __init__(
+        self,
+        function: str,
+        function_code: str,
+        function_description: str,
+        exception_type: str,
+        error_message: str,
+        traceback: str,
+        traceback_lines: List[str],
+        arguments: str,
+        local_variables: Dict[str, str],
+        fingerprint: str,
+        created_at: float,
+        frame_code: str = "",
+        pickled_arguments: str = "",
+    ):
+        self.function = function
+        self.function_code = function_code
+        self.function_description = function_description
+        self.exception_type = exception_type
+        self.error_message = error_message
+        self.traceback = traceback
+        self.traceback_lines = traceback_lines
+        self.arguments = arguments
+        self.local_variables = local_variables
+        self.fingerprint = fingerprint
+        self.created_at = created_at
+        self.frame_code = frame_code
+        self.pickled_arguments = pickled_arguments
+
+    @classmethod
+    def capture(
+        cls,
+        func: Callable,
+        function_code: str,
+        function_description: str,
+        arguments: Tuple[Any, ...],
+        keyword_arguments: Dict[str, Any],
+        error: BaseException,
+        max_argument_chars: int = 1000,
+        source_cache: BiteFixAISourceCache = None,
+        keep_arguments: bool = False,
+    ) -> "BiteFixAISnapshot":
+        """
+        Records the failure of a function. It is called while the error is being handled, and costs a few reprs.
+
+        Args:
+            func (Callable): The function that raised the error.
+            function_code (str): The source code of the function.
+            function_description (str): The description of the function.
+            arguments (Tuple[Any, ...]): The positional arguments passed to the function.
+            keyword_arguments (Dict[str, Any]): The keyword arguments passed to the function.
+            error (BaseException): The error raised by the function.
+            max_argument_chars (int, optional): Maximum number of characters of the preview of each argument. Defaults to 1000.
+            source_cache (BiteFixAISourceCache, optional): Extracts the code around the failing lines of the other frames. Defaults to None, no extraction.
+            keep_arguments (bool, optional): Whether to record a pickle of the arguments, to verify the fixes on them. Defaults to False.
+
+        Returns:
+            BiteFixAISnapshot: The snapshot of the failure.
+        """
+        frames = [
+            (frame, summary)
+            for frame, summary in zip(
+                (frame for frame, _ in traceback.walk_tb(error.__traceback__)),
+                traceback.extract_tb(error.__traceback__),
+            )
+            if not os.path.abspath(summary.filename).startswith(_PACKAGE_DIR)
+        ]
+        formatted = "".join(
+            traceback.format_list([summary for _, summary in frames])
+            + traceback.format_exception_only(type(error), error)
+        )
+        if len(formatted) > cls.MAX_TRACEBACK_CHARS:
+            formatted = "..." + formatted[-cls.MAX_TRACEBACK_CHARS :]
+        formatted = "Traceback (most recent call last):\n" + formatted
+
+        traceback_lines = [
+            summary.line.strip() for _, summary in frames if summary.line
+        ]
+
+        function_code_object = getattr(func, "__code__", None)
+        failing_frame = next(
+            (
+                frame
+                for frame, _ in reversed(frames)
+                if frame.f_code is function_code_object
+            ),
+            frames[-1][0] if frames else None,
+        )
+        local_variables = {}
+        if failing_frame is not None:
+            local_builder = BiteFixAIPromptBuilder(
+                max_argument_chars=cls.MAX_LOCAL_CHARS
+            )
+            for name, value in list(failing_frame.f_locals.items())[: cls.MAX_LOCALS]:
+                local_variables[name] = local_builder.summarize_argument(value)
+        frame_code = ""
+        if source_cache is not None:
+            frame_code = source_cache.frame_code(
+                [
+                    (summary.filename, summary.lineno, summary.name)
+                    for frame, summary in frames
+                    if frame.f_code is not function_code_object
+                ]
+            )
+        frames = failing_frame = None
+
+        promptBuilder = BiteFixAIPromptBuilder(max_argument_chars=max_argument_chars)
+        return cls(
+            function=f"{func.__module__}.{func.__qualname__}",
+            function_code=function_code,
+            function_description=function_description,
+            exception_type=type(error).__name__,
+            error_message=str(error),
+            traceback=formatted,
+            traceback_lines=traceback_lines,
+            arguments=promptBuilder.summarize_arguments(arguments, keyword_arguments),
+            local_variables=local_variables,
+            fingerprint=BiteFixAICache.fingerprint(function_code, error),
+            created_at=time.time(),
+            frame_code=frame_code,
+            pickled_arguments=(
+                cls._pickle_arguments(arguments, keyword_arguments)
+                if keep_arguments
+                else ""
+            ),
+        )
+
+    @classmethod
+    def from_traceback(
+        cls,
+        text: str,
+        function_code: str = "",
+        function_description: str = None,
+        function: str = None,
+        created_at: float = None,
+    ) -> "BiteFixAISnapshot":
+        """
+        Builds a snapshot from a formatted traceback, such as one captured in an application log.
+        The frames and the exception are parsed from the text. Arguments and local variables are not known.
+        Text without any frame or without an exception line, such as an unrelated log line, is rejected with a ValueError.
+
+        Args:
+            text (str): The traceback, from "Traceback (most recent call last):" to the exception line.
+            function_code (str, optional): The source code of the failing function. Defaults to "".
+            function_description (str, optional): The description of the function. Defaults to None.
+            function (str, optional): The qualified name of the function. Defaults to the function of the innermost frame.
+            created_at (float, optional): The timestamp of the failure. Defaults to now.
+
+        Returns:
+            BiteFixAISnapshot: The snapshot of the failure.
+        """
+        lines = text.strip().splitlines()
+        frames = []
+        traceback_lines = []
+        exception_line = ""
+        for index, line in enumerate(lines):
+            match = cls._FRAME_PATTERN.match(line)
+            if match:
+                frames.append((match[1], match[3].strip(), int(match[2])))
+                following = lines[index + 1] if index + 1 < len(lines) else ""
+                if following.startswith(" ") and not cls._FRAME_PATTERN.match(
+                    following
+                ):
+                    traceback_lines.append(following.strip())
+            elif line.strip() and not line.startswith((" ", "\t", "Traceback")):
+                exception_line = line.strip()
+        if not frames or not exception_line:
+            raise ValueError(
+                f"The text is not a traceback with frames and an exception line: {text.strip()[:100]!r}."
+            )
+
+        exception_type, separator, message = exception_line.partition(":")
+        if not separator and " " in exception_type:
+            exception_type, message = "Exception", exception_line
+        exception_type = exception_type.strip() or "Exception"
+        qualified_type = (
+            exception_type if "." in exception_type else f"builtins.{exception_type}"
+        )
+
+        formatted = "\n".join(lines)
+        if len(formatted) > cls.MAX_TRACEBACK_CHARS:
+            formatted = "..." + formatted[-cls.MAX_TRACEBACK_CHARS :]
+        return cls(
+            function=function or (frames[-1][1] if frames else ""),
+            function_code=function_code or "",
+            function_description=function_description,
+            exception_type=exception_type.rsplit(".", 1)[-1],
+            error_message=message.strip(),
+            traceback=formatted,
+            traceback_lines=traceback_lines,
+            arguments="",
+            local_variables={},
+            fingerprint=BiteFixAICache.fingerprint_parts(
+                function_code, qualified_type, message.strip(), frames
+            ),
+            created_at=time.time() if created_at is None else created_at,
+        )
+
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BiteFixAISnapshot":
+        return cls(**{field: data[field] for field in cls.FIELDS if field in data})
+
+    @classmethod
+    def _pickle_arguments(
+        cls, arguments: Tuple[Any, ...], keyword_arguments: Dict[str, Any]
+    ) -> str:
+        """
+        Returns the base64 pickle of the arguments, or "" if they cannot be pickled or their pickle is larger than MAX_PICKLED_ARGUMENTS bytes.
+        The pickling stops as soon as the limit is passed, so large arguments are not serialized in full.
+        """
+        buffer = _BoundedBuffer(cls.MAX_PICKLED_ARGUMENTS)
+        try:
+            pickle.Pickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(
+                (tuple(arguments), dict(keyword_arguments or {}))
+            )
+        except Exception:
+            return ""
+        return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+    def describe(self, max_chars: int = None) -> str:
+        """
+        Returns the description of the error given to the agents, cut to max_chars characters.
+        The code of the other frames is cut first, then the local variables, then the start of the traceback,
+        so the failing lines and the error message are kept the longest.
+        """
+        local_variables = ""
+        if self.local_variables:
+            local_variables = (
+                "\nThe local variables of the failing frame were - "
+                + ", ".join(
+                    f"{name}={preview}"
+                    for name, preview in self.local_variables.items()
+                )
+            )
+        frame_code = (
+            f"\nThe code of the other functions in the traceback, around the failing lines, was -\n{self.frame_code}"
+            if self.frame_code
+            else ""
+        )
+        if max_chars is None:
+            return self.traceback + local_variables + frame_code
+        traceback = self.traceback
+        if len(traceback) > max_chars:
+            traceback = "..." + traceback[len(traceback) - max(max_chars - 3, 0) :]
+        remaining = max_chars - len(traceback)
+        local_variables = self._cut(local_variables, remaining)
+        remaining -= len(local_variables)
+        return traceback + local_variables + self._cut(frame_code, remaining)
+
+    def __str__(self) -> str:
+        return self.describe()
+
+    @staticmethod
+    def _cut(text: str, max_chars: int) -> str:
+        if len(text) <= max_chars:
+            return text
+        if max_chars < 40:
+            return ""
+        return text[: max_chars - 4] + " ..."
+
+    def __repr__(self) -> str:
+        return f"<BiteFixAISnapshot {self.function} {self.exception_type}: {self.error_message}>"
@@ -0,0 +1,154 @@
+import inspect
+import linecache
+import os
+import sysconfig
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+
+class BiteFixAISourceCache:
+
+    """
+    This class is responsible for finding the source code of the failing functions without reading and tokenizing their module on every failure.
+    The source of a function is found once and kept with the modification time of its file, so a failure only costs a stat of the file,
+    and the source is found again when the file changes. Functions defined in notebooks, in the REPL or with exec get their source from linecache
+    when it holds their lines, such as the cells registered by IPython.
+
+    It also extracts the code around the lines of the traceback frames that are outside the decorated function, such as the helpers
+    it calls, so that the agents see the code where the error was actually raised and not the whole modules.
+
+    Attributes:
+        max_entries (int): Maximum number of function sources kept, the least recently used ones are dropped first.
+        window (int): Number of lines kept before and after the failing line of each frame.
+        max_frames (int): Maximum number of frames extracted, the innermost ones.
+
+    Methods:
+        source: Returns the source code of a function, or None when it is not available.
+        frame_code: Returns the code around the failing lines of traceback frames.
+        clear: Removes all the cached sources.
+        stats: Returns the hit/miss/invalidation counters of the cache.
+    """
+
+    # The frames in these directories, the standard library and the installed packages, are not extracted.
+    LIBRARY_PATHS = tuple(
+        {
+            os.path.abspath(path)
+            for name in ("stdlib", "platstdlib", "purelib", "platlib")
+            for path in [sysconfig.get_paths().get(name)]
+            if path
+        }
+    )
+
+    def __init__(self, max_entries: int = 1024, window: int = 3, max_frames: int = 5):
+        self.max_entries = max_entries
+        self.window = window
+        self.max_frames = max_frames
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def source(self, func: Callable) -> Optional[str]:
+        """
+        Returns the source code of a function, found once and found again when its file changes.
+
+        Args:
+            func (Callable): The function.
+
+        Returns:
+            str: The source code, or None when it is not available.
+        """
+        func = inspect.unwrap(func)
+        code = getattr(func, "__code__", None)
+        if code is None:
+            return self._find_source(func)
+
+        mtime = self._mtime(code.co_filename)
+        with self._lock:
+            entry = self._entries.get(code)
+            if entry is not None and entry[0] == mtime:
+                self._entries.move_to_end(code)
+                self._counters["hits"] += 1
+                return entry[1]
+            self._counters["invalidations" if entry is not None else "misses"] += 1
+
+        if entry is not None:
+            linecache.checkcache(code.co_filename)
+        source = self._find_source(func)
+        with self._lock:
+            self._entries[code] = (mtime, source)
+            self._entries.move_to_end(code)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return source
+
+    def frame_code(self, frames: List[Tuple[str, int, str]]) -> str:
+        """
+        Returns the code around the failing line of each frame, innermost frames last. The frames of the standard library
+        and of the installed packages are skipped.
+
+        Args:
+            frames (List[Tuple[str, int, str]]): The file name, line number and function name of each frame, outermost first.
+
+        Returns:
+            str: One window of numbered lines per frame, the failing line marked with ">", or "" when no code is available.
+        """
+        frames = [
+            frame
+            for frame in frames
+            if not os.path.abspath(frame[0]).startswith(self.LIBRARY_PATHS)
+        ][-self.max_frames :]
+        windows = []
+        checked = set()
+        for filename, lineno, name in frames:
+            if filename not in checked:
+                linecache.checkcache(filename)
+                checked.add(filename)
+            lines = linecache.getlines(filename)
+            if not lines or lineno > len(lines):
+                continue
+            start = max(lineno - self.window, 1)
+            end = min(lineno + self.window, len(lines))
+            window = [
+                f"{'>' if number == lineno else ' '} {number:>5} | {lines[number - 1].rstrip()}"
+                for number in range(start, end + 1)
+            ]
+            windows.append(
+                f"# {os.path.basename(filename)}, lines {start}-{end}, in {name}\n"
+                + "\n".join(window)
+            )
+        return "\n\n".join(windows)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["size"] = len(self._entries)
+        return stats
+
+    @staticmethod
+    def _find_source(func: Callable) -> Optional[str]:
+        try:
+            return inspect.getsource(func)
+        except (OSError, TypeError):
+            pass
+        code = getattr(func, "__code__", None)
+        if code is None:
+            return None
+        lines = linecache.getlines(code.co_filename, getattr(func, "__globals__", None))
+        if not lines or code.co_firstlineno > len(lines):
+            return None
+        try:
+            return "".join(inspect.getblock(lines[code.co_firstlineno - 1 :]))
+        except (IndentationError, SyntaxError):
+            return None
+
+    @staticmethod
+    def _mtime(filename: str) -> Optional[int]:
+        try:
+            return os.stat(filename).st_mtime_ns
+        except (OSError, ValueError):
+            return None
@@ -1,5 +1,8 @@
+import math
 from crewai import Agent, Task
-from typing import Any, Tuple
+from bitefix.BiteFixAIAgents import BiteFixAIAgents
+from bitefix.BiteFixAIPromptBuilder import BiteFixAIPromptBuilder
+from typing import Any, List, Tuple
 
 
 class BiteFixAITasks:
@@ -10,76 +13,228 @@ class BiteFixAITasks:
 
     Attributes:
         function_code (str): The function code.
-        arguments (Tuple[Any, ...]): The arguments passed to the function.
-        error_message (str): The error message.
+        arguments (Tuple[Any, ...]): The arguments passed to the function, or their previews as a string.
+        error_message (str): The error message, or the BiteFixAISnapshot of the error.
+        max_prompt_tokens (int): Token ceiling of the description of each task, apart from the outputs of its context tasks.
+            When set, every block of the shared context is cut to fit: the code of the other frames of the traceback first, then the local variables,
+            then the start of the traceback and the argument previews, while the function code keeps at least MIN_CODE_SHARE of the budget
+            and is trimmed to the lines involved in the traceback if needed.
+        max_argument_chars (int): Maximum number of characters of the preview of each argument.
+        prompt_sizes (dict): Estimated token count of the prompt of each task created so far.
+        prompt_layout (str): "default" gives the shared context block, the function code, description, arguments and error, to the first task only.
+            The later tasks get the outputs of the earlier tasks as their context, with the function code and the error message,
+            so the arguments, traceback and local variables are sent once. A task run without context, such as an idea generation task
+            running concurrently with the diagnosis, gets the shared context block.
+            "prefix" starts every task description with the shared context block, followed by the instructions of the task,
+            so that the prompts of all the stages of an error share a long common prefix that the provider can cache.
 
     Methods:
+        TriageTask: Returns a task responsible for a quick diagnosis of the error with a confidence and a severity score.
         DiagnosisTask: Returns a task responsible for diagnosing the error.
         IdeaGenerationTask: Returns a task responsible for generating ideas to fix the error.
         IdeasEvaluationTask: Returns a task responsible for evaluating and choosing the best idea to fix the error.
         CodeDevelopmentTask: Returns a task responsible for writing the code to fix the error.
+        CodeCandidateTask: Returns a task responsible for writing one more candidate fix from the chosen idea, for the BiteFixAIVerifier.
+
+    The first two tasks only need the function code, arguments and error, so they can run with `async_execution`.
+    The last three tasks accept the tasks whose outputs they depend on as `context`.
     """
 
+    # Upper bound of the tokens taken by the instructions of a task description.
+    INSTRUCTION_TOKENS = 300
+    # Share of the token budget kept for the function code before the other blocks are cut.
+    MIN_CODE_SHARE = 0.5
+    MAX_ERROR_SUMMARY_CHARS = 500
+
     def __init__(
         self,
         function_code: str,
         function_description: str,
         arguments: Tuple[Any, ...],
         error_message: str,
+        max_prompt_tokens: int = None,
+        max_argument_chars: int = 1000,
+        prompt_layout: str = "default",
     ):
+        if prompt_layout not in BiteFixAIAgents.PROMPT_LAYOUTS:
+            raise ValueError(
+                f"The prompt layout should be one of {', '.join(BiteFixAIAgents.PROMPT_LAYOUTS)}."
+            )
         self.function_code = function_code
         self.function_description = function_description
         self.arguments = arguments
         self.error_message = error_message
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_argument_chars = max_argument_chars
+        self.prompt_layout = prompt_layout
+        self.prompt_sizes = {}
         self.function_description_block = (
             f"The function description is given to you here - {self.function_description}. "
             if self.function_description
             else ""
         )
 
-    def DiagnosisTask(self, agent: Agent) -> Task:
-        return Task(
-            description=f"""Go through the function code, arguments passed and the error message and explain why the error occured. 
-            Explain why the function failed for the arguments passed. Explain it in normal human language. 
-            The function code is given to you here - {self.function_code}. 
+        promptBuilder = BiteFixAIPromptBuilder(max_argument_chars=max_argument_chars)
+        self.arguments_block = (
+            arguments
+            if isinstance(arguments, str)
+            else promptBuilder.summarize_arguments(arguments)
+        )
+        self.error_block = str(error_message)
+        code_budget = None
+        if max_prompt_tokens is not None:
+            available = max(
+                max_prompt_tokens
+                - self.INSTRUCTION_TOKENS
+                - promptBuilder.estimate_tokens(self.function_description_block),
+                0,
+            )
+            context_budget = available - min(
+                promptBuilder.estimate_tokens(function_code),
+                math.ceil(available * self.MIN_CODE_SHARE),
+            )
+            self.arguments_block = promptBuilder.fit_text(
+                self.arguments_block,
+                max(
+                    context_budget - promptBuilder.estimate_tokens(self.error_block),
+                    context_budget // 3,
+                ),
+            )
+            self.error_block = promptBuilder.fit_error(
+                error_message,
+                context_budget - promptBuilder.estimate_tokens(self.arguments_block),
+            )
+            code_budget = available - promptBuilder.estimate_tokens(
+                self.arguments_block + self.error_block
+            )
+        self.function_code_block = promptBuilder.fit_code(
+            function_code, error_message, code_budget
+        )
+        self.error_summary = self._error_summary(error_message)
+        self.shared_context_block = f"""The function code is given to you here - {self.function_code_block}. 
+            {self.function_description_block}
+            The arguments passed are given to you here - {self.arguments_block}. 
+            The error message is given to you here - {self.error_block}."""
+        self.code_context_block = f"""The function code is given to you here - {self.function_code_block}. 
             {self.function_description_block}
-            The arguments passed are given to you here - {self.arguments}. 
-            The error message is given to you here - {self.error_message}.""",
+            The error is given to you here - {self.error_summary}. 
+            The diagnosis of the error with the arguments passed is given to you in the context."""
+
+    def TriageTask(self, agent: Agent) -> Task:
+        task = Task(
+            description=self._description(
+                f"""Go through the function code, arguments passed and the error message and briefly explain why the error occured. 
+            Then rate your confidence in the explanation and the severity of the error between 0 and 1. 
+            End your answer with a line "Confidence: <number>" and a line "Severity: <number>". 
+            """,
+                self.shared_context_block,
+            ),
+            agent=agent,
+        )
+        return self._measure("TriageTask", task)
+
+    def DiagnosisTask(self, agent: Agent, async_execution: bool = False) -> Task:
+        task = Task(
+            description=self._description(
+                f"""Go through the function code, arguments passed and the error message and explain why the error occured. 
+            Explain why the function failed for the arguments passed. Explain it in normal human language. 
+            """,
+                self.shared_context_block,
+            ),
             agent=agent,
+            async_execution=async_execution,
         )
+        return self._measure("DiagnosisTask", task)
 
-    def IdeaGenerationTask(self, agent: Agent) -> Task:
-        return Task(
-            description=f"""Generate ideas on how to fix the error in normal human language. 
+    def IdeaGenerationTask(
+        self, agent: Agent, async_execution: bool = False, context: List[Task] = None
+    ) -> Task:
+        task = Task(
+            description=self._description(
+                f"""Generate ideas on how to fix the error in normal human language. 
             You also think of best practices and efficiency while suggesting the ideas. 
-            Consider the below given information while generating ideas:
-            The function code is given to you here - {self.function_code}. 
-            {self.function_description_block}
-            The arguments passed are given to you here - {self.arguments}. 
-            The error message is given to you here - {self.error_message}. """,
+            """,
+                f"""Consider the below given information while generating ideas:
+            {self.code_context_block if context else self.shared_context_block}""",
+            ),
             agent=agent,
+            async_execution=async_execution,
+            context=context,
         )
+        return self._measure("IdeaGenerationTask", task)
 
-    def IdeasEvaluationTask(self, agent: Agent) -> Task:
-        return Task(
-            description=f"""Evaluate the error fix ideas and choose the best idea to fix the error.
+    def IdeasEvaluationTask(self, agent: Agent, context: List[Task] = None) -> Task:
+        task = Task(
+            description=self._description(
+                f"""Evaluate the error fix ideas and choose the best idea to fix the error.
             Also explain your decision to fix the error in normal human language. 
             Also think of best practices and efficiency while evaluating the ideas. 
-            Take a look on below given information while evaluating the ideas as well if needed:
-            The function code is given to you here - {self.function_code}. 
+            """,
+                f"""Take a look on below given information while evaluating the ideas as well if needed:
             {self.function_description_block}
-            The arguments passed are given to you here - {self.arguments}. 
-            The error message is given to you here - {self.error_message}.""",
+            The error is given to you here - {self.error_summary}.""",
+            ),
             agent=agent,
+            context=context,
         )
+        return self._measure("IdeasEvaluationTask", task)
 
-    def CodeDevelopmentTask(self, agent: Agent) -> Task:
-        return Task(
-            description=f"""Rewrite the function code to fix the error based on the idea chosen. 
+    def CodeDevelopmentTask(self, agent: Agent, context: List[Task] = None) -> Task:
+        task = Task(
+            description=self._description(
+                f"""Rewrite the function code to fix the error based on the idea chosen. 
             Also explain the implementation details in normal human language. 
-            The function code is given to you here - {self.function_code}. 
-            {self.function_description_block}
-            The arguments passed are given to you here - {self.arguments}. 
-            The error message is given to you here - {self.error_message}. """,
+            """,
+                self.code_context_block if context else self.shared_context_block,
+            ),
+            agent=agent,
+            context=context,
+        )
+        return self._measure("CodeDevelopmentTask", task)
+
+    def CodeCandidateTask(self, agent: Agent, idea: str, candidate: int) -> Task:
+        task = Task(
+            description=self._description(
+                f"""Rewrite the function code to fix the error based on the idea chosen, as candidate fix number {candidate}. 
+            Other developers write other candidates at the same time, so prefer a different correct implementation to the most obvious one. 
+            Give the complete rewritten function, with the same name and parameters, in a single python code block. 
+            The idea chosen is given to you here - {idea}. 
+            """,
+                self.shared_context_block,
+            ),
             agent=agent,
+            async_execution=True,
+        )
+        return self._measure("CodeCandidateTask", task)
+
+    def _description(self, instructions: str, information: str) -> str:
+        """
+        Lays out a task description. In the "prefix" layout, the shared context block comes first and the given information of the task is left out,
+        as the shared context block holds it.
+        """
+        if self.prompt_layout == "prefix":
+            return f"{self.shared_context_block}\n\n{instructions.strip()}"
+        return instructions + information
+
+    @classmethod
+    def _error_summary(cls, error: Any) -> str:
+        """
+        Returns the error type and message, without the traceback.
+        """
+        if hasattr(error, "exception_type"):
+            summary = f"{error.exception_type}: {error.error_message}"
+        elif isinstance(error, BaseException):
+            summary = f"{type(error).__name__}: {error}"
+        else:
+            lines = [line for line in str(error).splitlines() if line.strip()]
+            summary = lines[-1].strip() if lines else ""
+        return BiteFixAIPromptBuilder.fit_text(
+            summary,
+            cls.MAX_ERROR_SUMMARY_CHARS // BiteFixAIPromptBuilder.CHARS_PER_TOKEN,
+        )
+
+    def _measure(self, name: str, task: Task) -> Task:
+        self.prompt_sizes[name] = BiteFixAIPromptBuilder.estimate_tokens(
+            task.description
         )
+        return task
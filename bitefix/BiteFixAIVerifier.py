@@ -0,0 +1,366 @@
+import ast
+import base64
+import importlib.util
+import json
+import linecache
+import os
+import pickle
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional
+from bitefix.BiteFixAISnapshot import BiteFixAISnapshot
+from bitefix.BiteFixAISourceCache import BiteFixAISourceCache
+
+# Runs in the subprocess. It applies the resource limits, then reads the payload from stdin, runs the library imports of the module
+# of the function, defines the candidate function and calls it on the failing arguments. The report is the only output on stdout,
+# the output of the candidate goes to stderr.
+_CHILD = r"""
+import json, math, pickle, sys, time
+cpu_seconds, max_memory_mb = float(sys.argv[1]), int(sys.argv[2])
+try:
+    import resource
+    if cpu_seconds > 0:
+        resource.setrlimit(resource.RLIMIT_CPU, (math.ceil(cpu_seconds), math.ceil(cpu_seconds) + 1))
+    if max_memory_mb > 0:
+        resource.setrlimit(resource.RLIMIT_AS, (max_memory_mb << 20, max_memory_mb << 20))
+except (ImportError, ValueError, OSError):
+    pass
+
+stdout, sys.stdout = sys.stdout, sys.stderr
+payload = pickle.load(sys.stdin.buffer)
+sys.path[:] = payload["sys_path"]
+report = {"passed": False, "stage": "compile"}
+try:
+    code = compile(payload["code"], "<bitefix candidate>", "exec")
+    namespace = {"__name__": "__bitefix_candidate__"}
+    for statement in payload["imports"]:
+        try:
+            exec(statement, namespace)
+        except Exception:
+            pass
+    report["stage"] = "define"
+    exec(code, namespace)
+    function = namespace.get(payload["function_name"])
+    if not callable(function):
+        raise NameError(f"The candidate does not define {payload['function_name']}.")
+    if payload["arguments"] is None:
+        report.update(passed=True, stage="compiled")
+    else:
+        report["stage"] = "arguments"
+        arguments, keyword_arguments = pickle.loads(payload["arguments"])
+        report["stage"] = "run"
+        start = time.perf_counter()
+        result = function(*arguments, **keyword_arguments)
+        report.update(passed=True, stage="passed", run_seconds=time.perf_counter() - start, result=repr(result)[:200])
+except MemoryError:
+    report.update(stage="memory", error="MemoryError: the memory limit was exceeded.")
+except BaseException as error:
+    report["error"] = f"{type(error).__name__}: {error}"[:1000]
+stdout.write(json.dumps(report))
+stdout.flush()
+"""
+
+
+class BiteFixAIVerifier:
+
+    """
+    This class is responsible for checking the fixes written by the BiteFix AI Agents before they are shown.
+    The code of each candidate fix is extracted from the answer of the code developer, then defined and called on the failing arguments
+    recorded by the snapshot, each candidate in its own Python subprocess with CPU time, memory and wall time limits.
+    The candidates run in parallel, at most max_workers at a time, and the others are stopped as soon as one passes.
+
+    A candidate passes when it compiles, defines the function and returns without raising on the failing arguments.
+    The arguments are only recorded when they can be pickled. Otherwise the candidates are only compiled and defined.
+    The module of the function is not imported in the subprocess, so its import-time side effects do not run there.
+    The candidate is defined in a namespace holding the top-level imports of the module that come from the standard library
+    or the installed packages, read from its source file. Helpers and imports from the application itself are not available to it.
+
+    The subprocess is a fresh `python -I` interpreter, run in an empty temporary working directory, with only the library paths on sys.path
+    and an environment reduced to PATH. Besides these and the resource limits, the candidate is not sandboxed: it runs with the permissions
+    of the user, and can read and write files and use the network. Verification runs code written by the LLM, so it should only be enabled
+    for LLMs and error inputs that are trusted as much as the application itself.
+
+    Attributes:
+        candidates (int): Number of candidate fixes. The answer of the code developer is the first one,
+            the others are written concurrently by more code developer agents from the chosen idea.
+        timeout (float): Wall time limit in seconds of each candidate.
+        cpu_seconds (float): CPU time limit in seconds of each candidate. None disables it.
+        max_memory_mb (int): Address space limit in MiB of each candidate. None disables it.
+        max_workers (int): Maximum number of candidates run at the same time. Defaults to the number of CPUs.
+
+    Methods:
+        extract_code: Returns the code of the function from the answer of the code developer.
+        verify: Runs candidate codes on the failing arguments of a snapshot and returns the first one that passes with the timings of all of them.
+        summary: Returns a verification result as a text appended to the report.
+    """
+
+    _CODE_BLOCK_PATTERN = re.compile(
+        r"```[ \t]*(?:python|py)?[ \t]*\n(.*?)```", re.DOTALL
+    )
+
+    def __init__(
+        self,
+        candidates: int = 1,
+        timeout: float = 10.0,
+        cpu_seconds: float = 10.0,
+        max_memory_mb: int = 1024,
+        max_workers: int = None,
+    ):
+        if candidates < 1:
+            raise ValueError("At least one candidate is needed.")
+        self.candidates = candidates
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.max_memory_mb = max_memory_mb
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    @classmethod
+    def extract_code(cls, answer: str, function_name: str) -> Optional[str]:
+        """
+        Returns the code block of the answer defining the function, or the first code block that compiles,
+        or the whole answer if it is code. Returns None if there is no code.
+        """
+        blocks = cls._CODE_BLOCK_PATTERN.findall(answer) or [answer]
+        definition = re.compile(
+            rf"^\s*(async\s+)?def\s+{re.escape(function_name)}\s*\(", re.MULTILINE
+        )
+        for block in blocks:
+            if definition.search(block):
+                return block.strip("\n")
+        for block in blocks:
+            try:
+                compile(block, "<bitefix candidate>", "exec")
+            except (SyntaxError, ValueError):
+                continue
+            return block.strip("\n")
+        return None
+
+    def verify(self, codes: List[Optional[str]], snapshot: BiteFixAISnapshot) -> dict:
+        """
+        Runs the candidate codes on the failing arguments of a snapshot, in parallel subprocesses.
+
+        Args:
+            codes (List[str]): The code of each candidate. None stands for an answer without code.
+            snapshot (BiteFixAISnapshot): The snapshot of the failure, recorded with keep_arguments.
+
+        Returns:
+            dict: "passed", the index of the first candidate that passed or None, "code", its code,
+                and "results", the "candidate", "passed", "stage", "error", "result" and "seconds" of each candidate.
+                The stage of a candidate stopped because another one passed is "cancelled".
+        """
+        parts = snapshot.function.split(".")
+        payload = {
+            "sys_path": [
+                path
+                for path in sys.path
+                if path
+                and (
+                    os.path.abspath(path).startswith(BiteFixAISourceCache.LIBRARY_PATHS)
+                    or os.path.basename(path) in ("site-packages", "dist-packages")
+                )
+            ],
+            "imports": self._library_imports(parts),
+            "function_name": parts[-1],
+            "arguments": (
+                base64.b64decode(snapshot.pickled_arguments)
+                if snapshot.pickled_arguments
+                else None
+            ),
+        }
+
+        stopped = threading.Event()
+        processes = {}
+        lock = threading.Lock()
+        results = [None] * len(codes)
+        passed = None
+        with ThreadPoolExecutor(
+            max_workers=min(self.max_workers, max(len(codes), 1)),
+            thread_name_prefix="bitefix-verifier",
+        ) as executor:
+            futures = {
+                executor.submit(
+                    self._run_candidate,
+                    index,
+                    code,
+                    payload,
+                    stopped,
+                    processes,
+                    lock,
+                ): index
+                for index, code in enumerate(codes)
+            }
+            for future in as_completed(futures):
+                result = future.result()
+                results[result["candidate"]] = result
+                if result["passed"] and passed is None:
+                    passed = result["candidate"]
+                    stopped.set()
+                    with lock:
+                        for process in processes.values():
+                            process.kill()
+        return {
+            "passed": passed,
+            "code": codes[passed] if passed is not None else None,
+            "results": results,
+        }
+
+    def _run_candidate(
+        self,
+        index: int,
+        code: Optional[str],
+        payload: dict,
+        stopped: threading.Event,
+        processes: dict,
+        lock: threading.Lock,
+    ) -> dict:
+        result = {"candidate": index, "passed": False, "seconds": 0.0}
+        if code is None:
+            result.update(stage="extract", error="The answer holds no code.")
+            return result
+        start = time.perf_counter()
+        working_directory = tempfile.TemporaryDirectory(prefix="bitefix-candidate-")
+        with lock:
+            if stopped.is_set():
+                working_directory.cleanup()
+                result["stage"] = "cancelled"
+                return result
+            process = subprocess.Popen(
+                [
+                    sys.executable,
+                    "-I",
+                    "-c",
+                    _CHILD,
+                    str(self.cpu_seconds or 0),
+                    str(self.max_memory_mb or 0),
+                ],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                cwd=working_directory.name,
+                env=self._environment(working_directory.name),
+            )
+            processes[index] = process
+        try:
+            stdout, _ = process.communicate(
+                pickle.dumps(dict(payload, code=code)), timeout=self.timeout
+            )
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            stdout = None
+        finally:
+            with lock:
+                processes.pop(index, None)
+            working_directory.cleanup()
+        result["seconds"] = time.perf_counter() - start
+
+        if stdout is None:
+            result.update(
+                stage="timeout",
+                error=f"The candidate ran for more than {self.timeout} s.",
+            )
+        elif stopped.is_set() and process.returncode != 0:
+            result["stage"] = "cancelled"
+        elif process.returncode != 0 or not stdout:
+            result.update(
+                stage="killed",
+                error=(
+                    f"The candidate exceeded its CPU time limit of {self.cpu_seconds} s."
+                    if process.returncode == -getattr(signal, "SIGXCPU", 0)
+                    else f"The candidate process exited with status {process.returncode}."
+                ),
+            )
+        else:
+            result.update(json.loads(stdout))
+        return result
+
+    @staticmethod
+    def _library_imports(parts: List[str]) -> List[str]:
+        """
+        Returns the top-level import statements of the module of a function that import the standard library or installed packages,
+        read from the source file of the module loaded in this process.
+        """
+        module = None
+        for end in range(len(parts) - 1, 0, -1):
+            module = sys.modules.get(".".join(parts[:end]))
+            if module is not None:
+                break
+        filename = getattr(module, "__file__", None)
+        if not filename:
+            return []
+        try:
+            tree = ast.parse("".join(linecache.getlines(filename)))
+        except (SyntaxError, ValueError):
+            return []
+        imports = []
+        for node in tree.body:
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and not node.level and node.module:
+                names = [node.module]
+            else:
+                continue
+            if all(BiteFixAIVerifier._is_library(name) for name in names):
+                imports.append(ast.unparse(node))
+        return imports
+
+    @staticmethod
+    def _is_library(name: str) -> bool:
+        top_level = name.split(".")[0]
+        if top_level in sys.stdlib_module_names:
+            return True
+        try:
+            spec = importlib.util.find_spec(top_level)
+        except (ImportError, ValueError):
+            return False
+        origin = getattr(spec, "origin", None)
+        return bool(origin) and os.path.abspath(origin).startswith(
+            BiteFixAISourceCache.LIBRARY_PATHS
+        )
+
+    @staticmethod
+    def _environment(working_directory: str) -> dict:
+        environment = {
+            "PATH": os.environ.get("PATH", os.defpath),
+            "HOME": working_directory,
+            "TMPDIR": working_directory,
+        }
+        if "SYSTEMROOT" in os.environ:
+            environment["SYSTEMROOT"] = os.environ["SYSTEMROOT"]
+        return environment
+
+    @staticmethod
+    def summary(verification: dict) -> str:
+        """
+        Returns a verification result as a text appended to the answer of the code developer.
+        """
+        lines = ["[BITEFIX VERIFICATION]"]
+        passed = verification["passed"]
+        results = verification["results"]
+        if passed is None:
+            lines.append(
+                f"None of the {len(results)} candidate fixes passed on the failing arguments."
+            )
+        elif results[passed]["stage"] == "compiled":
+            lines.append(
+                f"Candidate {passed + 1} of {len(results)} compiles. It was not run, the failing arguments could not be recorded."
+            )
+        else:
+            lines.append(
+                f"Candidate {passed + 1} of {len(results)} passed on the failing arguments "
+                f"in {results[passed]['seconds']:.2f} s, returning {results[passed].get('result')}."
+            )
+        if passed is not None and passed > 0:
+            lines.append(f"Verified code :\n\n```python\n{verification['code']}\n```")
+        for result in results:
+            line = f"- Candidate {result['candidate'] + 1}: {result['stage']} in {result['seconds']:.2f} s"
+            if result.get("error"):
+                line += f" ({result['error']})"
+            lines.append(line)
+        return "\n".join(lines)
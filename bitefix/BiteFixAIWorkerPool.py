@@ -0,0 +1,158 @@
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+
+class BiteFixAIWorkerPool:
+
+    """
+    This class is responsible for running BiteFix AI error resolutions in the background, on a bounded pool of worker threads.
+    The decorated function hands the failure to the pool and returns right away, the report is delivered later through a future or a callback.
+
+    Attributes:
+        max_workers (int): Number of worker threads resolving errors concurrently.
+        max_queue_size (int): Maximum number of resolutions waiting for a free worker.
+        overflow_policy (str): What to do when the queue is full. "drop_newest" rejects the new resolution, "drop_oldest" cancels the oldest waiting one.
+
+    Methods:
+        submit: Queues a resolution and returns its future, or None if it was dropped.
+        stats: Returns the queue depth and the submitted/coalesced/dropped/completed/failed counters.
+        shutdown: Stops the worker threads.
+    """
+
+    OVERFLOW_POLICIES = ("drop_newest", "drop_oldest")
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_queue_size: int = 64,
+        overflow_policy: str = "drop_newest",
+    ):
+        if max_workers < 1:
+            raise ValueError("The worker pool needs at least one worker.")
+        if overflow_policy not in self.OVERFLOW_POLICIES:
+            raise ValueError(
+                f"The overflow policy should be one of {', '.join(self.OVERFLOW_POLICIES)}."
+            )
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.overflow_policy = overflow_policy
+        self._queue = deque()
+        self._keyed = OrderedDict()
+        self._workers = []
+        self._shutdown = False
+        self._condition = threading.Condition()
+        self._counters = {
+            "submitted": 0,
+            "coalesced": 0,
+            "dropped": 0,
+            "completed": 0,
+            "failed": 0,
+        }
+
+    def submit(
+        self,
+        fn: Callable,
+        *args,
+        key: str = None,
+        callback: Callable[[Any], None] = None,
+        **kwargs,
+    ) -> Optional[Future]:
+        """
+        Queues fn(*args, **kwargs) to be run by a worker thread.
+
+        Args:
+            fn (Callable): The resolution to run.
+            key (str, optional): Resolutions with the same key that are still waiting or running are coalesced into one. Defaults to None.
+            callback (Callable, optional): Called with the result of the resolution once it completes successfully. Defaults to None.
+
+        Returns:
+            Future: The future of the resolution, or None if the queue was full and the resolution was dropped.
+        """
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("The BiteFix AI worker pool has been shut down.")
+
+            if key is not None and key in self._keyed:
+                self._counters["coalesced"] += 1
+                future = self._keyed[key]
+                self._add_callback(future, callback)
+                return future
+
+            if len(self._queue) >= self.max_queue_size:
+                if self.overflow_policy == "drop_newest" or not self._queue:
+                    self._counters["dropped"] += 1
+                    return None
+                _, old_key, old_future, _, _ = self._queue.popleft()
+                self._forget(old_key, old_future)
+                old_future.cancel()
+                self._counters["dropped"] += 1
+
+            future = Future()
+            self._add_callback(future, callback)
+            self._queue.append((fn, key, future, args, kwargs))
+            if key is not None:
+                self._keyed[key] = future
+            self._counters["submitted"] += 1
+            if len(self._workers) < self.max_workers:
+                worker = threading.Thread(
+                    target=self._work, name="bitefix-worker", daemon=True
+                )
+                self._workers.append(worker)
+                worker.start()
+            self._condition.notify()
+            return future
+
+    def stats(self) -> dict:
+        with self._condition:
+            stats = dict(self._counters)
+            stats["queued"] = len(self._queue)
+            stats["in_flight"] = len(self._keyed)
+        return stats
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    @staticmethod
+    def _add_callback(future: Future, callback: Callable[[Any], None]) -> None:
+        if callback is None:
+            return
+
+        def on_done(done: Future) -> None:
+            if not done.cancelled() and done.exception() is None:
+                callback(done.result())
+
+        future.add_done_callback(on_done)
+
+    def _forget(self, key: str, future: Future) -> None:
+        if key is not None and self._keyed.get(key) is future:
+            del self._keyed[key]
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                while not self._queue and not self._shutdown:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                fn, key, future, args, kwargs = self._queue.popleft()
+
+            if future.set_running_or_notify_cancel():
+                try:
+                    result = fn(*args, **kwargs)
+                except BaseException as exc:
+                    with self._condition:
+                        self._forget(key, future)
+                        self._counters["failed"] += 1
+                    future.set_exception(exc)
+                else:
+                    with self._condition:
+                        self._forget(key, future)
+                        self._counters["completed"] += 1
+                    future.set_result(result)
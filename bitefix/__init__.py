@@ -1,2 +1,45 @@
 from .bitefix_utils import resolve
 from .bitefix_utils import resolve_with_openai
+from .bitefix_utils import warmup
+from .bitefix_utils import instrument
+from .bitefix_utils import uninstrument
+from .bitefix_utils import install_excepthook
+from .BiteFixAICache import BiteFixAICache
+from .BiteFixAIWorkerPool import BiteFixAIWorkerPool
+from .BiteFixAISingleFlight import BiteFixAISingleFlight
+from .BiteFixAIPolicy import BiteFixAIPolicy
+from .BiteFixAIResolver import BiteFixAIResolver
+from .BiteFixAILLMPool import BiteFixAILLMPool
+from .BiteFixAIInstrumentation import BiteFixAIInstrumentation
+from .BiteFixAIReportExporter import BiteFixAIReportExporter
+from .BiteFixAIReportExporter import BiteFixAIMarkdownSink
+from .BiteFixAIReportExporter import BiteFixAIJSONLinesSink
+from .BiteFixAIReportExporter import BiteFixAISQLiteSink
+from .BiteFixAIResolutionIndex import BiteFixAIResolutionIndex
+from .BiteFixAISnapshot import BiteFixAISnapshot
+from .BiteFixAISourceCache import BiteFixAISourceCache
+from .BiteFixAIVerifier import BiteFixAIVerifier
+from .BiteFixAIDaemon import BiteFixAIDaemon
+from .BiteFixAIDaemon import BiteFixAIDaemonClient
+from .BiteFixAIBatchRunner import BiteFixAIBatchRunner
+
+# Imported on first access, as they load langchain or crewai.
+_LAZY_IMPORTS = {
+    "BiteFixAIFakeLLM": ".BiteFixAIFakeLLM",
+    "BiteFixAIResponseMemo": ".BiteFixAIResponseMemo",
+    "BiteFixAIRouter": ".BiteFixAIRouter",
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+
+    value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *_LAZY_IMPORTS])
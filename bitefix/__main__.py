@@ -0,0 +1,217 @@
+"""
+Command line interface of BiteFix.
+
+Usage:
+    python -m bitefix index [--db bitefix_index.db] search --error "KeyError: 'id'" [--code function.py] [--limit 5] [--threshold 0.5]
+    python -m bitefix index [--db bitefix_index.db] show ID
+    python -m bitefix index [--db bitefix_index.db] stats
+    python -m bitefix daemon [--socket bitefix.sock | --port 8765] [--workers 2] [--queue-size 64] [--model gpt-4]
+        [--api-key-env OPENAI_API_KEY] [--cache-dir DIR] [--export-dir DIR] [--index DB] [--fake-llm] [--quiet]
+    python -m bitefix batch RECORDS [--output bitefix_batch.jsonl] [--workers 4] [--process sequential]
+        [--cache-dir DIR] [--model gpt-4] [--api-key-env OPENAI_API_KEY] [--fake-llm]
+"""
+
+import argparse
+import functools
+import json
+import os
+from typing import Callable, List
+from bitefix.BiteFixAIResolutionIndex import BiteFixAIResolutionIndex
+from bitefix.BiteFixAIReportExporter import render_report
+
+
+def index_command(options: argparse.Namespace) -> int:
+    index = BiteFixAIResolutionIndex(options.db)
+    try:
+        if options.index_command == "stats":
+            print(json.dumps(index.stats()))
+            return 0
+
+        if options.index_command == "show":
+            resolution = index.get(options.id)
+            if resolution is None:
+                print(f"There is no resolution {options.id} in {options.db}.")
+                return 1
+            print(
+                f"Resolution {resolution['id']} of {resolution['function']}, {resolution['created_at']}\n"
+                f"{resolution['exception_type']}: {resolution['error']}\n"
+            )
+            print(render_report(resolution["outputs"]))
+            return 0
+
+        code = ""
+        if options.code:
+            with open(options.code) as file:
+                code = file.read()
+        matches = index.search(
+            code, options.error, limit=options.limit, threshold=options.threshold
+        )
+        if not matches:
+            print("No similar past error found.")
+            return 1
+        for match in matches:
+            print(
+                f"{match['id']:>8}  {match['similarity']:.2f}  {match['function']}  "
+                f"{match['exception_type']}: {match['error']}"
+            )
+        return 0
+    finally:
+        index.close()
+
+
+def daemon_command(options: argparse.Namespace) -> int:
+    from bitefix.BiteFixAICache import BiteFixAICache
+    from bitefix.BiteFixAIDaemon import BiteFixAIDaemon
+    from bitefix.BiteFixAIResolver import BiteFixAIResolver
+
+    llm_factory = _llm_factory(options)
+    if llm_factory is None:
+        return 1
+    resolver = BiteFixAIResolver(
+        llm=None,
+        llm_factory=llm_factory,
+        export_dir=options.export_dir,
+        verbose=not options.quiet,
+        cache=BiteFixAICache(cache_dir=options.cache_dir),
+        index=BiteFixAIResolutionIndex(options.index) if options.index else None,
+    )
+    address = options.socket if options.port is None else (options.host, options.port)
+    daemon = BiteFixAIDaemon(
+        resolver,
+        address,
+        max_workers=options.workers,
+        max_queue_size=options.queue_size,
+    )
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.close()
+    return 0
+
+
+def batch_command(options: argparse.Namespace) -> int:
+    from bitefix.BiteFixAIBatchRunner import BiteFixAIBatchRunner
+    from bitefix.BiteFixAICache import BiteFixAICache
+
+    llm_factory = _llm_factory(options)
+    if llm_factory is None:
+        return 1
+    batch_runner = BiteFixAIBatchRunner(
+        llm_factory(),
+        output_path=options.output,
+        max_workers=options.workers,
+        cache=(
+            BiteFixAICache(cache_dir=options.cache_dir) if options.cache_dir else None
+        ),
+        process=options.process,
+    )
+    try:
+        counters = batch_runner.run(options.records)
+    except KeyboardInterrupt:
+        print(
+            f"Interrupted, run the same command again to resume from {options.output}."
+        )
+        return 130
+    print(json.dumps(counters))
+    return 1 if counters["failed"] else 0
+
+
+def _llm_factory(options: argparse.Namespace) -> Callable[[], object]:
+    """
+    Returns the factory of the language model object selected by the --fake-llm, --model and --api-key-env options,
+    or None if the API key is missing.
+    """
+    if options.fake_llm:
+        from bitefix.BiteFixAIFakeLLM import BiteFixAIFakeLLM
+
+        return BiteFixAIFakeLLM
+    from bitefix.BiteFixAILLMPool import BiteFixAILLMPool
+
+    api_key = os.environ.get(options.api_key_env)
+    if not api_key:
+        print(f"The {options.api_key_env} environment variable is not set.")
+        return None
+    return functools.partial(
+        BiteFixAILLMPool.openai, openai_api_key=api_key, model_name=options.model
+    )
+
+
+def _add_llm_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--model", default="gpt-4")
+    parser.add_argument("--api-key-env", default="OPENAI_API_KEY")
+    parser.add_argument(
+        "--fake-llm", action="store_true", help="Answer with BiteFixAIFakeLLM."
+    )
+
+
+def main(arguments: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="bitefix", description=__doc__.strip().splitlines()[0]
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    index_parser = commands.add_parser(
+        "index", help="Query the index of past error resolutions."
+    )
+    index_parser.add_argument("--db", default="bitefix_index.db")
+    index_commands = index_parser.add_subparsers(dest="index_command", required=True)
+    search_parser = index_commands.add_parser(
+        "search", help="Find the past resolutions of similar errors."
+    )
+    search_parser.add_argument(
+        "--error", required=True, help='The error, as "ExceptionType: message".'
+    )
+    search_parser.add_argument(
+        "--code", help="File holding the source code of the failing function."
+    )
+    search_parser.add_argument("--limit", type=int, default=5)
+    search_parser.add_argument("--threshold", type=float, default=0.5)
+    show_parser = index_commands.add_parser("show", help="Print a past resolution.")
+    show_parser.add_argument("id", type=int)
+    index_commands.add_parser("stats", help="Print the number of stored resolutions.")
+
+    daemon_parser = commands.add_parser(
+        "daemon", help="Resolve the errors sent by BiteFixAIDaemonClient."
+    )
+    daemon_parser.add_argument("--socket", default="bitefix.sock")
+    daemon_parser.add_argument("--host", default="127.0.0.1")
+    daemon_parser.add_argument(
+        "--port", type=int, help="Listen on TCP instead of the Unix socket."
+    )
+    daemon_parser.add_argument("--workers", type=int, default=2)
+    daemon_parser.add_argument("--queue-size", type=int, default=64)
+    daemon_parser.add_argument("--cache-dir")
+    daemon_parser.add_argument("--export-dir")
+    daemon_parser.add_argument("--index", help="Path of a resolution index database.")
+    _add_llm_arguments(daemon_parser)
+    daemon_parser.add_argument(
+        "--quiet", action="store_true", help="Do not print the reports."
+    )
+
+    batch_parser = commands.add_parser(
+        "batch", help="Resolve the distinct errors of many recorded failures."
+    )
+    batch_parser.add_argument(
+        "records",
+        help="JSON lines file of failure records, or log file holding tracebacks.",
+    )
+    batch_parser.add_argument("--output", default="bitefix_batch.jsonl")
+    batch_parser.add_argument("--workers", type=int, default=4)
+    batch_parser.add_argument(
+        "--process", choices=("sequential", "parallel"), default="sequential"
+    )
+    batch_parser.add_argument("--cache-dir")
+    _add_llm_arguments(batch_parser)
+
+    options = parser.parse_args(arguments)
+    if options.command == "daemon":
+        return daemon_command(options)
+    if options.command == "batch":
+        return batch_command(options)
+    return index_command(options)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,19 +1,72 @@
+import fnmatch
+import functools
+import importlib
 import inspect
 import os
-from typing import Any, Callable
-from langchain_openai import ChatOpenAI
-from bitefix.BiteFixAIRunner import BiteFixAIRunner
-from crewai.tasks.task_output import TaskOutput
-from typing import List
-from datetime import datetime
+import pkgutil
+import sys
+import threading
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Tuple, Union
+from bitefix.BiteFixAIResolver import BiteFixAIResolver
+from bitefix.BiteFixAILLMPool import BiteFixAILLMPool
+from bitefix.BiteFixAIInstrumentation import BiteFixAIInstrumentation
+from bitefix.BiteFixAICache import BiteFixAICache
+from bitefix.BiteFixAIWorkerPool import BiteFixAIWorkerPool
+from bitefix.BiteFixAISingleFlight import BiteFixAISingleFlight
+from bitefix.BiteFixAIPolicy import BiteFixAIPolicy
+from bitefix.BiteFixAIResolutionIndex import BiteFixAIResolutionIndex
+from bitefix.BiteFixAIDaemon import BiteFixAIDaemonClient
+from bitefix.BiteFixAISourceCache import BiteFixAISourceCache
+from bitefix.BiteFixAIVerifier import BiteFixAIVerifier
+from bitefix.BiteFixAIReportExporter import (
+    BiteFixAIReportExporter,
+    REPORT_SECTIONS,
+    atomic_write,
+    render_report,
+    render_report_section,
+    report_file_name,
+    report_id,
+)
+
+if TYPE_CHECKING:
+    from crewai.tasks.task_output import TaskOutput
+    from bitefix.BiteFixAIResponseMemo import BiteFixAIResponseMemo
+
 
 def resolve_with_openai(
     openai_api_key: str,
     function_description: str = None,
     model_name: str = "gpt-4",
     temperature: float = 0.7,
+    request_timeout: float = None,
+    max_retries: int = 2,
+    max_concurrency: int = 10,
     export_dir: str = None,
     verbose: bool = True,
+    cache: BiteFixAICache = None,
+    worker_pool: BiteFixAIWorkerPool = None,
+    single_flight: BiteFixAISingleFlight = None,
+    policy: BiteFixAIPolicy = None,
+    on_resolved: Callable[[List[str]], None] = None,
+    reraise: bool = False,
+    process: str = "sequential",
+    idea_generators: int = 1,
+    max_prompt_tokens: int = None,
+    stream: bool = False,
+    stage_llms: dict = None,
+    tiered: bool = False,
+    escalate_confidence: float = 0.5,
+    escalate_severity: float = 0.7,
+    instrumentation: BiteFixAIInstrumentation = None,
+    exporter: BiteFixAIReportExporter = None,
+    index: BiteFixAIResolutionIndex = None,
+    daemon: BiteFixAIDaemonClient = None,
+    source_cache: BiteFixAISourceCache = None,
+    verifier: BiteFixAIVerifier = None,
+    prompt_layout: str = "default",
+    response_memo: "BiteFixAIResponseMemo" = None,
+    fallback_model_names: List[str] = None,
 ) -> Callable:
     """
     Bite Fix AI Decorator that provides error resolution on Runtime Errors using BiteFix AI Agents and OpenAI's Large Language Model.
@@ -23,90 +76,95 @@ def resolve_with_openai(
         function_description (str, optional): Recommended to provide a description of the function to be resolved. It should not be less than 20 words and more than 50 words. Defaults to None.
         model_name (str, optional): The name of the model to use. Defaults to "gpt4".
         temperature (float, optional): The temperature for generating responses. Defaults to 0.7.
+        request_timeout (float, optional): Timeout of each OpenAI request in seconds. Defaults to None, which uses the 600 seconds of BiteFixAILLMPool.DEFAULT_REQUEST_TIMEOUT.
+        max_retries (int, optional): Number of retries of a failed OpenAI request. Defaults to 2.
+        max_concurrency (int, optional): Maximum number of concurrent connections to OpenAI for this configuration. Defaults to 10.
         export_dir (str, optional): The path to the directory to export the error resolution report. Defaults to None.
         verbose (bool, optional): Whether to print the output of the BiteFix AI process. Defaults to True.
+        cache (BiteFixAICache, optional): The cache used to reuse the error resolution report of a repeated error. Defaults to None.
+        worker_pool (BiteFixAIWorkerPool, optional): Runs the error resolution in the background so the decorated function returns right away. Defaults to None.
+        single_flight (BiteFixAISingleFlight, optional): Makes concurrent identical errors share one in-flight error resolution. Defaults to None.
+        policy (BiteFixAIPolicy, optional): Sampling, rate limits and circuit breaker deciding which errors are resolved. Defaults to None.
+        on_resolved (Callable, optional): Called with the list of task outputs once the error resolution report is ready. Defaults to None.
+        reraise (bool, optional): Whether to re-raise the error instead of returning None. Defaults to False.
+        process (str, optional): "sequential" runs the four agents one after another, "parallel" runs the diagnosis and the idea generation concurrently. Defaults to "sequential".
+        idea_generators (int, optional): Number of idea generation agents run concurrently with separate LLM calls in the "parallel" process. Defaults to 1.
+        max_prompt_tokens (int, optional): Token ceiling of each task prompt. Large function code is trimmed to the lines involved in the traceback to fit. Defaults to None.
+        stream (bool, optional): Whether to print and export the output of each agent as soon as it is produced instead of once all of them are complete. Defaults to False.
+        stage_llms (dict, optional): LLM objects overriding the default LLM for some stages, keyed by "triage", "diagnosis", "idea_generation", "ideas_evaluation" or "code_development". Defaults to None.
+        tiered (bool, optional): Whether to run a single triage call first and only run the full crew when its confidence is low or the error is severe. Defaults to False.
+        escalate_confidence (float, optional): In the tiered mode, the full crew runs when the triage confidence is below this value. Defaults to 0.5.
+        escalate_severity (float, optional): In the tiered mode, the full crew runs when the triage severity is at least this value. Defaults to 0.7.
+        instrumentation (BiteFixAIInstrumentation, optional): Records per-stage timings, token counts, cache and queue metrics and the call count, and passes them to its hooks. Defaults to None, which disables instrumentation.
+        exporter (BiteFixAIReportExporter, optional): Exports the error resolution reports to its sinks in the background. Defaults to None, in which case the reports are exported to export_dir in the background.
+        index (BiteFixAIResolutionIndex, optional): Index of past error resolutions, reused for near-duplicate errors and completed with each new resolution. Defaults to None.
+        daemon (BiteFixAIDaemonClient, optional): Sends the snapshots of the errors to a BiteFixAIDaemon resolving them in another process. Defaults to None.
+        source_cache (BiteFixAISourceCache, optional): Finds and caches the source code of the function and extracts the code of the traceback frames. Defaults to a new BiteFixAISourceCache.
+        verifier (BiteFixAIVerifier, optional): Runs the fixes on the failing arguments in sandboxed subprocesses and reports which one passes. Defaults to None.
+        prompt_layout (str, optional): "prefix" starts the prompts of all the agents with the same function code, arguments and error block, so that the provider can cache it. Defaults to "default".
+        response_memo (BiteFixAIResponseMemo, optional): Reuses the LLM responses to prompts already sent with the same model parameters. Defaults to None.
+            Responses sampled above its max_temperature, 0.0 by default, are not memoized, so with the default temperature of 0.7 it never hits
+            and a warning is issued: set temperature=0 or raise max_temperature to use it.
+        fallback_model_names (List[str], optional): Names of other models. The calls are then routed by a BiteFixAIRouter to the fastest healthy model, hedged when slow and retried on another model when they fail. Defaults to None.
 
     Returns:
         function: Decorator function that provides error resolution using BiteFix AI Agents and OpenAI's Large Language Model.
     """
 
-    def resolve_with_openai_decorator(func) -> Callable:
-        def function_causing_error(*args, **kwargs) -> Any:
-            """
-            Function that executes the decorated function and handles errors.
-
-            Args:
-                *args: Positional arguments for the decorated function.
-                **kwargs: Keyword arguments for the decorated function.
-
-            Returns:
-                Any: The result of the decorated function.
-            """
-            try:
-                result = func(*args, **kwargs)
-                print("Successfully executed the function.")
-                return result
-            except Exception as e:
-                print("Error occurred while executing the function. - ", e)
-                print("Starting Bite Fix AI ...\n")
-                code = inspect.getsource(func)
-
-                os.environ["OPENAI_API_KEY"] = openai_api_key
-                llm = ChatOpenAI(temperature=temperature, model_name=model_name)
-
-                if function_description:
-                    if (
-                        len(function_description.split()) < 20
-                        or len(function_description.split()) > 50
-                    ):
-                        raise ValueError(
-                            "The function description should be within the word limit of 20-50 words."
-                        )
-                print("Running BiteFix AI ...\n")
-                try:
-                    biteFixAIRunner = BiteFixAIRunner(
-                        function_code=code,
-                        function_description=function_description,
-                        arguments=args,
-                        error_message=e,
-                        llm=llm,
-                    )
-                    result = biteFixAIRunner.run()
-                except Exception as ex:
-                    print("Error occurred while running BiteFix AI - ", ex)
-                    return None
-                print("BiteFix AI completed.\n")
-                if verbose:
-                    print("BiteFix AI Error Resoltion Report: \n\n")
-                    print(
-                        "[PYTHON CODE DIAGNOSIS EXPERT] Error Diagnosis :\n\n",
-                        result["tasks_outputs"][0].result().replace("```", ""),
-                    )
-                    print(
-                        "\n\n[SENIOR PYTHON CODE EXPERT] Error resolution Ideas :\n\n",
-                        result["tasks_outputs"][1].result().replace("```", ""),
-                    )
-                    print(
-                        "\n\n[LEAD PYTHON CODE EXPERT] Best Resolution Idea Evaluation :\n\n",
-                        result["tasks_outputs"][2].result().replace("```", ""),
-                    )
-                    print(
-                        "\n\n[PYTHON CODE DEVELOPER] Resolution Idea Implemenation  :\n\n",
-                        result["tasks_outputs"][3].result(),
-                    )
-
-                try:
-                    if export_dir:
-                        export_error_resolution_report(
-                            result["tasks_outputs"], export_dir
-                        )
-                except Exception as exc:
-                    print(
-                        "Error occurred while exporting the error resolution report - ",
-                        exc,
-                    )
+    _check_function_description(function_description)
+    if response_memo is not None:
+        response_memo.check_temperature(temperature=temperature)
+    biteFixAIResolver = BiteFixAIResolver(
+        llm=None,
+        llm_factory=(
+            functools.partial(
+                BiteFixAILLMPool.openai_router,
+                openai_api_key=openai_api_key,
+                model_names=[model_name, *fallback_model_names],
+                temperature=temperature,
+                request_timeout=request_timeout,
+                max_retries=max_retries,
+                max_concurrency=max_concurrency,
+            )
+            if fallback_model_names
+            else functools.partial(
+                BiteFixAILLMPool.openai,
+                openai_api_key=openai_api_key,
+                model_name=model_name,
+                temperature=temperature,
+                request_timeout=request_timeout,
+                max_retries=max_retries,
+                max_concurrency=max_concurrency,
+            )
+        ),
+        export_dir=export_dir,
+        verbose=verbose,
+        cache=cache,
+        worker_pool=worker_pool,
+        single_flight=single_flight,
+        policy=policy,
+        on_resolved=on_resolved,
+        reraise=reraise,
+        process=process,
+        idea_generators=idea_generators,
+        max_prompt_tokens=max_prompt_tokens,
+        stream=stream,
+        stage_llms=stage_llms,
+        tiered=tiered,
+        escalate_confidence=escalate_confidence,
+        escalate_severity=escalate_severity,
+        instrumentation=instrumentation,
+        exporter=exporter,
+        index=index,
+        daemon=daemon,
+        source_cache=source_cache,
+        verifier=verifier,
+        prompt_layout=prompt_layout,
+        response_memo=response_memo,
+    )
 
-        return function_causing_error
+    def resolve_with_openai_decorator(func) -> Callable:
+        return biteFixAIResolver.wrap(func, function_description)
 
     return resolve_with_openai_decorator
 
@@ -116,131 +174,402 @@ def resolve(
     function_description: str = None,
     export_dir: str = None,
     verbose: bool = True,
+    cache: BiteFixAICache = None,
+    worker_pool: BiteFixAIWorkerPool = None,
+    single_flight: BiteFixAISingleFlight = None,
+    policy: BiteFixAIPolicy = None,
+    on_resolved: Callable[[List[str]], None] = None,
+    reraise: bool = False,
+    process: str = "sequential",
+    idea_generators: int = 1,
+    max_prompt_tokens: int = None,
+    stream: bool = False,
+    stage_llms: dict = None,
+    tiered: bool = False,
+    escalate_confidence: float = 0.5,
+    escalate_severity: float = 0.7,
+    instrumentation: BiteFixAIInstrumentation = None,
+    exporter: BiteFixAIReportExporter = None,
+    index: BiteFixAIResolutionIndex = None,
+    daemon: BiteFixAIDaemonClient = None,
+    source_cache: BiteFixAISourceCache = None,
+    verifier: BiteFixAIVerifier = None,
+    prompt_layout: str = "default",
+    response_memo: "BiteFixAIResponseMemo" = None,
 ) -> Callable:
     """
     Bite Fix AI Decorator that provides error resolution on Runtime Errors using BiteFiix AI Agents and the provided LLM.
 
     Args:
-        llm (object): The language model object to use for error resolution.
+        llm (object): The language model object to use for error resolution. Can be None when a daemon resolves the errors.
         export_dir (str, optional): The directory to export Error Resoltion Report by BiteFix AI Agents and fixed code python file. Defaults to None.
         function_description (str, optional): Recommended to provide a description of the function to be resolved. Word limit: 20-50 words. Defaults to None.
         verbose (bool, optional): Whether to print the output of the BiteFix AI process. Defaults to True.
+        cache (BiteFixAICache, optional): The cache used to reuse the error resolution report of a repeated error. Defaults to None.
+        worker_pool (BiteFixAIWorkerPool, optional): Runs the error resolution in the background so the decorated function returns right away. Defaults to None.
+        single_flight (BiteFixAISingleFlight, optional): Makes concurrent identical errors share one in-flight error resolution. Defaults to None.
+        policy (BiteFixAIPolicy, optional): Sampling, rate limits and circuit breaker deciding which errors are resolved. Defaults to None.
+        on_resolved (Callable, optional): Called with the list of task outputs once the error resolution report is ready. Defaults to None.
+        reraise (bool, optional): Whether to re-raise the error instead of returning None. Defaults to False.
+        process (str, optional): "sequential" runs the four agents one after another, "parallel" runs the diagnosis and the idea generation concurrently. Defaults to "sequential".
+        idea_generators (int, optional): Number of idea generation agents run concurrently with separate LLM calls in the "parallel" process. Defaults to 1.
+        max_prompt_tokens (int, optional): Token ceiling of each task prompt. Large function code is trimmed to the lines involved in the traceback to fit. Defaults to None.
+        stream (bool, optional): Whether to print and export the output of each agent as soon as it is produced instead of once all of them are complete. Defaults to False.
+        stage_llms (dict, optional): LLM objects overriding the default LLM for some stages, keyed by "triage", "diagnosis", "idea_generation", "ideas_evaluation" or "code_development". Defaults to None.
+        tiered (bool, optional): Whether to run a single triage call first and only run the full crew when its confidence is low or the error is severe. Defaults to False.
+        escalate_confidence (float, optional): In the tiered mode, the full crew runs when the triage confidence is below this value. Defaults to 0.5.
+        escalate_severity (float, optional): In the tiered mode, the full crew runs when the triage severity is at least this value. Defaults to 0.7.
+        instrumentation (BiteFixAIInstrumentation, optional): Records per-stage timings, token counts, cache and queue metrics and the call count, and passes them to its hooks. Defaults to None, which disables instrumentation.
+        exporter (BiteFixAIReportExporter, optional): Exports the error resolution reports to its sinks in the background. Defaults to None, in which case the reports are exported to export_dir in the background.
+        index (BiteFixAIResolutionIndex, optional): Index of past error resolutions, reused for near-duplicate errors and completed with each new resolution. Defaults to None.
+        daemon (BiteFixAIDaemonClient, optional): Sends the snapshots of the errors to a BiteFixAIDaemon resolving them in another process. Defaults to None.
+        source_cache (BiteFixAISourceCache, optional): Finds and caches the source code of the function and extracts the code of the traceback frames. Defaults to a new BiteFixAISourceCache.
+        verifier (BiteFixAIVerifier, optional): Runs the fixes on the failing arguments in sandboxed subprocesses and reports which one passes. Defaults to None.
+        prompt_layout (str, optional): "prefix" starts the prompts of all the agents with the same function code, arguments and error block, so that the provider can cache it. Defaults to "default".
+        response_memo (BiteFixAIResponseMemo, optional): Reuses the LLM responses to prompts already sent with the same model parameters. Defaults to None.
 
     Returns:
         function: Decorator function that provides error resolution using the BiteFix AI Agents and provided Large Language Model.
     """
 
+    _check_function_description(function_description)
+    biteFixAIResolver = BiteFixAIResolver(
+        llm=llm,
+        export_dir=export_dir,
+        verbose=verbose,
+        cache=cache,
+        worker_pool=worker_pool,
+        single_flight=single_flight,
+        policy=policy,
+        on_resolved=on_resolved,
+        reraise=reraise,
+        process=process,
+        idea_generators=idea_generators,
+        max_prompt_tokens=max_prompt_tokens,
+        stream=stream,
+        stage_llms=stage_llms,
+        tiered=tiered,
+        escalate_confidence=escalate_confidence,
+        escalate_severity=escalate_severity,
+        instrumentation=instrumentation,
+        exporter=exporter,
+        index=index,
+        daemon=daemon,
+        source_cache=source_cache,
+        verifier=verifier,
+        prompt_layout=prompt_layout,
+        response_memo=response_memo,
+    )
+
     def resolve_decorator(func) -> Callable:
-        def function_causing_error(*args, **kwargs) -> Any:
-            """
-            Function that executes the decorated function and handles errors.
-
-            Args:
-                *args: Positional arguments for the decorated function.
-                **kwargs: Keyword arguments for the decorated function.
-
-            Returns:
-                Any: The result of the decorated function.
-
-            Raises:
-                Exception: If an error occurs while executing the decorated function.
-            """
-            try:
-                result = func(*args, **kwargs)
-                print("Successfully executed the function.")
-                return result
-            except Exception as e:
-                print("Error occurred while executing the function. - ", e)
-                code = inspect.getsource(func)
-                if function_description:
-                    if (
-                        len(function_description.split()) < 20
-                        or len(function_description.split()) > 50
-                    ):
-                        raise ValueError(
-                            "The function description should be within the word limit of 30-50 words."
-                        )
-
-                print("Starting Bite Fix AI ...\n")
+        return biteFixAIResolver.wrap(func, function_description)
+
+    return resolve_decorator
+
+
+def warmup(*functions: Callable, background: bool = True) -> threading.Thread:
+    """
+    Loads ahead of time what BiteFix otherwise loads on the first error resolution: the crewai agent stack, and the LLM client
+    of each given decorated function. Call it once startup is over, so that the first error does not pay the import time.
+
+    Args:
+        *functions (Callable): Decorated functions whose LLM client should be built.
+        background (bool, optional): Whether to warm up in a daemon thread instead of blocking. Defaults to True.
+
+    Returns:
+        threading.Thread: The started warm-up thread, or None if background is False.
+    """
+
+    def warm() -> None:
+        try:
+            BiteFixAIResolver.warmup_stack()
+            for function in functions:
+                function.bitefix_resolver.warmup()
+        except Exception as exc:
+            print("Error occurred while warming up BiteFix AI - ", exc)
+
+    if not background:
+        warm()
+        return None
+    thread = threading.Thread(target=warm, name="bitefix-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def instrument(
+    target: Any,
+    resolver: BiteFixAIResolver,
+    include: List[str] = None,
+    exclude: List[str] = None,
+    function_descriptions: Dict[str, str] = None,
+) -> List[str]:
+    """
+    Wraps the functions of a module, a class or a package with one shared BiteFixAIResolver, instead of decorating each of them,
+    so that all of them share its configuration, LLM, cache and worker pool. The wrappers are created without finding the source code
+    of the functions, which is only found on their first error, so instrumenting many functions costs little time and memory.
+
+    The functions and methods defined in the module, and the methods of its classes and nested classes, are wrapped in place.
+    Functions imported from another module, special methods, generator functions, properties and functions that are already wrapped are left as they are.
+    A package is instrumented with all its submodules, which are imported. References to the functions taken before instrumenting,
+    such as with `from module import function`, still point to the original functions.
+    The wrappers always raise the error again once it is resolved, whatever the reraise attribute of the resolver,
+    so the instrumented code keeps its behavior.
+
+    Args:
+        target (Any): The module, class or package, or the name of a module or package.
+        resolver (BiteFixAIResolver): The resolver shared by all the wrapped functions.
+        include (List[str], optional): fnmatch patterns of the qualified names ("module.Class.method") to wrap. Defaults to None, all the public functions.
+        exclude (List[str], optional): fnmatch patterns of the qualified names of functions, classes or submodules not to wrap, such as hot paths. Defaults to None.
+        function_descriptions (Dict[str, str], optional): Descriptions of some functions, keyed by their qualified name. Defaults to None.
+
+    Returns:
+        List[str]: The qualified names of the wrapped functions.
+    """
+    function_descriptions = function_descriptions or {}
+    for function_description in function_descriptions.values():
+        _check_function_description(function_description)
+    wrapped = []
+    for owner, name, kind, func in _instrumentable(
+        target, exclude, import_submodules=True
+    ):
+        qualified_name = f"{func.__module__}.{func.__qualname__}"
+        if (
+            hasattr(func, "bitefix_resolver")
+            or inspect.isgeneratorfunction(func)
+            or inspect.isasyncgenfunction(func)
+            or not _selected(qualified_name, include, exclude)
+        ):
+            continue
+        wrapper = resolver.wrap(
+            func,
+            function_descriptions.get(qualified_name),
+            capture_source=False,
+            reraise=True,
+        )
+        setattr(owner, name, kind(wrapper) if kind is not None else wrapper)
+        wrapped.append(qualified_name)
+    return wrapped
+
+
+def uninstrument(target: Any) -> List[str]:
+    """
+    Puts back the original functions of a module, a class or a package instrumented with instrument.
+    The submodules of a package are not imported, only the ones already imported are restored.
+
+    Args:
+        target (Any): The module, class or package, or the name of a module or package.
+
+    Returns:
+        List[str]: The qualified names of the restored functions.
+    """
+    restored = []
+    for owner, name, kind, func in _instrumentable(
+        target, None, import_submodules=False
+    ):
+        if getattr(func, "bitefix_resolver", None) is None:
+            continue
+        original = func.__wrapped__
+        setattr(owner, name, kind(original) if kind is not None else original)
+        restored.append(f"{original.__module__}.{original.__qualname__}")
+    return restored
+
 
+def install_excepthook(
+    resolver: BiteFixAIResolver, threads: bool = True
+) -> Callable[[], None]:
+    """
+    Resolves the errors that no code catches, with one shared BiteFixAIResolver, by chaining sys.excepthook and threading.excepthook.
+    The previous hook runs first, so the traceback is printed as usual. An error of the main thread is resolved before the interpreter exits,
+    waiting for the worker pool of the resolver if it has one. Errors already resolved by a wrapped function, and KeyboardInterrupt and SystemExit, are skipped.
+
+    Args:
+        resolver (BiteFixAIResolver): The resolver of the uncaught errors.
+        threads (bool, optional): Whether to also resolve the uncaught errors of threads. Defaults to True.
+
+    Returns:
+        Callable[[], None]: Puts back the previous hooks.
+    """
+    previous_excepthook = sys.excepthook
+    previous_threading_excepthook = threading.excepthook
+
+    def excepthook(
+        exc_type: type, exc_value: BaseException, exc_traceback: Any
+    ) -> None:
+        previous_excepthook(exc_type, exc_value, exc_traceback)
+        if not isinstance(exc_value, Exception):
+            return
+        try:
+            result = resolver.resolve_exception(exc_value)
+            if isinstance(result, Future):
+                result.result()
+        except Exception as exc:
+            print("Error occurred while running BiteFix AI - ", exc)
+
+    def threading_excepthook(args: Any) -> None:
+        previous_threading_excepthook(args)
+        if not isinstance(args.exc_value, Exception):
+            return
+        try:
+            resolver.resolve_exception(args.exc_value)
+        except Exception as exc:
+            print("Error occurred while running BiteFix AI - ", exc)
+
+    sys.excepthook = excepthook
+    if threads:
+        threading.excepthook = threading_excepthook
+
+    def uninstall() -> None:
+        if sys.excepthook is excepthook:
+            sys.excepthook = previous_excepthook
+        if threading.excepthook is threading_excepthook:
+            threading.excepthook = previous_threading_excepthook
+
+    return uninstall
+
+
+def _instrumentable(
+    target: Any, exclude: List[str], import_submodules: bool
+) -> Iterator[Tuple[Any, str, Any, Callable]]:
+    """
+    Yields the owner, the attribute name, the staticmethod or classmethod type or None, and the function of each function
+    defined in a module, a class or a package, and in their classes.
+    """
+    if isinstance(target, str):
+        target = importlib.import_module(target)
+    if inspect.isclass(target):
+        yield from _class_functions(target, exclude)
+        return
+    modules = [target]
+    if hasattr(target, "__path__"):
+        if import_submodules:
+            for module_info in pkgutil.walk_packages(
+                target.__path__, f"{target.__name__}."
+            ):
+                if _excluded(module_info.name, exclude):
+                    continue
                 try:
-                    biteFixAIRunner = BiteFixAIRunner(
-                        function_code=code,
-                        function_description=function_description,
-                        arguments=args,
-                        error_message=e,
-                        llm=llm,
-                    )
-                    result = biteFixAIRunner.run()
-                except Exception as ex:
-                    print("Error occurred while running BiteFix AI - ", ex)
-                    return None
-
-                print("BiteFix AI completed.\n")
-                if verbose:
-                    print("BiteFix AI Error Resoltion Report: \n\n")
-                    print(
-                        "[PYTHON CODE DIAGNOSIS EXPERT] Error Diagnosis :\n\n",
-                        result["tasks_outputs"][0].result().replace("```", ""),
-                    )
-                    print(
-                        "\n\n[SENIOR PYTHON CODE EXPERT] Error resolution Ideas :\n\n",
-                        result["tasks_outputs"][1].result().replace("```", ""),
-                    )
-                    print(
-                        "\n\n[LEAD PYTHON CODE EXPERT] Best Idea Evaluation :\n\n",
-                        result["tasks_outputs"][2].result().replace("```", ""),
-                    )
+                    modules.append(importlib.import_module(module_info.name))
+                except Exception as exc:
                     print(
-                        "\n\n[PYTHON CODE DEVELOPER] Resolution Idea Implemenation :\n\n",
-                        result["tasks_outputs"][3].result(),
+                        f"Error occurred while importing {module_info.name} to instrument it - ",
+                        exc,
                     )
+        else:
+            modules.extend(
+                module
+                for name, module in list(sys.modules.items())
+                if name.startswith(f"{target.__name__}.") and module is not None
+            )
+    for module in modules:
+        for name, value in list(vars(module).items()):
+            if getattr(value, "__module__", None) != module.__name__:
+                continue
+            if inspect.isclass(value):
+                if not _excluded(f"{module.__name__}.{value.__qualname__}", exclude):
+                    yield from _class_functions(value, exclude)
+            elif inspect.isfunction(value):
+                yield module, name, None, value
 
-                if export_dir:
-                    try:
-                        export_error_resolution_report(
-                            result["tasks_outputs"], export_dir
-                        )
-                    except Exception as exc:
-                        print(
-                            "Error occurred while exporting the error resolution report - ",
-                            exc,
-                        )
 
-        return function_causing_error
+def _class_functions(
+    cls: type, exclude: List[str]
+) -> Iterator[Tuple[Any, str, Any, Callable]]:
+    for name, value in list(vars(cls).items()):
+        if name.startswith("__") and name.endswith("__"):
+            continue
+        if isinstance(value, (staticmethod, classmethod)):
+            yield cls, name, type(value), value.__func__
+        elif inspect.isfunction(value):
+            yield cls, name, None, value
+        elif (
+            inspect.isclass(value)
+            and value.__module__ == cls.__module__
+            and value.__qualname__.startswith(f"{cls.__qualname__}.")
+            and not _excluded(f"{value.__module__}.{value.__qualname__}", exclude)
+        ):
+            yield from _class_functions(value, exclude)
 
-    return resolve_decorator
+
+def _selected(qualified_name: str, include: List[str], exclude: List[str]) -> bool:
+    if _excluded(qualified_name, exclude):
+        return False
+    if include is None:
+        return not qualified_name.rsplit(".", 1)[-1].startswith("_")
+    return any(fnmatch.fnmatchcase(qualified_name, pattern) for pattern in include)
 
 
-def export_error_resolution_report(output: List[TaskOutput], export_dir: str) -> None:
+def _excluded(qualified_name: str, exclude: List[str]) -> bool:
+    return any(
+        fnmatch.fnmatchcase(qualified_name, pattern) for pattern in exclude or ()
+    )
+
+
+def _check_function_description(function_description: str) -> None:
+    if function_description:
+        if (
+            len(function_description.split()) < 20
+            or len(function_description.split()) > 50
+        ):
+            raise ValueError(
+                "The function description should be within the word limit of 20-50 words."
+            )
+
+
+def export_error_resolution_report(
+    output: List[Union[str, "TaskOutput"]], export_dir: str
+) -> None:
     """
     Export the error resolution report to a file in the specified directory.
+    The file gets a unique name and is written atomically, so concurrent reports never overwrite each other.
 
     Args:
-        output (List[TaskOutput]): The list of task outputs from the BiteFix AI process.
+        output (List[Union[str, TaskOutput]]): The task output results, or the task outputs, from the BiteFix AI process.
         export_dir (str): The Path to the directory to export the error resolution report.
 
     Returns:
         None
     """
 
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    report_file_name = f"BiteFixAIErrorResolutionReport_{timestamp}.md"
-    report_file_path = os.path.join(export_dir, report_file_name)
-    with open(report_file_path, "w") as file:
-        file.write("# BiteFix AI Error Resolution Report\n\n")
-        file.write("## Error Diagnosis Report by Python Code Diagnosis Expert\n\n")
-        file.write(output[0].result().replace("```", ""))
-        file.write("\n\n")
-        file.write("## Error resolution ideas Report by Senior Python Code Expert\n\n")
-        file.write(output[1].result().replace("```", ""))
-        file.write("\n\n")
-        file.write("## Best Idea Evaluation Report by Lead Python Code Expert\n\n")
-        file.write(output[2].result().replace("```", ""))
-        file.write("\n\n")
-        file.write(
-            "## Resolution Idea Implemenation Report by Python Code Developer\n\n"
-        )
-        file.write(output[3].result())
-        file.write("\n\n")
+    output = [
+        task_output.result() if hasattr(task_output, "result") else task_output
+        for task_output in output
+    ]
+    report_file_path = os.path.join(export_dir, report_file_name(report_id()))
+    atomic_write(report_file_path, render_report(output))
     print(f"\nError Resolution Report has been saved to {report_file_path}")
+
+
+def start_error_resolution_report(export_dir: str) -> str:
+    """
+    Create an error resolution report file holding only the title, to which the stages are appended as they complete.
+
+    Args:
+        export_dir (str): The Path to the directory to export the error resolution report.
+
+    Returns:
+        str: The path of the report file.
+    """
+
+    report_file_path = os.path.join(export_dir, report_file_name(report_id()))
+    with open(report_file_path, "x") as file:
+        file.write(render_report([]))
+    return report_file_path
+
+
+def append_error_resolution_report(
+    report_file_path: str, stage: int, output: str
+) -> None:
+    """
+    Append the output of one stage of the BiteFix AI process to an error resolution report file.
+
+    Args:
+        report_file_path (str): The path of the report file.
+        stage (int): The stage of the output, from 0 (error diagnosis) to 3 (code development).
+        output (str): The output of the stage.
+
+    Returns:
+        None
+    """
+
+    with open(report_file_path, "a") as file:
+        file.write(render_report_section(stage, output))
@@ -22,6 +22,7 @@ setup(
         "Operating System :: OS Independent",
     ],
     install_requires=required,
+    entry_points={"console_scripts": ["bitefix=bitefix.__main__:main"]},
     license="MIT",
     url="https://github.com/Pallavi-Sinha-12/bitefix",
     python_requires=">=3.10",
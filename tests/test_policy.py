@@ -0,0 +1,48 @@
+"""
+Checks that the circuit breaker of BiteFixAIPolicy recovers when building the LLM fails during the half-open trial.
+
+Usage:
+    python -m pytest tests
+"""
+
+import contextlib
+import io
+import unittest
+import warnings
+
+from bitefix import BiteFixAIPolicy
+from bitefix.BiteFixAIFakeLLM import BiteFixAIFakeLLM
+from bitefix.BiteFixAIResolver import BiteFixAIResolver
+
+
+class TestPolicy(unittest.TestCase):
+    def test_failing_llm_factory_closes_the_half_open_trial(self):
+        warnings.filterwarnings("ignore")
+        failures = [RuntimeError("invalid API key")] * 2
+
+        def llm_factory():
+            if failures:
+                raise failures.pop()
+            return BiteFixAIFakeLLM(seed=0)
+
+        policy = BiteFixAIPolicy(failure_threshold=1, cooldown=0)
+        resolver = BiteFixAIResolver(
+            llm=None, llm_factory=llm_factory, policy=policy, verbose=False
+        )
+        divide = resolver.wrap(lambda a, b: a / b, "Divides a by b.")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            divide(1, 0)
+            self.assertEqual(policy.stats()["circuit_state"], "open")
+            divide(1, 0)
+            self.assertEqual(policy.stats()["circuit_state"], "open")
+            divide(1, 0)
+
+        stats = policy.stats()
+        self.assertEqual(stats["circuit_state"], "closed")
+        self.assertEqual(stats["pipeline_errors"], 2)
+        self.assertEqual(stats["circuit_open"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+Checks that importing bitefix and decorating functions does not load the LLM and crew dependencies,
+which are only imported on the first error resolution, and that it stays within a time and a memory budget.
+
+Usage:
+    python -m pytest tests
+"""
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MAX_STARTUP_SECONDS = 1.0
+# Peak memory allocated by Python while importing bitefix and decorating, measured with tracemalloc.
+MAX_STARTUP_MEMORY_MB = 20
+
+HEAVY_MODULES = (
+    "crewai",
+    "langchain",
+    "langchain_core",
+    "langchain_openai",
+    "openai",
+    "httpx",
+)
+
+STARTUP = """
+import json, sys, time, tracemalloc
+if sys.argv[1:] == ["memory"]:
+    tracemalloc.start()
+start = time.perf_counter()
+import bitefix
+from bitefix import resolve, resolve_with_openai
+
+@resolve(llm=object(), verbose=False)
+def add(a, b):
+    return a + b
+
+@resolve_with_openai(openai_api_key="sk-test", verbose=False)
+def subtract(a, b):
+    return a - b
+
+print(json.dumps({
+    "seconds": time.perf_counter() - start,
+    "memory_mb": tracemalloc.get_traced_memory()[1] / (1024 * 1024),
+    "heavy_modules": sorted({module.split(".")[0] for module in sys.modules} & set(%r)),
+}))
+""" % (HEAVY_MODULES,)
+
+
+class TestStartup(unittest.TestCase):
+    def startup(self, *arguments: str) -> dict:
+        environment = dict(os.environ)
+        environment["PYTHONPATH"] = os.pathsep.join(
+            path for path in (REPO_ROOT, environment.get("PYTHONPATH")) if path
+        )
+        completed = subprocess.run(
+            [sys.executable, "-c", STARTUP, *arguments],
+            capture_output=True,
+            text=True,
+            cwd=REPO_ROOT,
+            env=environment,
+            timeout=120,
+        )
+        self.assertEqual(completed.returncode, 0, completed.stderr)
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    def test_import_does_not_load_heavy_modules(self):
+        loaded = self.startup()["heavy_modules"]
+        self.assertEqual(loaded, [], f"Loaded at startup: {', '.join(loaded)}")
+
+    def test_import_is_within_time_budget(self):
+        seconds = min(self.startup()["seconds"] for _ in range(3))
+        self.assertLess(
+            seconds,
+            MAX_STARTUP_SECONDS,
+            f"Startup took {seconds:.3f} s, the budget is {MAX_STARTUP_SECONDS} s.",
+        )
+
+    def test_import_is_within_memory_budget(self):
+        memory_mb = self.startup("memory")["memory_mb"]
+        self.assertLess(
+            memory_mb,
+            MAX_STARTUP_MEMORY_MB,
+            f"Startup allocated {memory_mb:.1f} MiB, the budget is {MAX_STARTUP_MEMORY_MB} MiB.",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()